@@ -0,0 +1,147 @@
+"""
+Pairwise model agreement for FormationEval evaluation pipeline.
+
+Computes answer agreement, Cohen's kappa and error overlap (Jaccard on
+failed-question sets) for every pair of models. Per-model answer and
+error sets are bit-packed so each pair costs a few popcounts over
+ceil(questions / 64) words instead of a per-question loop.
+"""
+
+import numpy as np
+
+from results_matrix import LETTERS, ResultsMatrix
+
+# Answer categories: A/B/C/D plus failed extraction
+CATEGORIES = list(LETTERS) + ["failed"]
+
+# Default kappa threshold for grouping models into clusters
+CLUSTER_MIN_KAPPA = 0.6
+
+# Byte popcount table for NumPy versions without np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_bits(mask: np.ndarray) -> np.ndarray:
+    """
+    Pack a boolean (rows x questions) mask into uint64 words per row.
+
+    Returns:
+        uint64 array (rows x ceil(questions / 64))
+    """
+    packed = np.packbits(mask, axis=-1)
+    pad = -packed.shape[-1] % 8
+    if pad:
+        packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, pad)])
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Count set bits per row of a packed uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    as_bytes = words.view(np.uint8)
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def pairwise_overlap(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Count set bits of a[i] & b[j] for every pair of rows.
+
+    Args:
+        a: Packed bits (models x words)
+        b: Packed bits (models x words)
+
+    Returns:
+        int64 array (models x models)
+    """
+    counts = np.empty((a.shape[0], b.shape[0]), dtype=np.int64)
+    for i in range(a.shape[0]):
+        counts[i] = popcount(a[i] & b)
+    return counts
+
+
+def compute_agreement(matrix: ResultsMatrix) -> dict:
+    """
+    Pairwise agreement statistics for all models in the matrix.
+
+    Each pair is compared on the questions both models answered. Answers are
+    compared as A/B/C/D/failed categories; errors are wrong or failed answers.
+
+    Returns:
+        Dict with 'models' and (models x models) arrays 'common' (questions
+        answered by both), 'agreement' (fraction with the same answer),
+        'kappa' (Cohen's kappa on answers), 'both_wrong' and 'error_jaccard'
+        (both wrong / either wrong)
+    """
+    answered = pack_bits(matrix.answered)
+    wrong = pack_bits(matrix.answered & ~matrix.correct)
+    categories = [pack_bits(matrix.answered & (matrix.predicted == i)) for i in range(len(LETTERS))]
+    categories.append(pack_bits(matrix.answered & (matrix.predicted < 0)))
+
+    common = pairwise_overlap(answered, answered)
+
+    # Observed agreement and chance agreement from per-pair marginals
+    same = np.zeros_like(common)
+    chance = np.zeros(common.shape)
+    for bits in categories:
+        same += pairwise_overlap(bits, bits)
+        row_marginal = pairwise_overlap(bits, answered)
+        chance += row_marginal * row_marginal.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        observed = np.where(common > 0, same / common, 0.0)
+        expected = np.where(common > 0, chance / common.astype(float) ** 2, 0.0)
+        kappa = np.where(expected < 1, (observed - expected) / (1 - expected), 1.0)
+
+    # Error overlap restricted to questions both answered
+    both_wrong = pairwise_overlap(wrong, wrong)
+    wrong_in_common = pairwise_overlap(wrong, answered)
+    either_wrong = wrong_in_common + wrong_in_common.T - both_wrong
+    with np.errstate(divide="ignore", invalid="ignore"):
+        error_jaccard = np.where(either_wrong > 0, both_wrong / either_wrong, 0.0)
+
+    return {
+        "models": list(matrix.models),
+        "common": common,
+        "agreement": observed,
+        "kappa": kappa,
+        "both_wrong": both_wrong,
+        "error_jaccard": error_jaccard,
+    }
+
+
+def cluster_models(
+    kappa: np.ndarray,
+    min_kappa: float = CLUSTER_MIN_KAPPA,
+) -> list[list[int]]:
+    """
+    Group models by average-linkage clustering on kappa.
+
+    Clusters are merged while the average kappa between them is at least
+    min_kappa.
+
+    Returns:
+        Clusters as lists of model indices, largest first; members keep
+        merge order so similar models sit next to each other
+    """
+    clusters = [[i] for i in range(kappa.shape[0])]
+    similarity = kappa.astype(float).copy()
+    np.fill_diagonal(similarity, -np.inf)
+    sizes = np.ones(len(clusters))
+    active = np.ones(len(clusters), dtype=bool)
+
+    while active.sum() > 1:
+        masked = np.where(active[:, None] & active[None, :], similarity, -np.inf)
+        i, j = np.unravel_index(np.argmax(masked), masked.shape)
+        if masked[i, j] < min_kappa:
+            break
+        # Average linkage: size-weighted mean similarity to the merged cluster
+        merged = (similarity[i] * sizes[i] + similarity[j] * sizes[j]) / (sizes[i] + sizes[j])
+        similarity[i, :] = merged
+        similarity[:, i] = merged
+        similarity[i, i] = -np.inf
+        sizes[i] += sizes[j]
+        clusters[i] = clusters[i] + clusters[j]
+        active[j] = False
+
+    result = [clusters[i] for i in np.flatnonzero(active)]
+    return sorted(result, key=lambda c: (-len(c), c[0]))
@@ -0,0 +1,146 @@
+"""
+Cache manifest and metrics snapshots for FormationEval evaluation pipeline.
+
+Records, per model cache directory, the file count, latest mtime and a
+listing digest seen at the last analysis, together with a snapshot of the
+computed metrics. Re-analysis recomputes only directories whose state
+changed and reuses the snapshots for the rest. All snapshots are dropped
+when the extractor, the cache loading or metrics code or the benchmark
+questions change.
+
+Snapshots hold the aggregates and the per-question results without the
+raw responses, which stay in the response cache only.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import metrics
+import question_index
+import results_matrix
+from extraction import EXTRACTOR_VERSION
+from question_index import QuestionIndex
+
+ANALYSIS_DIR = ".analysis"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+# Hash of the extractor version and of the modules that load, re-extract and
+# turn responses into metrics (response_cache.py imports this module, so it
+# is read by path)
+ANALYSIS_VERSION = hashlib.sha256(
+    EXTRACTOR_VERSION.encode("utf-8")
+    + b"".join(Path(module.__file__).read_bytes() for module in (metrics, results_matrix, question_index))
+    + (Path(__file__).parent / "response_cache.py").read_bytes()
+    + Path(__file__).read_bytes()
+).hexdigest()[:12]
+
+# Per-question fields left out of snapshots (kept in the response cache)
+_UNSNAPSHOTTED_FIELDS = ("raw_response",)
+
+
+def _write_json(path: Path, data: dict) -> None:
+    """Write JSON atomically (temp file + rename)."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class AnalysisSnapshots:
+    """
+    Manifest plus per-model metrics snapshots under cache_dir/.analysis/.
+
+    The manifest maps each model directory name to the cache state it was
+    analyzed at ('files', 'max_mtime', 'listing').
+    """
+
+    def __init__(self, cache_dir: Path, questions: QuestionIndex, reuse: bool = True):
+        """
+        Open the snapshot manifest of a cache directory.
+
+        Args:
+            cache_dir: Cache root directory
+            questions: Benchmark index the snapshots are computed against
+            reuse: Load the existing manifest; False recomputes every model
+                and rewrites all snapshots
+        """
+        self.dir = cache_dir / ANALYSIS_DIR
+        self.manifest_path = self.dir / MANIFEST_NAME
+        self.analysis_version = ANALYSIS_VERSION
+        self.questions_fingerprint = questions.fingerprint
+        self.models = {}
+
+        manifest = {}
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, "r") as f:
+                    manifest = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                manifest = {}
+
+        # Snapshots are only valid for the same extractor, analysis code and benchmark
+        if (
+            reuse
+            and manifest.get("version") == MANIFEST_VERSION
+            and manifest.get("analysis_version") == self.analysis_version
+            and manifest.get("questions_fingerprint") == self.questions_fingerprint
+        ):
+            self.models = manifest.get("models", {})
+
+    def _snapshot_path(self, model_cache: Path) -> Path:
+        return self.dir / f"{model_cache.name}.json"
+
+    def load(self, model_cache: Path, state: dict) -> dict | None:
+        """
+        Return the saved analysis result for a model directory if its cache
+        state is unchanged since the snapshot, otherwise None.
+
+        The answers of the result have no 'raw_response' (see
+        response_cache.restore_raw_responses()).
+        """
+        entry = self.models.get(model_cache.name)
+        if entry is None or any(entry.get(key) != value for key, value in state.items()):
+            return None
+
+        try:
+            with open(self._snapshot_path(model_cache), "r") as f:
+                result = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return None
+
+        result["model_cache"] = model_cache
+        result["flips"] = []
+        result["elapsed"] = 0.0
+        result["from_snapshot"] = True
+        return result
+
+    def save(self, result: dict, state: dict) -> None:
+        """Persist an analysis result and the cache state it corresponds to."""
+        model_cache = result["model_cache"]
+        snapshot = {
+            key: value for key, value in result.items()
+            if key not in ("model_cache", "flips", "elapsed", "from_snapshot")
+        }
+        if "metrics" in snapshot:
+            answers = {
+                qid: {key: value for key, value in answer.items() if key not in _UNSNAPSHOTTED_FIELDS}
+                for qid, answer in snapshot["metrics"].get("answers", {}).items()
+            }
+            snapshot["metrics"] = {**snapshot["metrics"], "answers": answers}
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        _write_json(self._snapshot_path(model_cache), snapshot)
+        self.models[model_cache.name] = dict(state)
+
+    def write_manifest(self) -> None:
+        """Write the manifest (call after all snapshots are saved)."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        _write_json(self.manifest_path, {
+            "version": MANIFEST_VERSION,
+            "analysis_version": self.analysis_version,
+            "questions_fingerprint": self.questions_fingerprint,
+            "models": self.models,
+        })
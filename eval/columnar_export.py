@@ -0,0 +1,154 @@
+"""
+Long-format columnar export for FormationEval evaluation pipeline.
+
+Writes one row per (question, model) with the predicted answer, correctness,
+extraction pattern, latency and token count, as Parquet or Arrow IPC. Model,
+question id and pattern columns are dictionary encoded. Raw responses go to
+a separate file with the same keys, so analytics never read the text.
+
+Requires pyarrow; without it, LongResultsWriter.available() is False and
+the pipeline skips this export.
+"""
+
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+LONG_RESULTS_NAME = "results_long"
+RAW_RESULTS_NAME = "results_raw"
+
+# File extension per supported format
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _dictionary_string():
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def long_results_schema():
+    """Schema of the long-format results file."""
+    return pa.schema([
+        ("question_id", _dictionary_string()),
+        ("model", _dictionary_string()),
+        ("predicted", pa.string()),
+        ("correct", pa.bool_()),
+        ("pattern", _dictionary_string()),
+        ("latency_ms", pa.int32()),
+        ("tokens", pa.int32()),
+    ])
+
+
+def raw_results_schema():
+    """Schema of the raw-response file (joins on question_id, model)."""
+    return pa.schema([
+        ("question_id", _dictionary_string()),
+        ("model", _dictionary_string()),
+        ("raw_response", pa.large_string()),
+    ])
+
+
+class LongResultsWriter:
+    """
+    Stream runs into long-format results and raw-response files.
+
+    Each run becomes one record batch (Parquet row group), so only one
+    model's rows are in memory at a time.
+    """
+
+    def __init__(self, output_dir: Path, fmt: str = "parquet"):
+        """
+        Open the output files.
+
+        Args:
+            output_dir: Directory for results_long.* and results_raw.*
+            fmt: 'parquet' or 'arrow' (Arrow IPC file)
+
+        Raises:
+            ImportError: If pyarrow is not installed
+            ValueError: If fmt is not supported
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for the columnar export (pip install pyarrow)")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported columnar format '{fmt}' (use one of: {', '.join(FORMATS)})")
+
+        self.fmt = fmt
+        self.paths = {
+            "long": output_dir / f"{LONG_RESULTS_NAME}{FORMATS[fmt]}",
+            "raw": output_dir / f"{RAW_RESULTS_NAME}{FORMATS[fmt]}",
+        }
+        self.rows = 0
+        # Cumulative dictionaries: each batch extends the previous one, which
+        # Arrow IPC files accept as a delta (replacements are not allowed)
+        self._dictionaries = {"question_id": {}, "model": {}, "pattern": {}}
+        self._writers = {
+            "long": self._open(self.paths["long"], long_results_schema()),
+            "raw": self._open(self.paths["raw"], raw_results_schema()),
+        }
+
+    @staticmethod
+    def available() -> bool:
+        """True if pyarrow is installed."""
+        return pa is not None
+
+    def _open(self, path: Path, schema):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.fmt == "parquet":
+            return pq.ParquetWriter(path, schema, compression="zstd")
+        # Dictionaries change per run; the file format accepts them as deltas
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        return pa.ipc.new_file(path, schema, options=options)
+
+    def write_run(self, run: dict) -> None:
+        """Append the per-question results of one run."""
+        answers = run.get("answers", {})
+        if not answers:
+            return
+
+        results = list(answers.values())
+        question_ids = self._encode("question_id", list(answers))
+        models = self._encode("model", [run.get("model", "unknown")] * len(results))
+
+        long_batch = pa.record_batch([
+            question_ids,
+            models,
+            pa.array([r.get("predicted") for r in results], pa.string()),
+            pa.array([bool(r.get("correct", False)) for r in results], pa.bool_()),
+            self._encode("pattern", [r.get("extraction_pattern", "") for r in results]),
+            pa.array([r.get("latency_ms") for r in results], pa.int32()),
+            pa.array([r.get("tokens") for r in results], pa.int32()),
+        ], schema=long_results_schema())
+        raw_batch = pa.record_batch([
+            question_ids,
+            models,
+            pa.array([r.get("raw_response", "") for r in results], pa.large_string()),
+        ], schema=raw_results_schema())
+
+        self._write(self._writers["long"], long_batch)
+        self._write(self._writers["raw"], raw_batch)
+        self.rows += len(answers)
+
+    def _encode(self, column: str, values: list[str]):
+        """Dictionary-encode values against the column's cumulative dictionary."""
+        codes = self._dictionaries[column]
+        indices = [codes.setdefault(value, len(codes)) for value in values]
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, pa.int32()), pa.array(list(codes), pa.string())
+        )
+
+    def _write(self, writer, batch) -> None:
+        if self.fmt == "parquet":
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+
+    def close(self) -> dict[str, Path]:
+        """Finish both files; returns their paths keyed 'long' and 'raw'."""
+        for writer in self._writers.values():
+            writer.close()
+        return self.paths
@@ -4,7 +4,69 @@ Answer extraction utilities for FormationEval evaluation pipeline.
 Extracts A/B/C/D answers from model responses with pattern tracking.
 """
 
+import hashlib
+import inspect
+import io
+import os
 import re
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Batch extraction: inputs smaller than this are extracted in-process, larger
+# ones are split into chunks of PARALLEL_CHUNK_SIZE across a process pool
+PARALLEL_MIN_RESPONSES = 5000
+PARALLEL_CHUNK_SIZE = 1000
+
+
+# Reasoning/thinking tags (o1/o3/DeepSeek-R1), located with str.find/rfind
+_OPENING_TAGS = ('<thinking>', '<think>')
+_CLOSING_TAGS = ('</thinking>', '</think>')
+
+# Markdown bold/italic around single letters (e.g. "**B**"). The lookbehind
+# starts matches only at the first asterisk of a run, so long runs without a
+# letter are not rescanned from every position
+_MARKDOWN_LETTER = re.compile(r'(?<!\*)\*+([ABCD])\*+')
+
+# Extraction patterns (order: most specific -> most general).
+# Each entry is (compiled regex, pattern name, required literal). The literal
+# must occur in the cleaned text for the regex to match at all, so a plain
+# substring check skips most patterns without a regex scan.
+_PATTERNS = [
+    # Explicit answer statements
+    (re.compile(r'CORRECT\s+ANSWER[:\s]+([ABCD])'), "correct_answer", "CORRECT"),
+    (re.compile(r'ANSWER\s+IS[:\s]+([ABCD])'), "answer_is", "ANSWER"),
+    (re.compile(r'ANSWER[:\s]+([ABCD])'), "answer_colon", "ANSWER"),
+
+    # Choice/option statements
+    (re.compile(r'CHOOSE\s+([ABCD])'), "choose", "CHOOSE"),
+    (re.compile(r'CHOICE\s+IS[:\s]+([ABCD])'), "choice_is", "CHOICE"),
+    (re.compile(r'OPTION\s+([ABCD])'), "option", "OPTION"),
+    (re.compile(r'SELECT\s+([ABCD])'), "select", "SELECT"),
+    (re.compile(r'GO\s+WITH\s+([ABCD])'), "go_with", "WITH"),
+
+    # Letter with punctuation
+    (re.compile(r'\(([ABCD])\)'), "parentheses", "("),
+    (re.compile(r'\b([ABCD])\)'), "letter_paren", ")"),
+    (re.compile(r'\b([ABCD])\.'), "letter_period", "."),
+    (re.compile(r'\b([ABCD]),'), "letter_comma", ","),
+
+    # Letter at boundaries
+    (re.compile(r'^([ABCD])\b'), "start_of_string", None),
+    (re.compile(r'\b([ABCD])\s*$'), "end_of_string", None),
+
+    # "is X" pattern (catches "...is B")
+    (re.compile(r'\bIS\s+([ABCD])\b'), "is_x", "IS"),
+
+    # Last resort "standalone" (any standalone letter) is handled separately
+    # in extract_answer(), see _STANDALONE_LETTER
+]
+
+# Standalone letter, searched on the reversed text: word boundaries are
+# symmetric, so the first match there is the last standalone letter of the
+# original. Equivalent to r'\b([ABCD])\b(?!.*\b[ABCD]\b)' without the
+# lookahead that rescans the remainder of the text at every candidate.
+_STANDALONE_LETTER = re.compile(r'\b([ABCD])\b')
 
 
 def strip_thinking(response: str) -> str:
@@ -12,13 +74,77 @@ def strip_thinking(response: str) -> str:
     Remove reasoning/thinking tags from response (for o1/o3/DeepSeek-R1 models).
 
     These models output their reasoning process in <thinking> or <think> tags
-    before providing the final answer.
+    before providing the final answer, so the answer region is located from
+    the end of the text:
+
+    - Everything up to the last closing tag is reasoning. This also covers
+      responses whose opening tag was part of the chat template.
+    - An opening tag after the last closing tag was never closed (output cut
+      off mid-thought), so the unterminated block is dropped.
+    - If nothing is left after the last closing tag, the closed
+      <thinking>...</thinking> and <think>...</think> spans are removed and
+      the text around them is kept, as the original regex-based extractor
+      did (answer given before or between the reasoning blocks).
+
+    Only str.find/str.rfind are used, so this runs in linear time regardless
+    of how many (unbalanced) tags the response contains.
     """
-    response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL)
-    response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
+    if 'think' not in response:
+        return response.strip()
+
+    end = -1
+    for tag in _CLOSING_TAGS:
+        pos = response.rfind(tag)
+        if pos != -1:
+            end = max(end, pos + len(tag))
+
+    tail = response[end:] if end != -1 else response
+    start = _find_opening_tag(tail)
+    if start != -1:
+        tail = tail[:start]
+
+    if end != -1 and not tail.strip():
+        tail = _strip_closed_blocks(response)
+
+    return tail.strip()
+
+
+def _strip_closed_blocks(response: str) -> str:
+    """Remove closed thinking blocks, keeping all other text (original layout)."""
+    for opening, closing in zip(_OPENING_TAGS, _CLOSING_TAGS):
+        response = _remove_closed_spans(response, opening, closing)
     return response.strip()
 
 
+def _remove_closed_spans(text: str, opening: str, closing: str) -> str:
+    """
+    Remove each opening...closing span (shortest match, left to right).
+
+    Same result as re.sub(opening + '.*?' + closing, '', text, flags=re.DOTALL)
+    in a single forward pass: an opening tag without a later closing tag ends
+    the scan and the rest of the text is kept.
+    """
+    parts = []
+    pos = 0
+    while True:
+        start = text.find(opening, pos)
+        if start == -1:
+            break
+        stop = text.find(closing, start + len(opening))
+        if stop == -1:
+            break
+        parts.append(text[pos:start])
+        pos = stop + len(closing)
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def _find_opening_tag(text: str) -> int:
+    """Return the position of the first opening thinking tag, or -1."""
+    positions = [pos for pos in (text.find(tag) for tag in _OPENING_TAGS) if pos != -1]
+    return min(positions) if positions else -1
+
+
 def clean_response(response: str) -> str:
     """
     Clean formatting before extraction.
@@ -28,12 +154,16 @@ def clean_response(response: str) -> str:
     - Removes markdown bold/italic around letters
     - Normalizes whitespace
     """
-    text = strip_thinking(response).upper()
+    return _clean_text(strip_thinking(response))
+
+
+def _clean_text(text: str) -> str:
+    text = text.upper()
     # Remove markdown bold/italic around single letters
-    text = re.sub(r'\*+([ABCD])\*+', r'\1', text)
+    if '*' in text:
+        text = _MARKDOWN_LETTER.sub(r'\1', text)
     # Remove extra whitespace
-    text = ' '.join(text.split())
-    return text
+    return ' '.join(text.split())
 
 
 def extract_answer(response: str) -> tuple[str | None, str]:
@@ -61,8 +191,18 @@ def extract_answer(response: str) -> tuple[str | None, str]:
         >>> extract_answer("See explanation above")
         (None, 'failed')
     """
-    text = clean_response(response)
+    answer, pattern = _extract_from_text(clean_response(response))
+
+    # Unbalanced or interleaved tags can leave no answer in the tail-first
+    # region; fall back to removing only the closed blocks, so nothing the
+    # original extractor found is lost
+    if answer is None and 'think' in response:
+        answer, pattern = _extract_from_text(_clean_text(_strip_closed_blocks(response)))
+    return answer, pattern
+
 
+def _extract_from_text(text: str) -> tuple[str | None, str]:
+    """Match the answer patterns against cleaned (uppercased) text."""
     if not text:
         return None, "failed"
 
@@ -70,45 +210,174 @@ def extract_answer(response: str) -> tuple[str | None, str]:
     if text[0] in 'ABCD':
         return text[0], "first_char"
 
-    # 2. Pattern matching (order: most specific -> most general)
-    patterns = [
-        # Explicit answer statements
-        (r'CORRECT\s+ANSWER[:\s]+([ABCD])', "correct_answer"),
-        (r'ANSWER\s+IS[:\s]+([ABCD])', "answer_is"),
-        (r'ANSWER[:\s]+([ABCD])', "answer_colon"),
-
-        # Choice/option statements
-        (r'CHOOSE\s+([ABCD])', "choose"),
-        (r'CHOICE\s+IS[:\s]+([ABCD])', "choice_is"),
-        (r'OPTION\s+([ABCD])', "option"),
-        (r'SELECT\s+([ABCD])', "select"),
-        (r'GO\s+WITH\s+([ABCD])', "go_with"),
-
-        # Letter with punctuation
-        (r'\(([ABCD])\)', "parentheses"),
-        (r'\b([ABCD])\)', "letter_paren"),
-        (r'\b([ABCD])\.', "letter_period"),
-        (r'\b([ABCD]),', "letter_comma"),
-
-        # Letter at boundaries
-        (r'^([ABCD])\b', "start_of_string"),
-        (r'\b([ABCD])\s*$', "end_of_string"),
-
-        # "is X" pattern (catches "...is B")
-        (r'\bIS\s+([ABCD])\b', "is_x"),
-
-        # Last resort: any standalone letter (risky but catches edge cases)
-        (r'\b([ABCD])\b(?!.*\b[ABCD]\b)', "standalone"),
-    ]
-
-    for regex, pattern_name in patterns:
-        match = re.search(regex, text)
+    # 2. Pattern matching in precedence order, skipping patterns whose
+    #    required literal is absent
+    for regex, pattern_name, literal in _PATTERNS:
+        if literal is not None and literal not in text:
+            continue
+        match = regex.search(text)
         if match:
             return match.group(1), pattern_name
 
+    # 3. Last resort: last standalone letter (risky but catches edge cases)
+    match = _STANDALONE_LETTER.search(text[::-1])
+    if match:
+        return match.group(1), "standalone"
+
     return None, "failed"
 
 
+# Everything that decides the (answer, pattern) of a response
+_EXTRACTION_FUNCTIONS = (
+    strip_thinking, _strip_closed_blocks, _remove_closed_spans, _find_opening_tag,
+    clean_response, _clean_text, extract_answer, _extract_from_text,
+)
+
+
+def _normalized_source(function) -> str:
+    """
+    Source of a function without its docstring, comments and blank lines.
+
+    Works on the source text rather than the parsed tree, whose dump
+    differs between Python versions.
+    """
+    lines = inspect.getsource(function).splitlines()
+    dropped = set()
+    in_body = docstring_next = False
+    for token in tokenize.generate_tokens(io.StringIO("\n".join(lines) + "\n").readline):
+        row, col = token.start
+        if token.type == tokenize.COMMENT:
+            lines[row - 1] = lines[row - 1][:col]
+        elif token.type == tokenize.INDENT and not in_body:
+            in_body = True
+            docstring_next = function.__doc__ is not None
+        elif docstring_next and token.type == tokenize.STRING:
+            dropped.update(range(row, token.end[0] + 1))
+            docstring_next = False
+        elif token.type not in (tokenize.NL, tokenize.NEWLINE):
+            docstring_next = False
+    return "\n".join(
+        line.rstrip() for number, line in enumerate(lines, 1)
+        if number not in dropped and line.strip()
+    )
+
+
+def _extraction_fingerprint() -> str:
+    """
+    Hash of the extraction logic: the tag and pattern tables and the source
+    of the extraction functions.
+
+    Docstrings, comments and blank lines do not count, and neither do the
+    batching helpers or the self-test.
+    """
+    parts = [repr((
+        _OPENING_TAGS,
+        _CLOSING_TAGS,
+        (_MARKDOWN_LETTER.pattern, _MARKDOWN_LETTER.flags),
+        [(regex.pattern, regex.flags, name, literal) for regex, name, literal in _PATTERNS],
+        (_STANDALONE_LETTER.pattern, _STANDALONE_LETTER.flags),
+    ))]
+    parts.extend(_normalized_source(function) for function in _EXTRACTION_FUNCTIONS)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+# Version of the extraction logic, stored with persisted extraction results,
+# so any change that can alter an extracted answer marks them stale
+EXTRACTOR_VERSION = _extraction_fingerprint()
+
+
+def extraction_record(answer: str | None, pattern: str) -> dict:
+    """
+    Build the extraction result persisted alongside a cached response.
+
+    Returns:
+        Dict with 'answer', 'pattern' and the 'version' of the extractor
+    """
+    return {"answer": answer, "pattern": pattern, "version": EXTRACTOR_VERSION}
+
+
+def stored_extraction(response: dict) -> tuple[str | None, str] | None:
+    """
+    Return the persisted (answer, pattern) of a response dict.
+
+    Returns None if there is no 'extraction' record or it was produced by
+    another extractor version.
+    """
+    record = response.get("extraction")
+    if record is not None and record.get("version") == EXTRACTOR_VERSION:
+        return record["answer"], record["pattern"]
+    return None
+
+
+def extract_response(response: dict) -> tuple[str | None, str]:
+    """
+    Extract the answer for a response dict.
+
+    Reuses the persisted 'extraction' record when it was produced by the
+    current extractor version, otherwise extracts from 'raw_response'.
+    """
+    stored = stored_extraction(response)
+    if stored is not None:
+        return stored
+    return extract_answer(response.get("raw_response", ""))
+
+
+def _extract_chunk(responses: list[str]) -> list[tuple[str | None, str]]:
+    """Extract answers for one chunk (runs in a worker process)."""
+    return [extract_answer(response) for response in responses]
+
+
+def extract_answers(
+    responses: list[str],
+    jobs: int | None = None,
+    chunk_size: int = PARALLEL_CHUNK_SIZE,
+) -> list[tuple[str | None, str]]:
+    """
+    Extract answers for many raw responses.
+
+    Inputs below PARALLEL_MIN_RESPONSES (or jobs=1) are extracted in-process.
+    Larger inputs are split into chunks and fanned out across a process
+    pool. Extraction is a pure function and chunks are collected in order,
+    so the result is identical to the serial path.
+
+    Args:
+        responses: Raw model responses
+        jobs: Worker processes (default: CPU count)
+        chunk_size: Responses per worker task
+
+    Returns:
+        List of (answer, pattern_name) tuples in input order
+    """
+    responses = list(responses)
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs <= 1 or len(responses) < PARALLEL_MIN_RESPONSES:
+        return _extract_chunk(responses)
+
+    chunks = [responses[i:i + chunk_size] for i in range(0, len(responses), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+        for chunk_results in pool.map(_extract_chunk, chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def extract_responses(responses: list[dict], jobs: int | None = None) -> list[tuple[str | None, str]]:
+    """
+    Extract answers for many response dicts, in input order.
+
+    Persisted results from the current extractor version are reused; the
+    remaining responses go through one extract_answers() batch.
+    """
+    results = [stored_extraction(response) for response in responses]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        raws = [responses[i].get("raw_response", "") for i in pending]
+        for i, result in zip(pending, extract_answers(raws, jobs=jobs)):
+            results[i] = result
+    return results
+
+
 def check_answer(predicted: str | None, correct_index: int) -> bool:
     """
     Check if the predicted answer matches the correct answer.
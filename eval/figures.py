@@ -0,0 +1,367 @@
+"""
+Paper figures for FormationEval evaluation pipeline.
+
+Renders the paper plots (accuracy vs price, domain heatmap, difficulty
+breakdown, top-N accuracy, open-weight models, dataset composition) from
+the same results matrix the metrics use. Each figure is reduced to a small
+JSON-able data dict first; its hash (together with this module's source)
+is recorded in a manifest, and figures whose data did not change are not
+re-rendered. Changed figures are rendered across a process pool.
+
+Requires matplotlib; without it, available() is False and the pipeline
+skips the figures.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from question_index import LETTERS, QuestionIndex
+from results_matrix import ResultsMatrix
+
+FIGURES_MANIFEST = ".figures_manifest.json"
+
+# Rendering code version: figures are redrawn when this module changes
+FIGURES_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+
+FONTS_DIR = Path(__file__).parent.parent / "assets" / "fonts"
+
+OPEN_COLOR = "#1f77b4"
+CLOSED_COLOR = "#ff7f0e"
+UNKNOWN_COLOR = "#7f7f7f"
+
+
+def _pyplot():
+    """Import pyplot with the non-interactive backend (None if matplotlib is missing)."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from matplotlib import font_manager
+    except ImportError:
+        return None
+
+    # Use the repo's Noto Sans (as in leaderboard.pdf) when available
+    regular = FONTS_DIR / "NotoSans-Regular.ttf"
+    if regular.exists() and "Noto Sans" not in plt.rcParams["font.family"]:
+        for font in FONTS_DIR.glob("NotoSans-*.ttf"):
+            font_manager.fontManager.addfont(str(font))
+        plt.rcParams["font.family"] = "Noto Sans"
+    plt.rcParams["axes.unicode_minus"] = False
+    plt.rcParams["pdf.fonttype"] = 42
+    return plt
+
+
+def available() -> bool:
+    """True if matplotlib is installed."""
+    return _pyplot() is not None
+
+
+# =============================================================================
+# Figure data: plain lists derived from the results matrix
+# =============================================================================
+
+def _model_rows(matrix: ResultsMatrix, metadata: dict[str, dict]) -> list[dict]:
+    """Per-model accuracy and metadata, sorted by accuracy (descending)."""
+    answered = matrix.answered.sum(axis=1)
+    correct = matrix.correct.sum(axis=1)
+    accuracy = np.divide(correct, answered, out=np.zeros(len(matrix), dtype=float), where=answered > 0)
+
+    rows = []
+    for row in np.argsort(-accuracy, kind="stable"):
+        model = matrix.models[row]
+        meta = metadata.get(model, {})
+        rows.append({
+            "row": int(row),
+            "model": model,
+            "accuracy": round(float(accuracy[row]) * 100, 2),
+            "open_weight": meta.get("open_weight"),
+            "price_input": meta.get("price_input"),
+            "price_output": meta.get("price_output"),
+        })
+    return rows
+
+
+def _top_accuracy_data(rows: list[dict], top_n: int) -> dict:
+    top = rows[:top_n]
+    return {
+        "title": f"Top {len(top)} models by accuracy",
+        "models": [r["model"] for r in top],
+        "accuracy": [r["accuracy"] for r in top],
+        "open_weight": [r["open_weight"] for r in top],
+    }
+
+
+def figure_data(matrix: ResultsMatrix, metadata: dict[str, dict]) -> dict[str, dict]:
+    """
+    Reduce the results to the data each figure plots.
+
+    Args:
+        matrix: Results matrix of all runs
+        metadata: Model name -> {'open_weight', 'price_input', 'price_output'}
+
+    Returns:
+        Dict figure name -> data dict (JSON-serializable)
+    """
+    rows = _model_rows(matrix, metadata)
+    index = matrix.questions
+    data = {}
+
+    priced = [r for r in rows if r["price_input"] is not None and r["price_output"] is not None]
+    data["accuracy_vs_price"] = {
+        "models": [r["model"] for r in priced],
+        "accuracy": [r["accuracy"] for r in priced],
+        "price": [round((r["price_input"] + r["price_output"]) / 2, 4) for r in priced],
+        "open_weight": [r["open_weight"] for r in priced],
+    }
+
+    labels, correct, total = matrix.domain_counts()
+    top = rows[:15]
+    cells = [
+        [
+            round(100 * int(correct[r["row"], j]) / int(total[r["row"], j]), 1) if total[r["row"], j] else None
+            for j in range(len(labels))
+        ]
+        for r in top
+    ]
+    data["domain_heatmap"] = {"models": [r["model"] for r in top], "domains": list(labels), "accuracy": cells}
+
+    # Difficulty accuracy averaged over model tiers (thirds of the ranking)
+    labels, correct, total = matrix.difficulty_counts()
+    tiers = {}
+    for name, tier in zip(("Top tier", "Middle tier", "Bottom tier"), np.array_split(np.arange(len(rows)), 3)):
+        if len(tier) == 0:
+            continue
+        members = [rows[i]["row"] for i in tier]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            per_model = np.where(total[members] > 0, correct[members] / total[members], np.nan)
+        tiers[name] = [round(float(v) * 100, 2) if not np.isnan(v) else None for v in np.nanmean(per_model, axis=0)]
+    data["difficulty_breakdown"] = {"difficulties": list(labels), "tiers": tiers}
+
+    data["top20_accuracy"] = _top_accuracy_data(rows, 20)
+    data["top30_accuracy"] = _top_accuracy_data(rows, 30)
+
+    open_rows = [r for r in rows if r["open_weight"] is True]
+    data["open_weight_models"] = {
+        "models": [r["model"] for r in open_rows],
+        "accuracy": [r["accuracy"] for r in open_rows],
+    }
+
+    data["dataset_composition"] = _dataset_composition(index)
+    return data
+
+
+def _dataset_composition(index: QuestionIndex) -> dict:
+    domain_counts = index.domains.sum(axis=0)
+    order = np.argsort(-domain_counts, kind="stable")
+    difficulty_counts = np.bincount(index.difficulty, minlength=len(index.difficulty_labels))
+    position_counts = np.bincount(index.answer_index, minlength=len(LETTERS))[:len(LETTERS)]
+    return {
+        "domains": [index.domain_labels[i] for i in order],
+        "domain_counts": [int(domain_counts[i]) for i in order],
+        "difficulties": list(index.difficulty_labels),
+        "difficulty_counts": difficulty_counts.tolist(),
+        "positions": list(LETTERS),
+        "position_counts": position_counts.tolist(),
+    }
+
+
+def data_hash(data: dict) -> str:
+    """Hash of a figure's data and the rendering code version."""
+    canonical = json.dumps({"version": FIGURES_VERSION, "data": data}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# =============================================================================
+# Rendering (runs in worker processes)
+# =============================================================================
+
+def _bar_colors(open_weight: list) -> list[str]:
+    return [OPEN_COLOR if o is True else CLOSED_COLOR if o is False else UNKNOWN_COLOR for o in open_weight]
+
+
+def _open_weight_legend(ax, **kwargs) -> None:
+    from matplotlib.patches import Patch
+    ax.legend(handles=[
+        Patch(color=OPEN_COLOR, label="Open weight"),
+        Patch(color=CLOSED_COLOR, label="Closed"),
+    ], **kwargs)
+
+
+def _render_accuracy_vs_price(plt, data: dict):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.scatter(data["price"], data["accuracy"], c=_bar_colors(data["open_weight"]), s=40)
+    for model, x, y in zip(data["models"], data["price"], data["accuracy"]):
+        ax.annotate(model, (x, y), fontsize=6, xytext=(3, 3), textcoords="offset points")
+    ax.set_xscale("symlog", linthresh=0.1)
+    ax.xaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f"{x:g}"))
+    ax.set_xlabel("Average price ($ per million tokens, mean of input and output)")
+    ax.set_ylabel("Accuracy (%)")
+    ax.grid(alpha=0.3)
+    _open_weight_legend(ax, loc="lower right")
+    return fig
+
+
+def _render_domain_heatmap(plt, data: dict):
+    values = np.array([[np.nan if v is None else v for v in row] for row in data["accuracy"]], dtype=float)
+    fig, ax = plt.subplots(figsize=(10, max(3, 0.4 * len(data["models"]) + 1.5)))
+    image = ax.imshow(values, cmap="RdYlGn", vmin=np.nanmin(values) if values.size else 0, vmax=100, aspect="auto")
+    ax.set_xticks(range(len(data["domains"])), data["domains"], rotation=30, ha="right", fontsize=8)
+    ax.set_yticks(range(len(data["models"])), data["models"], fontsize=8)
+    for (i, j), value in np.ndenumerate(values):
+        if not np.isnan(value):
+            ax.text(j, i, f"{value:.0f}", ha="center", va="center", fontsize=7)
+    fig.colorbar(image, ax=ax, label="Accuracy (%)")
+    return fig
+
+
+def _render_difficulty_breakdown(plt, data: dict):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    difficulties = data["difficulties"]
+    width = 0.8 / max(1, len(data["tiers"]))
+    for k, (tier, values) in enumerate(data["tiers"].items()):
+        positions = np.arange(len(difficulties)) + k * width
+        ax.bar(positions, [v if v is not None else 0 for v in values], width, label=tier)
+    ax.set_xticks(np.arange(len(difficulties)) + width * (len(data["tiers"]) - 1) / 2, difficulties)
+    ax.set_ylabel("Mean accuracy (%)")
+    ax.set_ylim(0, 100)
+    ax.legend()
+    ax.grid(axis="y", alpha=0.3)
+    return fig
+
+
+def _render_top_accuracy(plt, data: dict):
+    fig, ax = plt.subplots(figsize=(10, max(3, 0.3 * len(data["models"]) + 1)))
+    positions = np.arange(len(data["models"]))[::-1]
+    ax.barh(positions, data["accuracy"], color=_bar_colors(data["open_weight"]))
+    ax.set_yticks(positions, data["models"], fontsize=8)
+    for y, value in zip(positions, data["accuracy"]):
+        ax.text(value + 0.3, y, f"{value:.1f}%", va="center", fontsize=7)
+    ax.set_xlabel("Accuracy (%)")
+    ax.set_xlim(0, 105)
+    ax.set_title(data["title"])
+    _open_weight_legend(ax, loc="lower right")
+    return fig
+
+
+def _render_open_weight_models(plt, data: dict):
+    fig, ax = plt.subplots(figsize=(10, max(3, 0.3 * len(data["models"]) + 1)))
+    positions = np.arange(len(data["models"]))[::-1]
+    colors = plt.cm.Blues(np.interp(data["accuracy"], (min(data["accuracy"], default=0), 100), (0.35, 1.0)))
+    ax.barh(positions, data["accuracy"], color=colors)
+    ax.set_yticks(positions, data["models"], fontsize=8)
+    for y, value in zip(positions, data["accuracy"]):
+        ax.text(value + 0.3, y, f"{value:.1f}%", va="center", fontsize=7)
+    ax.set_xlabel("Accuracy (%)")
+    ax.set_xlim(0, 105)
+    return fig
+
+
+def _render_dataset_composition(plt, data: dict):
+    fig, axes = plt.subplots(1, 3, figsize=(14, 4.5))
+    axes[0].barh(data["domains"][::-1], data["domain_counts"][::-1], color=OPEN_COLOR)
+    axes[0].set_title("(a) Questions by domain")
+    axes[1].bar(data["difficulties"], data["difficulty_counts"], color=OPEN_COLOR)
+    axes[1].set_title("(b) Difficulty")
+    total = sum(data["position_counts"]) or 1
+    axes[2].bar(data["positions"], [100 * c / total for c in data["position_counts"]], color=OPEN_COLOR)
+    axes[2].axhline(100 / len(data["positions"]), color="black", linestyle="--", linewidth=1)
+    axes[2].set_ylabel("Share of answers (%)")
+    axes[2].set_title("(c) Correct answer position")
+    return fig
+
+
+RENDERERS = {
+    "accuracy_vs_price": _render_accuracy_vs_price,
+    "domain_heatmap": _render_domain_heatmap,
+    "difficulty_breakdown": _render_difficulty_breakdown,
+    "top20_accuracy": _render_top_accuracy,
+    "top30_accuracy": _render_top_accuracy,
+    "open_weight_models": _render_open_weight_models,
+    "dataset_composition": _render_dataset_composition,
+}
+
+
+def render_figure(name: str, data: dict, output_path: Path) -> float:
+    """Render one figure to PDF; returns the elapsed seconds."""
+    start = time.perf_counter()
+    plt = _pyplot()
+    fig = RENDERERS[name](plt, data)
+    fig.tight_layout()
+    tmp_path = output_path.with_name(output_path.stem + ".tmp" + output_path.suffix)
+    # No creation date, so unchanged figures are byte-identical
+    fig.savefig(tmp_path, metadata={"CreationDate": None})
+    plt.close(fig)
+    os.replace(tmp_path, output_path)
+    return time.perf_counter() - start
+
+
+def _render_task(task: tuple[str, dict, Path]) -> tuple[str, float]:
+    name, data, output_path = task
+    return name, render_figure(name, data, output_path)
+
+
+def generate_figures(
+    matrix: ResultsMatrix,
+    output_dir: Path,
+    metadata: dict[str, dict],
+    jobs: int = 1,
+) -> dict:
+    """
+    Render the paper figures whose data changed since the last call.
+
+    Args:
+        matrix: Results matrix of all runs
+        output_dir: Figure directory (PDFs plus the hash manifest)
+        metadata: Model name -> {'open_weight', 'price_input', 'price_output'}
+        jobs: Worker processes for rendering (1 = serial, in this process)
+
+    Returns:
+        Dict with 'paths' (figure name -> PDF), 'rendered' (name -> seconds)
+        and 'skipped' (names whose data hash was unchanged)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / FIGURES_MANIFEST
+    manifest = {}
+    if manifest_path.exists():
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            manifest = {}
+
+    paths = {}
+    hashes = {}
+    tasks = []
+    skipped = []
+    for name, data in figure_data(matrix, metadata).items():
+        paths[name] = output_dir / f"{name}.pdf"
+        hashes[name] = data_hash(data)
+        if manifest.get(name) == hashes[name] and paths[name].exists():
+            skipped.append(name)
+        else:
+            tasks.append((name, data, paths[name]))
+
+    rendered = {}
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            name, elapsed = _render_task(task)
+            rendered[name] = elapsed
+    else:
+        # Import matplotlib once here so forked workers inherit it
+        _pyplot()
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+            for name, elapsed in executor.map(_render_task, tasks):
+                rendered[name] = elapsed
+
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(hashes, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    return {"paths": paths, "rendered": rendered, "skipped": skipped}
@@ -6,8 +6,25 @@ Includes accuracy, confidence intervals, breakdowns, and bias analysis.
 
 import math
 from collections import defaultdict
+from functools import lru_cache
 
-from extraction import extract_answer, check_answer
+import numpy as np
+
+from extraction import extract_response, extract_responses, check_answer
+from question_index import LETTERS, QuestionIndex, question_index
+from results_matrix import ResultsMatrix
+
+
+@lru_cache(maxsize=None)
+def z_score(alpha: float) -> float:
+    """Two-sided normal quantile for significance level alpha."""
+    # Use scipy if available, otherwise fallback to approximation
+    try:
+        from scipy.stats import norm
+        return norm.ppf(1 - alpha / 2)
+    except ImportError:
+        # z for 95% CI
+        return 1.96
 
 
 def compute_wilson_ci(n_correct: int, n_total: int, alpha: float = 0.05) -> tuple[float, float]:
@@ -25,14 +42,7 @@ def compute_wilson_ci(n_correct: int, n_total: int, alpha: float = 0.05) -> tupl
     if n_total == 0:
         return 0.0, 0.0
 
-    # Use scipy if available, otherwise fallback to approximation
-    try:
-        from scipy.stats import norm
-        z = norm.ppf(1 - alpha / 2)
-    except ImportError:
-        # z for 95% CI
-        z = 1.96
-
+    z = z_score(alpha)
     p = n_correct / n_total
     n = n_total
 
@@ -46,36 +56,37 @@ def compute_wilson_ci(n_correct: int, n_total: int, alpha: float = 0.05) -> tupl
     return lower, upper
 
 
-def compute_accuracy(responses: list[dict], questions: list[dict]) -> dict:
+def compute_accuracy(responses: list[dict], questions: list[dict] | QuestionIndex) -> dict:
     """
     Compute overall accuracy metrics.
 
     Args:
         responses: List of API response dicts with 'question_id', 'raw_response'
-        questions: List of question dicts with 'id', 'answer_index'
+        questions: QuestionIndex or list of question dicts
 
     Returns:
         Dict with accuracy metrics
     """
-    # Build question lookup by id
-    q_by_id = {q["id"]: q for q in questions}
+    index = question_index(questions)
 
     correct = 0
     failed_extractions = 0
     pattern_counts = defaultdict(int)
     results_by_qid = {}
 
-    for resp in responses:
+    # Extract all answers in one batch (persisted results are reused)
+    extracted = extract_responses(responses)
+
+    for resp, (predicted, pattern) in zip(responses, extracted):
         qid = resp["question_id"]
-        q = q_by_id.get(qid)
-        if q is None:
+        record = index.get(qid)
+        if record is None:
             continue
 
         raw = resp.get("raw_response", "")
-        predicted, pattern = extract_answer(raw)
         pattern_counts[pattern] += 1
 
-        is_correct = check_answer(predicted, q["answer_index"])
+        is_correct = check_answer(predicted, record.answer_index)
         if is_correct:
             correct += 1
 
@@ -87,6 +98,8 @@ def compute_accuracy(responses: list[dict], questions: list[dict]) -> dict:
             "correct": is_correct,
             "raw_response": raw,
             "extraction_pattern": pattern,
+            "latency_ms": resp.get("latency_ms"),
+            "tokens": (resp.get("usage") or {}).get("total_tokens"),
         }
 
     total = len(responses)
@@ -105,8 +118,107 @@ def compute_accuracy(responses: list[dict], questions: list[dict]) -> dict:
     }
 
 
+def _difficulty_breakdown(matrix: ResultsMatrix, row: int) -> dict[str, dict]:
+    """Format difficulty counts of one matrix row as a breakdown dict."""
+    labels, correct_counts, total_counts = matrix.difficulty_counts()
+    breakdown = {}
+
+    for j, level in enumerate(labels):
+        total = int(total_counts[row, j])
+        if total == 0:
+            continue
+        correct = int(correct_counts[row, j])
+        ci_lower, ci_upper = compute_wilson_ci(correct, total)
+        breakdown[level] = {
+            "correct": correct,
+            "total": total,
+            "accuracy": correct / total,
+            "ci_lower": ci_lower,
+            "ci_upper": ci_upper,
+        }
+
+    return breakdown
+
+
+def _domain_breakdown(matrix: ResultsMatrix, row: int) -> dict[str, dict]:
+    """Format domain counts of one matrix row as a breakdown dict."""
+    labels, correct_counts, total_counts = matrix.domain_counts()
+    breakdown = {}
+
+    for j, domain in enumerate(labels):
+        total = int(total_counts[row, j])
+        if total == 0:
+            continue
+        correct = int(correct_counts[row, j])
+        breakdown[domain] = {
+            "correct": correct,
+            "total": total,
+            "accuracy": correct / total,
+        }
+
+    return breakdown
+
+
+def _bias_level(deviation: float) -> str:
+    """Classify a deviation from the no-bias expectation as low/medium/high."""
+    if deviation <= 0.05:
+        return "low"
+    elif deviation <= 0.10:
+        return "medium"
+    return "high"
+
+
+def _position_bias(counts: dict[str, int]) -> dict:
+    """Format A/B/C/D counts as position bias metrics."""
+    valid_total = sum(counts.values())
+
+    percentages = {}
+    for letter, count in counts.items():
+        percentages[letter] = count / valid_total if valid_total > 0 else 0.0
+
+    # Compute bias level (deviation from uniform 25%)
+    max_deviation = max(abs(p - 0.25) for p in percentages.values())
+
+    return {
+        "counts": counts,
+        "percentages": percentages,
+        "bias_level": _bias_level(max_deviation),
+    }
+
+
+def _length_bias(longest_picked: int, valid_total: int, correct_is_longest: int) -> dict:
+    """Format longest-choice counts as length bias metrics."""
+    rate = longest_picked / valid_total if valid_total > 0 else 0.0
+    benchmark_rate = correct_is_longest / valid_total if valid_total > 0 else 0.0
+
+    # Interpretation:
+    # - vs_random: How much above random (25%) the model picks longest
+    # - vs_benchmark: How much above/below the benchmark correct-is-longest rate
+    return {
+        "longest_picked_count": longest_picked,
+        "total": valid_total,
+        "longest_picked_rate": rate,
+        "vs_random": rate - 0.25,
+        "benchmark_correct_is_longest_rate": benchmark_rate,
+        "vs_benchmark": rate - benchmark_rate,
+        "bias_level": _bias_level(abs(rate - 0.25)),
+    }
+
+
+def _matrix_position_bias(matrix: ResultsMatrix, row: int) -> dict:
+    """Position bias of one matrix row."""
+    counts = matrix.position_counts()[row]
+    return _position_bias({letter: int(counts[i]) for i, letter in enumerate(LETTERS)})
+
+
+def _matrix_length_bias(matrix: ResultsMatrix, row: int) -> dict:
+    """Length bias of one matrix row."""
+    longest_picked, valid_total, correct_is_longest = matrix.length_counts()
+    return _length_bias(int(longest_picked[row]), int(valid_total[row]), int(correct_is_longest[row]))
+
+
 def compute_difficulty_breakdown(
-    results_by_qid: dict, questions: list[dict]
+    results_by_qid: dict, questions: list[dict] | QuestionIndex
 ) -> dict[str, dict]:
     """
     Compute accuracy breakdown by difficulty level.
@@ -114,33 +226,11 @@ def compute_difficulty_breakdown(
     Returns:
         Dict mapping difficulty -> {accuracy, correct, total}
     """
-    q_by_id = {q["id"]: q for q in questions}
-    breakdown = defaultdict(lambda: {"correct": 0, "total": 0})
-
-    for qid, result in results_by_qid.items():
-        q = q_by_id.get(qid)
-        if q is None:
-            continue
-
-        difficulty = q.get("difficulty", "unknown")
-        breakdown[difficulty]["total"] += 1
-        if result["correct"]:
-            breakdown[difficulty]["correct"] += 1
-
-    # Calculate accuracies
-    for level, data in breakdown.items():
-        total = data["total"]
-        correct = data["correct"]
-        data["accuracy"] = correct / total if total > 0 else 0.0
-        ci_lower, ci_upper = compute_wilson_ci(correct, total)
-        data["ci_lower"] = ci_lower
-        data["ci_upper"] = ci_upper
-
-    return dict(breakdown)
+    return _difficulty_breakdown(ResultsMatrix.from_answers(results_by_qid, questions), 0)
 
 
 def compute_domain_breakdown(
-    results_by_qid: dict, questions: list[dict]
+    results_by_qid: dict, questions: list[dict] | QuestionIndex
 ) -> dict[str, dict]:
     """
     Compute accuracy breakdown by domain.
@@ -150,27 +240,7 @@ def compute_domain_breakdown(
     Returns:
         Dict mapping domain -> {accuracy, correct, total}
     """
-    q_by_id = {q["id"]: q for q in questions}
-    breakdown = defaultdict(lambda: {"correct": 0, "total": 0})
-
-    for qid, result in results_by_qid.items():
-        q = q_by_id.get(qid)
-        if q is None:
-            continue
-
-        domains = q.get("domains", [])
-        for domain in domains:
-            breakdown[domain]["total"] += 1
-            if result["correct"]:
-                breakdown[domain]["correct"] += 1
-
-    # Calculate accuracies
-    for domain, data in breakdown.items():
-        total = data["total"]
-        correct = data["correct"]
-        data["accuracy"] = correct / total if total > 0 else 0.0
-
-    return dict(breakdown)
+    return _domain_breakdown(ResultsMatrix.from_answers(results_by_qid, questions), 0)
 
 
 def compute_position_bias(results_by_qid: dict) -> dict:
@@ -180,37 +250,17 @@ def compute_position_bias(results_by_qid: dict) -> dict:
     Returns:
         Dict with counts and percentages for each position
     """
-    counts = {"A": 0, "B": 0, "C": 0, "D": 0}
-    valid_total = 0
-
+    counts = {letter: 0 for letter in LETTERS}
     for result in results_by_qid.values():
         predicted = result.get("predicted")
         if predicted in counts:
             counts[predicted] += 1
-            valid_total += 1
-
-    percentages = {}
-    for letter, count in counts.items():
-        percentages[letter] = count / valid_total if valid_total > 0 else 0.0
 
-    # Compute bias level (deviation from uniform 25%)
-    max_deviation = max(abs(p - 0.25) for p in percentages.values())
-    if max_deviation <= 0.05:
-        bias_level = "low"
-    elif max_deviation <= 0.10:
-        bias_level = "medium"
-    else:
-        bias_level = "high"
-
-    return {
-        "counts": counts,
-        "percentages": percentages,
-        "bias_level": bias_level,
-    }
+    return _position_bias(counts)
 
 
 def compute_length_bias(
-    results_by_qid: dict, questions: list[dict]
+    results_by_qid: dict, questions: list[dict] | QuestionIndex
 ) -> dict:
     """
     Compute how often the model picks the longest answer choice.
@@ -218,52 +268,10 @@ def compute_length_bias(
     Returns:
         Dict with length bias metrics
     """
-    q_by_id = {q["id"]: q for q in questions}
-    longest_picked = 0
-    valid_total = 0
-    correct_is_longest = 0
-
-    for qid, result in results_by_qid.items():
-        q = q_by_id.get(qid)
-        if q is None:
-            continue
+    return _matrix_length_bias(ResultsMatrix.from_answers(results_by_qid, questions), 0)
 
-        predicted = result.get("predicted")
-        if predicted is None:
-            continue
-
-        valid_total += 1
-        choices = q["choices"]
-        lengths = [len(c) for c in choices]
-        longest_idx = lengths.index(max(lengths))
 
-        predicted_idx = ord(predicted) - ord('A')
-        if predicted_idx == longest_idx:
-            longest_picked += 1
-
-        # Also track benchmark baseline (how often correct IS longest)
-        correct_idx = q["answer_index"]
-        if correct_idx == longest_idx:
-            correct_is_longest += 1
-
-    rate = longest_picked / valid_total if valid_total > 0 else 0.0
-    benchmark_rate = correct_is_longest / valid_total if valid_total > 0 else 0.0
-
-    # Interpretation:
-    # - vs_random: How much above random (25%) the model picks longest
-    # - vs_benchmark: How much above/below the benchmark correct-is-longest rate
-    return {
-        "longest_picked_count": longest_picked,
-        "total": valid_total,
-        "longest_picked_rate": rate,
-        "vs_random": rate - 0.25,
-        "benchmark_correct_is_longest_rate": benchmark_rate,
-        "vs_benchmark": rate - benchmark_rate,
-        "bias_level": "low" if abs(rate - 0.25) <= 0.05 else ("medium" if abs(rate - 0.25) <= 0.10 else "high"),
-    }
-
-
-def compute_all_metrics(responses: list[dict], questions: list[dict]) -> dict:
+def compute_all_metrics(responses: list[dict], questions: list[dict] | QuestionIndex) -> dict:
     """
     Compute all metrics for a model evaluation run.
 
@@ -273,10 +281,12 @@ def compute_all_metrics(responses: list[dict], questions: list[dict]) -> dict:
     accuracy_metrics = compute_accuracy(responses, questions)
     results_by_qid = accuracy_metrics.pop("results_by_qid")
 
-    difficulty = compute_difficulty_breakdown(results_by_qid, questions)
-    domain = compute_domain_breakdown(results_by_qid, questions)
-    position = compute_position_bias(results_by_qid)
-    length = compute_length_bias(results_by_qid, questions)
+    # One results matrix row feeds every breakdown
+    matrix = ResultsMatrix.from_answers(results_by_qid, questions)
+    difficulty = _difficulty_breakdown(matrix, 0)
+    domain = _domain_breakdown(matrix, 0)
+    position = _matrix_position_bias(matrix, 0)
+    length = _matrix_length_bias(matrix, 0)
 
     return {
         **accuracy_metrics,
@@ -295,8 +305,153 @@ def compute_all_metrics(responses: list[dict], questions: list[dict]) -> dict:
     }
 
 
+class OnlineMetrics:
+    """
+    Run metrics accumulated one response at a time.
+
+    Providers call update() as each response arrives, so accuracy, its Wilson
+    CI and the breakdown counters are available while a run is in progress.
+    Each update is O(1) in the number of questions; finalize() returns the
+    same dict as compute_all_metrics() on the collected responses.
+    """
+
+    def __init__(self, questions: list[dict] | QuestionIndex):
+        self.questions = question_index(questions)
+        index = self.questions
+
+        self.correct = 0
+        self.total = 0
+        self.failed_extractions = 0
+        self.results_by_qid = {}
+
+        self.difficulty_correct = [0] * len(index.difficulty_labels)
+        self.difficulty_total = [0] * len(index.difficulty_labels)
+        self.domain_correct = [0] * len(index.domain_labels)
+        self.domain_total = [0] * len(index.domain_labels)
+        self.position_counts = {letter: 0 for letter in LETTERS}
+        self.longest_picked = 0
+        self.valid_total = 0
+        self.correct_is_longest = 0
+
+    def update(self, response: dict) -> None:
+        """Add one API response dict with 'question_id' and 'raw_response'."""
+        self.total += 1
+        record = self.questions.get(response["question_id"])
+        if record is None:
+            return
+
+        predicted, pattern = extract_response(response)
+        answer_index = record.answer_index
+        is_correct = check_answer(predicted, answer_index)
+
+        self.correct += is_correct
+        if predicted is None:
+            self.failed_extractions += 1
+
+        self.results_by_qid[response["question_id"]] = {
+            "predicted": predicted,
+            "correct": is_correct,
+            "raw_response": response.get("raw_response", ""),
+            "extraction_pattern": pattern,
+            "latency_ms": response.get("latency_ms"),
+            "tokens": (response.get("usage") or {}).get("total_tokens"),
+        }
+
+        level = self.questions.difficulty[record.column]
+        self.difficulty_total[level] += 1
+        self.difficulty_correct[level] += is_correct
+        for domain in self.questions.domain_columns[record.column]:
+            self.domain_total[domain] += 1
+            self.domain_correct[domain] += is_correct
+
+        if predicted in self.position_counts:
+            self.position_counts[predicted] += 1
+            self.valid_total += 1
+            self.longest_picked += LETTERS.index(predicted) == record.longest_index
+            self.correct_is_longest += answer_index == record.longest_index
+
+    @property
+    def accuracy(self) -> float:
+        return self.correct / self.total if self.total > 0 else 0.0
+
+    def summary(self) -> str:
+        """Short live status, e.g. for a progress bar postfix."""
+        ci_lower, ci_upper = compute_wilson_ci(self.correct, self.total)
+        return (
+            f"acc={self.accuracy*100:.1f}% "
+            f"[{ci_lower*100:.1f}-{ci_upper*100:.1f}] "
+            f"fail={self.failed_extractions}"
+        )
+
+    def finalize(self) -> dict:
+        """Return the complete metrics dict (same as compute_all_metrics)."""
+        ci_lower, ci_upper = compute_wilson_ci(self.correct, self.total)
+
+        # Answers (and pattern counts) in benchmark order, matching a batch
+        # run over the question list regardless of completion order
+        answers = {qid: self.results_by_qid[qid] for qid in self.questions.ids if qid in self.results_by_qid}
+        pattern_counts = defaultdict(int)
+        for result in answers.values():
+            pattern_counts[result["extraction_pattern"]] += 1
+
+        difficulty = {}
+        for j, level in enumerate(self.questions.difficulty_labels):
+            total = self.difficulty_total[j]
+            if total == 0:
+                continue
+            correct = self.difficulty_correct[j]
+            lower, upper = compute_wilson_ci(correct, total)
+            difficulty[level] = {
+                "correct": correct,
+                "total": total,
+                "accuracy": correct / total,
+                "ci_lower": lower,
+                "ci_upper": upper,
+            }
+
+        domain = {}
+        for j, label in enumerate(self.questions.domain_labels):
+            total = self.domain_total[j]
+            if total == 0:
+                continue
+            correct = self.domain_correct[j]
+            domain[label] = {
+                "correct": correct,
+                "total": total,
+                "accuracy": correct / total,
+            }
+
+        position = _position_bias(dict(self.position_counts))
+        length = _length_bias(self.longest_picked, self.valid_total, self.correct_is_longest)
+
+        return {
+            "accuracy": self.accuracy,
+            "correct": self.correct,
+            "total": self.total,
+            "failed_extractions": self.failed_extractions,
+            "ci_lower": ci_lower,
+            "ci_upper": ci_upper,
+            "extraction_patterns": dict(pattern_counts),
+            "by_difficulty": difficulty,
+            "by_domain": domain,
+            "answer_distribution": position["percentages"],
+            "bias_analysis": {
+                "position_bias": position["bias_level"],
+                "position_distribution": position["counts"],
+                "length_bias_raw": length["longest_picked_rate"],
+                "length_bias_vs_random": length["vs_random"],
+                "length_bias_vs_benchmark": length["vs_benchmark"],
+                "length_bias_level": length["bias_level"],
+            },
+            "answers": answers,
+        }
+
+
 def find_hardest_questions(
-    all_runs: list[dict], questions: list[dict], top_n: int = 10
+    all_runs: list[dict],
+    questions: list[dict] | QuestionIndex,
+    top_n: int = 10,
+    matrix: ResultsMatrix | None = None,
 ) -> list[dict]:
     """
     Find questions that were failed by the most models.
@@ -305,38 +460,36 @@ def find_hardest_questions(
         all_runs: List of run results with 'answers' dict
         questions: List of question dicts
         top_n: Number of hardest questions to return
+        matrix: Results matrix of all_runs (built if not given)
 
     Returns:
-        List of dicts with question info and failure counts
+        List of dicts with question info and failure counts.
+        Ties keep benchmark order.
     """
-    q_by_id = {q["id"]: q for q in questions}
-    failure_counts = defaultdict(int)
-    model_answers = defaultdict(dict)
-
-    for run in all_runs:
-        model = run.get("model", "unknown")
-        answers = run.get("answers", {})
-        for qid, result in answers.items():
-            if not result.get("correct", False):
-                failure_counts[qid] += 1
-            model_answers[qid][model] = result.get("predicted")
-
-    # Sort by failure count (most failed first)
-    sorted_questions = sorted(failure_counts.items(), key=lambda x: -x[1])
+    if matrix is None:
+        matrix = ResultsMatrix.from_runs(all_runs, questions)
 
+    failures = matrix.failure_counts()
     hardest = []
-    for qid, fail_count in sorted_questions[:top_n]:
-        q = q_by_id.get(qid, {})
+    for col in matrix.hardest_columns(top_n):
+        record = matrix.questions.records[col]
+        answered_rows = np.flatnonzero(matrix.answered[:, col])
+        model_answers = {}
+        for row in answered_rows:
+            code = int(matrix.predicted[row, col])
+            model_answers[matrix.models[row]] = LETTERS[code] if code >= 0 else None
+
         hardest.append({
-            "question_id": qid,
-            "question": q.get("question", ""),
-            "choices": q.get("choices", []),
-            "correct_answer": chr(ord('A') + q.get("answer_index", 0)),
-            "difficulty": q.get("difficulty", "unknown"),
-            "topics": q.get("topics", []),
-            "models_failed": fail_count,
-            "total_models": len(all_runs),
-            "model_answers": model_answers.get(qid, {}),
+            "question_id": record.id,
+            "question": record.question,
+            "choices": list(record.choices),
+            "correct_answer": record.correct_letter,
+            "difficulty": record.difficulty,
+            "topics": list(record.topics),
+            "models_failed": int(failures[col]),
+            # Runs with a result for this question (subset runs may lack one)
+            "total_models": len(answered_rows),
+            "model_answers": model_answers,
         })
 
     return hardest
@@ -5,13 +5,18 @@ Handles API calls, retries, and response caching.
 """
 
 import asyncio
-import json
 import os
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
 from openai import AsyncAzureOpenAI, APIError, APITimeoutError, RateLimitError
 
+from extraction import extract_answer, extraction_record
+from metrics import OnlineMetrics
+from question_index import QuestionIndex, QuestionRecord, question_index
+from response_cache import RequestCache, request_fingerprint
+
 
 # System prompt - strict format to minimize parsing issues
 SYSTEM_PROMPT = """You are taking a multiple-choice exam on Oil & Gas geoscience.
@@ -30,6 +35,7 @@ class AzureOpenAIProvider:
         cache_dir: Path | None = None,
         max_retries: int = 3,
         timeout: float = 30.0,
+        reuse_legacy_cache: bool = True,
     ):
         """
         Initialize Azure OpenAI provider.
@@ -41,6 +47,9 @@ class AzureOpenAIProvider:
             cache_dir: Directory for caching responses
             max_retries: Maximum retry attempts
             timeout: Request timeout in seconds
+            reuse_legacy_cache: Reuse responses cached before request
+                fingerprints when their recorded model and parameters match
+                (False re-sends those requests)
         """
         self.client = AsyncAzureOpenAI(
             azure_endpoint=endpoint,
@@ -50,17 +59,16 @@ class AzureOpenAIProvider:
         )
         self.cache_dir = cache_dir
         self.max_retries = max_retries
+        self._cache = RequestCache(reuse_legacy=reuse_legacy_cache)
 
-    def _get_cache_path(self, model: str, question_id: str) -> Path | None:
-        """Get cache file path for a model/question pair."""
+    def _get_cache_dir(self, model: str) -> Path | None:
+        """Get the cache directory of a model (deployment or cache key)."""
         if self.cache_dir is None:
             return None
 
-        # Sanitize question_id for filesystem (replace problematic chars)
-        safe_id = question_id.replace("/", "_").replace("\\", "_")
         model_cache_dir = self.cache_dir / model
         model_cache_dir.mkdir(parents=True, exist_ok=True)
-        return model_cache_dir / f"{safe_id}.json"
+        return model_cache_dir
 
     def load_cached(self, model: str, question_id: str) -> dict | None:
         """
@@ -69,41 +77,28 @@ class AzureOpenAIProvider:
         Returns:
             Cached response dict or None if not cached.
         """
-        cache_path = self._get_cache_path(model, question_id)
-        if cache_path is None or not cache_path.exists():
+        model_cache_dir = self._get_cache_dir(model)
+        if model_cache_dir is None:
             return None
+        return self._cache.load(model_cache_dir, question_id)
 
-        try:
-            with open(cache_path, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError):
+    def load_cached_request(self, model: str, question_id: str, fingerprint: str, request: dict) -> dict | None:
+        """Load the cached response for an exact request (see RequestCache.load_request)."""
+        model_cache_dir = self._get_cache_dir(model)
+        if model_cache_dir is None:
             return None
+        return self._cache.load_request(model_cache_dir, question_id, fingerprint, request)
 
     def save_to_cache(self, model: str, question_id: str, response: dict) -> None:
         """Save response to cache."""
-        cache_path = self._get_cache_path(model, question_id)
-        if cache_path is None:
-            return
-
-        with open(cache_path, "w") as f:
-            json.dump(response, f, indent=2)
-
-    def _format_prompt(self, question: dict) -> str:
-        """Format question into user prompt."""
-        choices = question["choices"]
-        return f"""{question["question"]}
-
-A) {choices[0]}
-B) {choices[1]}
-C) {choices[2]}
-D) {choices[3]}
-
-Answer:"""
+        model_cache_dir = self._get_cache_dir(model)
+        if model_cache_dir is not None:
+            self._cache.save(model_cache_dir, question_id, response)
 
     async def call_api(
         self,
         deployment: str,
-        question: dict,
+        question: QuestionRecord,
         temperature: float = 0,
         reasoning_effort: str | None = None,
         cache_key: str | None = None,
@@ -113,7 +108,7 @@ Answer:"""
 
         Args:
             deployment: Deployment name (e.g., "gpt-4o-mini")
-            question: Question dict with 'id', 'question', 'choices'
+            question: QuestionRecord with 'id' and the prebuilt 'prompt'
             temperature: Sampling temperature
             reasoning_effort: Reasoning effort for o-series models (low/medium/high)
             cache_key: Key for caching (defaults to deployment, use model name for variations)
@@ -121,15 +116,10 @@ Answer:"""
         Returns:
             Response dict with 'raw_response', 'usage', 'model', 'timestamp'
         """
-        question_id = question["id"]
+        question_id = question.id
         cache_key = cache_key or deployment
 
-        # Check cache first
-        cached = self.load_cached(cache_key, question_id)
-        if cached is not None:
-            return cached
-
-        user_prompt = self._format_prompt(question)
+        user_prompt = question.prompt
 
         # Build API call kwargs
         kwargs = {
@@ -148,11 +138,21 @@ Answer:"""
             kwargs["temperature"] = temperature
             kwargs["max_tokens"] = 50  # Short response expected for non-reasoning
 
+        # Check cache first (keyed by the exact request, question_id as secondary key)
+        fingerprint = request_fingerprint(kwargs)
+        cached = self.load_cached_request(cache_key, question_id, fingerprint, kwargs)
+        if cached is not None:
+            return cached
+
         # Retry logic with exponential backoff
         last_error = None
         for attempt in range(self.max_retries):
             try:
+                start = time.perf_counter()
                 response = await self.client.chat.completions.create(**kwargs)
+                latency_ms = round((time.perf_counter() - start) * 1000)
+
+                raw_content = response.choices[0].message.content or ""
 
                 result = {
                     "model": response.model,  # Actual model name from API
@@ -160,7 +160,10 @@ Answer:"""
                     "cache_key": cache_key,  # Cache key (model name with reasoning suffix)
                     "question_id": question_id,
                     "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "raw_response": response.choices[0].message.content or "",
+                    "raw_response": raw_content,
+                    "extraction": extraction_record(*extract_answer(raw_content)),
+                    "request_fingerprint": fingerprint,
+                    "latency_ms": latency_ms,
                     "reasoning_effort": reasoning_effort,
                     "usage": {
                         "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
@@ -197,24 +200,26 @@ Answer:"""
     async def evaluate_batch(
         self,
         deployment: str,
-        questions: list[dict],
+        questions: list[dict] | QuestionIndex,
         concurrency: int = 20,
         temperature: float = 0,
         reasoning_effort: str | None = None,
         cache_key: str | None = None,
         progress_callback: callable = None,
+        metrics: OnlineMetrics | None = None,
     ) -> list[dict]:
         """
         Evaluate a batch of questions with controlled concurrency.
 
         Args:
             deployment: Deployment name
-            questions: List of question dicts
+            questions: QuestionIndex or list of question dicts
             concurrency: Max concurrent requests
             temperature: Sampling temperature
             reasoning_effort: For o-series models
             cache_key: Key for caching (defaults to deployment)
             progress_callback: Optional callback(completed, total) for progress
+            metrics: Optional accumulator updated with each response as it completes
 
         Returns:
             List of response dicts in same order as questions
@@ -222,7 +227,7 @@ Answer:"""
         semaphore = asyncio.Semaphore(concurrency)
         completed = 0
 
-        async def process_one(q: dict) -> dict:
+        async def process_one(q: QuestionRecord) -> dict:
             nonlocal completed
             async with semaphore:
                 result = await self.call_api(
@@ -233,16 +238,19 @@ Answer:"""
                     cache_key=cache_key,
                 )
                 completed += 1
+                if metrics is not None:
+                    metrics.update(result)
                 if progress_callback:
                     progress_callback(completed, len(questions))
                 return result
 
-        tasks = [process_one(q) for q in questions]
+        tasks = [process_one(q) for q in question_index(questions).records]
         return await asyncio.gather(*tasks)
 
     async def close(self):
-        """Close the client connection."""
+        """Close the client connection and any open cache packs."""
         await self.client.close()
+        self._cache.close()
 
 
 # Factory function for creating provider from config
@@ -6,12 +6,17 @@ Supports 400+ models including DeepSeek, Llama, Qwen, Gemini, Claude, etc.
 """
 
 import asyncio
-import json
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
 from openai import AsyncOpenAI, APIError, APITimeoutError, RateLimitError
 
+from extraction import extract_answer, extraction_record
+from metrics import OnlineMetrics
+from question_index import QuestionIndex, QuestionRecord, question_index
+from response_cache import RequestCache, request_fingerprint
+
 
 # System prompt - strict format to minimize parsing issues
 SYSTEM_PROMPT = """You are taking a multiple-choice exam on Oil & Gas geoscience.
@@ -51,6 +56,7 @@ class OpenRouterProvider:
         timeout: float = 60.0,
         site_url: str = "https://github.com/FormationEval",
         site_name: str = "FormationEval Benchmark",
+        reuse_legacy_cache: bool = True,
     ):
         """
         Initialize OpenRouter provider.
@@ -62,6 +68,9 @@ class OpenRouterProvider:
             timeout: Request timeout in seconds
             site_url: Your site URL (for OpenRouter rankings)
             site_name: Your app name (for OpenRouter rankings)
+            reuse_legacy_cache: Reuse responses cached before request
+                fingerprints when their recorded model and parameters match
+                (False re-sends those requests)
         """
         self.client = AsyncOpenAI(
             base_url="https://openrouter.ai/api/v1",
@@ -74,59 +83,45 @@ class OpenRouterProvider:
         )
         self.cache_dir = cache_dir
         self.max_retries = max_retries
+        self._cache = RequestCache(reuse_legacy=reuse_legacy_cache)
 
     def _sanitize_model_name(self, model: str) -> str:
         """Sanitize model name for filesystem (replace / with _)."""
         return model.replace("/", "_").replace(":", "_")
 
-    def _get_cache_path(self, model: str, question_id: str) -> Path | None:
-        """Get cache file path for a model/question pair."""
+    def _get_cache_dir(self, model: str) -> Path | None:
+        """Get the cache directory of a model."""
         if self.cache_dir is None:
             return None
 
-        safe_model = self._sanitize_model_name(model)
-        safe_id = question_id.replace("/", "_").replace("\\", "_")
-        model_cache_dir = self.cache_dir / safe_model
+        model_cache_dir = self.cache_dir / self._sanitize_model_name(model)
         model_cache_dir.mkdir(parents=True, exist_ok=True)
-        return model_cache_dir / f"{safe_id}.json"
+        return model_cache_dir
 
     def load_cached(self, model: str, question_id: str) -> dict | None:
         """Load cached response if available."""
-        cache_path = self._get_cache_path(model, question_id)
-        if cache_path is None or not cache_path.exists():
+        model_cache_dir = self._get_cache_dir(model)
+        if model_cache_dir is None:
             return None
+        return self._cache.load(model_cache_dir, question_id)
 
-        try:
-            with open(cache_path, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError):
+    def load_cached_request(self, model: str, question_id: str, fingerprint: str, request: dict) -> dict | None:
+        """Load the cached response for an exact request (see RequestCache.load_request)."""
+        model_cache_dir = self._get_cache_dir(model)
+        if model_cache_dir is None:
             return None
+        return self._cache.load_request(model_cache_dir, question_id, fingerprint, request)
 
     def save_to_cache(self, model: str, question_id: str, response: dict) -> None:
         """Save response to cache."""
-        cache_path = self._get_cache_path(model, question_id)
-        if cache_path is None:
-            return
-
-        with open(cache_path, "w") as f:
-            json.dump(response, f, indent=2)
-
-    def _format_prompt(self, question: dict) -> str:
-        """Format question into user prompt."""
-        choices = question["choices"]
-        return f"""{question["question"]}
-
-A) {choices[0]}
-B) {choices[1]}
-C) {choices[2]}
-D) {choices[3]}
-
-Answer:"""
+        model_cache_dir = self._get_cache_dir(model)
+        if model_cache_dir is not None:
+            self._cache.save(model_cache_dir, question_id, response)
 
     async def call_api(
         self,
         model: str,
-        question: dict,
+        question: QuestionRecord,
         temperature: float | None = None,
     ) -> dict:
         """
@@ -134,20 +129,15 @@ Answer:"""
 
         Args:
             model: Model ID (e.g., "deepseek/deepseek-r1", "meta-llama/llama-4-scout")
-            question: Question dict with 'id', 'question', 'choices'
+            question: QuestionRecord with 'id' and the prebuilt 'prompt'
             temperature: Sampling temperature (None = use model default)
 
         Returns:
             Response dict with 'raw_response', 'usage', 'model', 'timestamp'
         """
-        question_id = question["id"]
+        question_id = question.id
 
-        # Check cache first
-        cached = self.load_cached(model, question_id)
-        if cached is not None:
-            return cached
-
-        user_prompt = self._format_prompt(question)
+        user_prompt = question.prompt
 
         # Build messages based on model capabilities
         if model in NO_SYSTEM_PROMPT_MODELS:
@@ -169,11 +159,19 @@ Answer:"""
         if temperature is not None:
             kwargs["temperature"] = temperature
 
+        # Check cache first (keyed by the exact request, question_id as secondary key)
+        fingerprint = request_fingerprint(kwargs)
+        cached = self.load_cached_request(model, question_id, fingerprint, kwargs)
+        if cached is not None:
+            return cached
+
         # Retry logic with exponential backoff
         last_error = None
         for attempt in range(self.max_retries):
             try:
+                start = time.perf_counter()
                 response = await self.client.chat.completions.create(**kwargs)
+                latency_ms = round((time.perf_counter() - start) * 1000)
 
                 # Safely extract response content
                 raw_content = ""
@@ -189,6 +187,9 @@ Answer:"""
                     "question_id": question_id,
                     "timestamp": datetime.now(timezone.utc).isoformat(),
                     "raw_response": raw_content,
+                    "extraction": extraction_record(*extract_answer(raw_content)),
+                    "request_fingerprint": fingerprint,
+                    "latency_ms": latency_ms,
                     "usage": {
                         "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
                         "completion_tokens": response.usage.completion_tokens if response.usage else 0,
@@ -224,20 +225,22 @@ Answer:"""
     async def evaluate_batch(
         self,
         model: str,
-        questions: list[dict],
+        questions: list[dict] | QuestionIndex,
         concurrency: int = 20,
         temperature: float | None = None,
         progress_callback: callable = None,
+        metrics: OnlineMetrics | None = None,
     ) -> list[dict]:
         """
         Evaluate a batch of questions with controlled concurrency.
 
         Args:
             model: Model ID
-            questions: List of question dicts
+            questions: QuestionIndex or list of question dicts
             concurrency: Max concurrent requests
             temperature: Sampling temperature (None = use model default)
             progress_callback: Optional callback(completed, total) for progress
+            metrics: Optional accumulator updated with each response as it completes
 
         Returns:
             List of response dicts in same order as questions
@@ -245,7 +248,7 @@ Answer:"""
         semaphore = asyncio.Semaphore(concurrency)
         completed = 0
 
-        async def process_one(q: dict) -> dict:
+        async def process_one(q: QuestionRecord) -> dict:
             nonlocal completed
             async with semaphore:
                 result = await self.call_api(
@@ -254,13 +257,16 @@ Answer:"""
                     temperature=temperature,
                 )
                 completed += 1
+                if metrics is not None:
+                    metrics.update(result)
                 if progress_callback:
                     progress_callback(completed, len(questions))
                 return result
 
-        tasks = [process_one(q) for q in questions]
+        tasks = [process_one(q) for q in question_index(questions).records]
         return await asyncio.gather(*tasks)
 
     async def close(self):
-        """Close the client connection."""
+        """Close the client connection and any open cache packs."""
         await self.client.close()
+        self._cache.close()
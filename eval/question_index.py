@@ -0,0 +1,361 @@
+"""
+Benchmark question index for FormationEval evaluation pipeline.
+
+Loads the benchmark once into an immutable QuestionIndex: one slotted
+QuestionRecord per question (correct letter, choice lengths, longest
+choice, interned domains/topics, calc_required, prebuilt prompt) plus
+column-aligned NumPy arrays for the results matrix. Providers, metrics
+and reports read these facts instead of re-deriving them from raw dicts.
+
+The benchmark JSON is validated when it is loaded. With a snapshot
+directory, the validated index is also pickled there, keyed by the hash
+of the JSON file, and later loads unpickle it instead of parsing the JSON
+and rebuilding the index.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+from functools import cached_property
+from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+
+LETTERS = "ABCD"
+
+
+def format_prompt(question: dict) -> str:
+    """Format question into user prompt."""
+    choices = question["choices"]
+    return f"""{question["question"]}
+
+A) {choices[0]}
+B) {choices[1]}
+C) {choices[2]}
+D) {choices[3]}
+
+Answer:"""
+
+
+class QuestionRecord:
+    """Immutable per-question facts derived from one benchmark dict."""
+
+    __slots__ = (
+        "id",
+        "column",
+        "question",
+        "choices",
+        "answer_index",
+        "correct_letter",
+        "choice_lengths",
+        "longest_index",
+        "difficulty",
+        "domains",
+        "topics",
+        "calc_required",
+        "prompt",
+    )
+
+    def __init__(self, question: dict, column: int):
+        choices = tuple(question.get("choices", ()))
+        lengths = tuple(len(c) for c in choices)
+        answer_index = question.get("answer_index", 0)
+
+        values = {
+            "id": question["id"],
+            "column": column,
+            "question": question.get("question", ""),
+            "choices": choices,
+            "answer_index": answer_index,
+            "correct_letter": chr(ord('A') + answer_index),
+            "choice_lengths": lengths,
+            "longest_index": lengths.index(max(lengths)) if lengths else 0,
+            "difficulty": sys.intern(question.get("difficulty", "unknown")),
+            "domains": tuple(sys.intern(d) for d in question.get("domains", [])),
+            "topics": tuple(sys.intern(t) for t in question.get("topics", [])),
+            "calc_required": bool(question.get("metadata", {}).get("calc_required", False)),
+            "prompt": format_prompt(question) if len(choices) >= 4 else "",
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"QuestionRecord is immutable (cannot set '{name}')")
+
+    def __repr__(self) -> str:
+        return f"QuestionRecord(id={self.id!r}, column={self.column})"
+
+    def __reduce__(self):
+        return _restore_record, tuple(getattr(self, name) for name in self.__slots__)
+
+
+def _restore_record(*values) -> QuestionRecord:
+    """Rebuild a pickled QuestionRecord without re-deriving its facts."""
+    record = object.__new__(QuestionRecord)
+    for name, value in zip(QuestionRecord.__slots__, values):
+        object.__setattr__(record, name, value)
+    return record
+
+
+class QuestionIndex:
+    """
+    Immutable index over benchmark questions (columns follow benchmark order).
+
+    Iterating or indexing yields the raw question dicts, so an index can be
+    passed wherever a question list is expected.
+
+    Attributes:
+        questions: Raw question dicts (tuple)
+        records: QuestionRecord per question (tuple)
+        ids: Question id per column
+        by_id: Read-only mapping question id -> QuestionRecord
+        column: Read-only mapping question id -> column
+        answer_index, longest_index: int8 arrays
+        difficulty_labels, difficulty: labels and int16 codes per column
+        domain_labels, domains: labels and bool membership (questions x domains)
+        domain_columns: Domain codes per question (tuple of tuples)
+        primary_domain: First listed domain code per question (-1 if none)
+        calc_required: bool array
+    """
+
+    def __init__(self, questions: list[dict]):
+        self.questions = tuple(questions)
+        self.records = tuple(QuestionRecord(q, i) for i, q in enumerate(self.questions))
+        self.ids = tuple(r.id for r in self.records)
+        self.by_id = MappingProxyType({r.id: r for r in self.records})
+        self.column = MappingProxyType({r.id: r.column for r in self.records})
+
+        self.answer_index = self._frozen([r.answer_index for r in self.records], np.int8)
+        self.longest_index = self._frozen([r.longest_index for r in self.records], np.int8)
+
+        # Difficulty as integer codes into difficulty_labels (first-seen order)
+        self.difficulty_labels = []
+        codes = {}
+        for r in self.records:
+            if r.difficulty not in codes:
+                codes[r.difficulty] = len(self.difficulty_labels)
+                self.difficulty_labels.append(r.difficulty)
+        self.difficulty = self._frozen([codes[r.difficulty] for r in self.records], np.int16)
+
+        # Domain membership (questions can belong to multiple domains)
+        self.domain_labels = []
+        domain_codes = {}
+        for r in self.records:
+            for domain in r.domains:
+                if domain not in domain_codes:
+                    domain_codes[domain] = len(self.domain_labels)
+                    self.domain_labels.append(domain)
+        self.domain_columns = tuple(tuple(domain_codes[d] for d in r.domains) for r in self.records)
+        domains = np.zeros((len(self.records), len(self.domain_labels)), dtype=bool)
+        for i, columns in enumerate(self.domain_columns):
+            domains[i, list(columns)] = True
+        domains.flags.writeable = False
+        self.domains = domains
+
+        # First listed domain per question (-1 if none), used for stratification
+        self.primary_domain = self._frozen(
+            [columns[0] if columns else -1 for columns in self.domain_columns], np.int16
+        )
+
+        self.calc_required = self._frozen([r.calc_required for r in self.records], bool)
+
+    def __getstate__(self) -> dict:
+        # Read-only mappings do not pickle; store them as plain dicts
+        state = dict(self.__dict__)
+        state["by_id"] = dict(self.by_id)
+        state["column"] = dict(self.column)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        state["by_id"] = MappingProxyType(state["by_id"])
+        state["column"] = MappingProxyType(state["column"])
+        self.__dict__.update(state)
+        # Unpickled arrays are writeable again
+        for value in state.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    @staticmethod
+    def _frozen(values: list, dtype) -> np.ndarray:
+        array = np.array(values, dtype=dtype)
+        array.flags.writeable = False
+        return array
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.questions)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return QuestionIndex(self.questions[key])
+        return self.questions[key]
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """Content hash of the benchmark questions (changes with any edit)."""
+        canonical = json.dumps(self.questions, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, question_id: str) -> QuestionRecord | None:
+        """Return the record for a question id, or None if unknown."""
+        return self.by_id.get(question_id)
+
+    def difficulty_membership(self) -> np.ndarray:
+        """One-hot difficulty membership (questions x difficulty levels)."""
+        membership = np.zeros((len(self.ids), len(self.difficulty_labels)), dtype=bool)
+        membership[np.arange(len(self.ids)), self.difficulty] = True
+        return membership
+
+
+# Single-entry memo so repeated calls with the same question list reuse the index
+_question_index_memo: tuple[list[dict], QuestionIndex] | None = None
+
+
+def question_index(questions: list[dict] | QuestionIndex) -> QuestionIndex:
+    """
+    Return the QuestionIndex for a question list.
+
+    An index is returned as is; for a plain list, the last index built for
+    that same list object is reused.
+    """
+    global _question_index_memo
+    if isinstance(questions, QuestionIndex):
+        return questions
+    if _question_index_memo is not None and _question_index_memo[0] is questions:
+        return _question_index_memo[1]
+    index = QuestionIndex(questions)
+    _question_index_memo = (questions, index)
+    return index
+
+
+# Snapshots are only valid for the code that built them
+SNAPSHOT_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+
+
+def validate_benchmark(questions) -> None:
+    """
+    Check the benchmark schema.
+
+    Every question needs a unique string id, question text, exactly four
+    string choices, an answer_index in 0-3 and an answer_key matching it.
+
+    Raises:
+        ValueError: Listing the problems found (first 10)
+    """
+    if not isinstance(questions, list):
+        raise ValueError("Benchmark must be a JSON list of questions")
+
+    problems = []
+    seen = set()
+    for position, question in enumerate(questions):
+        if not isinstance(question, dict):
+            problems.append(f"question {position}: not an object")
+            continue
+        qid = question.get("id")
+        label = f"question {position} ({qid})" if qid else f"question {position}"
+        if not isinstance(qid, str) or not qid:
+            problems.append(f"{label}: missing id")
+        elif qid in seen:
+            problems.append(f"{label}: duplicate id")
+        seen.add(qid)
+
+        if not isinstance(question.get("question"), str) or not question["question"]:
+            problems.append(f"{label}: missing question text")
+        choices = question.get("choices")
+        if not isinstance(choices, list) or len(choices) != len(LETTERS) or not all(isinstance(c, str) for c in choices):
+            problems.append(f"{label}: expected {len(LETTERS)} string choices")
+        answer_index = question.get("answer_index")
+        if not isinstance(answer_index, int) or not 0 <= answer_index < len(LETTERS):
+            problems.append(f"{label}: answer_index {answer_index!r} out of range")
+        elif question.get("answer_key") != LETTERS[answer_index]:
+            problems.append(
+                f"{label}: answer_key {question.get('answer_key')!r} does not match answer_index {answer_index}"
+            )
+
+    if problems:
+        more = f"\n  ... and {len(problems) - 10} more" if len(problems) > 10 else ""
+        raise ValueError(
+            f"Invalid benchmark ({len(problems)} problem(s)):\n  " + "\n  ".join(problems[:10]) + more
+        )
+
+
+def _intern_labels(questions: list[dict]) -> None:
+    """Intern repeated label strings so questions share one copy of each."""
+    for question in questions:
+        for key in ("domains", "topics"):
+            if isinstance(question.get(key), list):
+                question[key] = [sys.intern(value) for value in question[key]]
+        for key in ("difficulty", "version", "language", "answer_key"):
+            if isinstance(question.get(key), str):
+                question[key] = sys.intern(question[key])
+
+
+def _snapshot_prefix(benchmark_path: Path) -> str:
+    """Snapshot name prefix of one benchmark file: its stem and a hash of its resolved path."""
+    path_hash = hashlib.sha256(str(benchmark_path.resolve()).encode("utf-8")).hexdigest()[:8]
+    return f"{benchmark_path.stem}-{path_hash}-"
+
+
+def _snapshot_path(benchmark_path: Path, snapshot_dir: Path, file_hash: str) -> Path:
+    return snapshot_dir / f"{_snapshot_prefix(benchmark_path)}{file_hash}.pickle"
+
+
+def load_benchmark(benchmark_path: Path, snapshot_dir: Path | None = None) -> QuestionIndex:
+    """
+    Load benchmark questions from JSON file into a QuestionIndex.
+
+    The questions are validated (see validate_benchmark). With snapshot_dir,
+    the index is read from a pickled snapshot keyed by the resolved path and
+    the hash of the JSON file when one exists; otherwise the JSON is parsed, validated and the
+    snapshot written for the next load.
+
+    Args:
+        benchmark_path: Benchmark JSON file
+        snapshot_dir: Directory for index snapshots (None = always parse the JSON)
+
+    Raises:
+        ValueError: If the benchmark fails validation
+    """
+    data = benchmark_path.read_bytes()
+    if snapshot_dir is None:
+        questions = json.loads(data)
+        validate_benchmark(questions)
+        _intern_labels(questions)
+        return QuestionIndex(questions)
+
+    file_hash = hashlib.sha256(data).hexdigest()[:16]
+    snapshot_path = _snapshot_path(benchmark_path, snapshot_dir, file_hash)
+    if snapshot_path.exists():
+        try:
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            if snapshot.get("version") == SNAPSHOT_VERSION:
+                return snapshot["index"]
+        except Exception:
+            pass  # Unreadable or outdated snapshot: rebuild it
+
+    questions = json.loads(data)
+    validate_benchmark(questions)
+    _intern_labels(questions)
+    index = QuestionIndex(questions)
+    index.fingerprint  # Stored with the snapshot
+
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": SNAPSHOT_VERSION, "index": index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+    # Drop snapshots of earlier versions of this benchmark file only: other
+    # files may share the stem (another directory) or extend it ('-v2')
+    stale_name = re.compile(re.escape(_snapshot_prefix(benchmark_path)) + r"[0-9a-f]{16}\.pickle")
+    for stale in snapshot_dir.iterdir():
+        if stale != snapshot_path and stale_name.fullmatch(stale.name):
+            stale.unlink()
+    return index
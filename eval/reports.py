@@ -1,15 +1,33 @@
 """
 Report generation for FormationEval evaluation pipeline.
 
-Generates JSON, Markdown leaderboard, analysis, and CSV outputs.
+Logs runs and generates Markdown leaderboard, analysis, CSV outputs,
+a static aggregates bundle and the paper figures.
 """
 
 import csv
+import gzip
+import hashlib
+import itertools
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterable
 
-from metrics import find_hardest_questions
+import numpy as np
+
+import figures
+from agreement import CLUSTER_MIN_KAPPA, cluster_models, compute_agreement
+from columnar_export import LongResultsWriter
+from metrics import compute_wilson_ci, find_hardest_questions
+from question_index import QuestionIndex, QuestionRecord, question_index
+from results_matrix import ResultsMatrix
+from run_log import RunLog
+from significance import bootstrap_ranks, compare_models, significance_groups
+from subset import describe_subset
 
 
 # =============================================================================
@@ -190,50 +208,59 @@ def get_model_provider(model_name: str) -> str:
     return "?"
 
 
-def save_all_results_json(
-    all_runs: list[dict],
-    output_path: Path,
-    benchmark_version: str = "formationeval_v0.1",
-    total_questions: int = 505,
-) -> None:
-    """
-    Save all evaluation runs to a single JSON file.
+# Raw responses are truncated to this many characters in questions.csv
+CSV_RAW_LIMIT = 500
 
-    The file is append-only: new runs are added to the 'runs' array.
-    """
-    # Load existing file if present
-    existing = {"benchmark": benchmark_version, "total_questions": total_questions, "runs": []}
-    if output_path.exists():
-        try:
-            with open(output_path, "r") as f:
-                existing = json.load(f)
-        except (json.JSONDecodeError, OSError):
-            pass
 
-    # Add new runs (avoid duplicates by run_id)
-    existing_ids = {r.get("run_id") for r in existing.get("runs", [])}
-    for run in all_runs:
-        if run.get("run_id") not in existing_ids:
-            existing["runs"].append(run)
+def truncate_raw(raw: str, limit: int = CSV_RAW_LIMIT) -> str:
+    """Truncate a raw response for CSV output (idempotent)."""
+    if len(raw) > limit:
+        return raw[:limit - 3] + "..."
+    return raw
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w") as f:
-        json.dump(existing, f, indent=2)
+
+def compact_run(run: dict, raw_limit: int = CSV_RAW_LIMIT) -> dict:
+    """
+    Copy of a run with raw responses truncated to what the reports use.
+
+    Aggregates are shared with the input run; only 'answers' is rebuilt.
+    """
+    answers = {
+        qid: {**result, "raw_response": truncate_raw(result.get("raw_response", ""), raw_limit)}
+        for qid, result in run.get("answers", {}).items()
+    }
+    return {**run, "answers": answers}
 
 
 def generate_leaderboard_md(
     all_runs: list[dict],
     output_path: Path,
     benchmark_version: str = "formationeval_v0.1",
+    significance: dict | None = None,
+    rank_ci: dict | None = None,
 ) -> None:
     """
     Generate Markdown leaderboard with model rankings.
+
+    Only full-benchmark runs are ranked. Subset runs (see subset.py) are
+    listed in a separate table with their reweighted accuracy.
+
+    Args:
+        significance: Output of compare_models() for the full runs of
+            all_runs (same order); adds the significance-group column when given
+        rank_ci: Output of bootstrap_ranks() for the full runs of all_runs
+            (same order); adds the rank confidence interval column when given
     """
     if not all_runs:
         return
 
+    subset_runs = [run for run in all_runs if run.get("subset")]
+    ranked_runs = [run for run in all_runs if not run.get("subset")]
+
     # Sort by accuracy (descending)
-    sorted_runs = sorted(all_runs, key=lambda x: -x.get("accuracy", 0))
+    order = sorted(range(len(ranked_runs)), key=lambda i: -ranked_runs[i].get("accuracy", 0))
+    sorted_runs = [ranked_runs[i] for i in order]
+    groups = significance_groups(significance, order) if significance else None
 
     # Get latest run timestamp
     latest_ts = max(r.get("run_timestamp", "") for r in all_runs)
@@ -249,17 +276,46 @@ def generate_leaderboard_md(
         "- **Correct/Total**: Number of correct answers out of questions processed",
         "- **Company**: Organization that developed the model",
         "- **Parse err**: Answer extraction failures (model response could not be parsed)",
+    ]
+    if rank_ci:
+        confidence = round((1 - rank_ci["alpha"]) * 100)
+        stratified = ", stratified by domain" if rank_ci["stratified"] else ""
+        lines.append(
+            f"- **Rank {confidence}% CI**: Range of ranks over {rank_ci['n_resamples']:,} "
+            f"question-level bootstrap resamples{stratified}"
+        )
+    if groups:
+        lines.append(
+            "- **Group**: Models in the same group are not significantly different from the group's "
+            f"top model (paired McNemar exact test, Holm-corrected, p < {significance['alpha']:g})"
+        )
+    if subset_runs:
+        lines.append(
+            "- **Subset runs**: Quick runs on part of the benchmark (--domain/--difficulty/--topic/--ids-file/"
+            "--sample); listed separately and not ranked"
+        )
+        lines.append(
+            "- **Weighted**: Accuracy of a stratified sample reweighted to its population strata, with 95% CI"
+        )
+    lines.extend([
         "",
         "*Pricing sources: OpenRouter, Azure OpenAI, OpenAI API (December 2025)*",
         "",
         "## Overall rankings",
         "",
-        "| Rank | Model | Open | Price ($/M) | **Accuracy** | Correct/Total |",
-        "|------|-------|------|-------------|--------------|---------------|",
-    ]
+    ])
+    header = ["Rank", "Model", "Open", "Price ($/M)", "**Accuracy**", "Correct/Total"]
+    if rank_ci:
+        header.insert(1, f"Rank {confidence}% CI")
+    if groups:
+        header.append("Group")
+    lines.extend([
+        "| " + " | ".join(header) + " |",
+        "|" + "|".join("-" * (len(h) + 2) for h in header) + "|",
+    ])
 
     # Simple table first
-    for i, run in enumerate(sorted_runs, 1):
+    for i, (row, run) in enumerate(zip(order, sorted_runs), 1):
         model = run.get("model", "unknown")
         acc = run.get("accuracy", 0) * 100
         correct = run.get("correct", 0)
@@ -275,9 +331,36 @@ def generate_leaderboard_md(
             open_str = "?"
         price_str = format_price(meta.get("price_input"), meta.get("price_output"))
 
-        lines.append(
-            f"| {i} | {model} | {open_str} | {price_str} | **{acc:.1f}%** | {correct}/{total} |"
-        )
+        cells = [str(i), model, open_str, price_str, f"**{acc:.1f}%**", f"{correct}/{total}"]
+        if rank_ci:
+            low, high = rank_ci["rank_lower"][row], rank_ci["rank_upper"][row]
+            cells.insert(1, str(low) if low == high else f"{low}–{high}")
+        if groups:
+            cells.append(str(groups[row]))
+        lines.append("| " + " | ".join(cells) + " |")
+
+    if subset_runs:
+        lines.extend([
+            "",
+            "## Subset runs",
+            "",
+            "| Model | Subset | Weighted | Accuracy on subset | Correct/Total |",
+            "|-------|--------|----------|--------------------|---------------|",
+        ])
+        for run in subset_runs:
+            subset = run["subset"]
+            if "weighted_accuracy" in run:
+                weighted = (
+                    f"**{run['weighted_accuracy'] * 100:.1f}%** "
+                    f"[{run['weighted_ci_lower'] * 100:.1f}, {run['weighted_ci_upper'] * 100:.1f}]"
+                )
+            else:
+                weighted = "–"
+            lines.append(
+                f"| {run.get('model', 'unknown')} | {describe_subset(subset)} | {weighted} | {run.get('accuracy', 0) * 100:.1f}% "
+                f"[{run.get('ci_lower', 0) * 100:.1f}, {run.get('ci_upper', 0) * 100:.1f}] "
+                f"| {run.get('correct', 0)}/{run.get('total', 0)} |"
+            )
 
     # Detailed table with difficulty breakdown
     lines.extend([
@@ -312,7 +395,7 @@ def generate_leaderboard_md(
 
     # Collect all domains
     all_domains = set()
-    for run in all_runs:
+    for run in ranked_runs:
         all_domains.update(run.get("by_domain", {}).keys())
     domains_sorted = sorted(all_domains)
 
@@ -351,18 +434,269 @@ def generate_leaderboard_md(
         f.write("\n".join(lines) + "\n")
 
 
+# Version of the aggregates bundle layout (bump on incompatible changes)
+AGGREGATES_VERSION = 1
+
+# Reports of a call with only subset runs go here, so the published
+# leaderboard, analysis and CSVs of the full runs are kept
+SUBSET_REPORT_DIR = "subset"
+
+
+def build_aggregates(
+    all_runs: list[dict],
+    benchmark_version: str = "formationeval_v0.1",
+    significance: dict | None = None,
+    rank_ci: dict | None = None,
+) -> dict:
+    """
+    Collect per-model aggregates and rankings for static consumers.
+
+    Models are listed in leaderboard order. The bundle holds no wall-clock
+    time, so unchanged results give an identical bundle (and content hash).
+
+    Args:
+        significance: Output of compare_models() for all_runs (same order)
+        rank_ci: Output of bootstrap_ranks() for all_runs (same order)
+
+    Returns:
+        Dict with 'version', 'benchmark', 'last_updated', 'content_hash'
+        and 'models' (one entry per run)
+    """
+    order = sorted(range(len(all_runs)), key=lambda i: -all_runs[i].get("accuracy", 0))
+    groups = significance_groups(significance, order) if significance else None
+
+    models = []
+    for rank, row in enumerate(order, 1):
+        run = all_runs[row]
+        model = run.get("model", "unknown")
+        meta = get_model_metadata(model)
+        entry = {
+            "rank": rank,
+            "model": model,
+            "company": get_model_provider(model),
+            "open_weight": meta.get("open_weight"),
+            "price_input": meta.get("price_input"),
+            "price_output": meta.get("price_output"),
+            "accuracy": run.get("accuracy", 0),
+            "correct": run.get("correct", 0),
+            "total": run.get("total", 0),
+            "ci_lower": run.get("ci_lower"),
+            "ci_upper": run.get("ci_upper"),
+            "failed_extractions": run.get("failed_extractions", 0),
+            "by_difficulty": run.get("by_difficulty", {}),
+            "by_domain": run.get("by_domain", {}),
+            "answer_distribution": run.get("answer_distribution", {}),
+            "bias_analysis": run.get("bias_analysis", {}),
+        }
+        if rank_ci:
+            entry["rank_lower"] = int(rank_ci["rank_lower"][row])
+            entry["rank_upper"] = int(rank_ci["rank_upper"][row])
+        if groups:
+            entry["group"] = int(groups[row])
+        if run.get("subset"):
+            entry["subset"] = run["subset"]
+            entry["subset_description"] = describe_subset(run["subset"])
+            for key in ("weighted_accuracy", "weighted_ci_lower", "weighted_ci_upper"):
+                if key in run:
+                    entry[key] = run[key]
+        models.append(entry)
+
+    bundle = {
+        "version": AGGREGATES_VERSION,
+        "benchmark": benchmark_version,
+        "last_updated": max(r.get("run_timestamp", "") for r in all_runs),
+        "models": models,
+    }
+    canonical = json.dumps(bundle, sort_keys=True, separators=(",", ":"))
+    bundle["content_hash"] = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+    return bundle
+
+
+def write_aggregates_bundle(bundle: dict, output_dir: Path) -> dict[str, Path]:
+    """
+    Write a gzip-compressed aggregates bundle named by its content hash.
+
+    The small pointer file aggregates.json names the current bundle, so
+    publishing an update is a single file swap and the hashed bundle can be
+    cached indefinitely. Bundles other than the current and the previously
+    published one are removed.
+
+    Returns:
+        Dict with 'bundle' and 'pointer' paths
+    """
+    pointer_path = output_dir / "aggregates.json"
+    bundle_path = output_dir / f"aggregates-{bundle['content_hash']}.json.gz"
+
+    previous = None
+    if pointer_path.exists():
+        try:
+            with open(pointer_path, "r") as f:
+                previous = json.load(f).get("file")
+        except (json.JSONDecodeError, OSError):
+            pass
+
+    payload = json.dumps(bundle, separators=(",", ":")).encode("utf-8")
+    # mtime=0 keeps the compressed bytes stable for identical content
+    bundle_path.write_bytes(gzip.compress(payload, compresslevel=9, mtime=0))
+
+    pointer = {
+        "version": bundle["version"],
+        "benchmark": bundle["benchmark"],
+        "content_hash": bundle["content_hash"],
+        "file": bundle_path.name,
+    }
+    tmp_path = pointer_path.with_name(pointer_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(pointer, f, indent=2)
+    os.replace(tmp_path, pointer_path)
+
+    for stale in output_dir.glob("aggregates-*.json.gz"):
+        if stale.name not in (bundle_path.name, previous):
+            stale.unlink()
+
+    return {"bundle": bundle_path, "pointer": pointer_path}
+
+
+def write_significance_csv(significance: dict, output_path: Path) -> None:
+    """
+    Write pairwise significance results (one row per model pair) to CSV.
+
+    Args:
+        significance: Output of compare_models()
+    """
+    models = significance["models"]
+    alpha = significance["alpha"]
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "model_a", "model_b", "n_questions", "accuracy_a", "accuracy_b",
+            "diff", "diff_ci_lower", "diff_ci_upper", "a_only_correct", "b_only_correct",
+            "p_mcnemar", "p_holm", "significant",
+        ])
+        for i in range(len(models)):
+            for j in range(i + 1, len(models)):
+                writer.writerow([
+                    models[i],
+                    models[j],
+                    int(significance["n_questions"][i, j]),
+                    f"{significance['accuracy'][i, j]:.4f}",
+                    f"{significance['accuracy'][j, i]:.4f}",
+                    f"{significance['diff'][i, j]:.4f}",
+                    f"{significance['diff_lower'][i, j]:.4f}",
+                    f"{significance['diff_upper'][i, j]:.4f}",
+                    int(significance["discordant"][i, j]),
+                    int(significance["discordant"][j, i]),
+                    f"{significance['p_mcnemar'][i, j]:.3g}",
+                    f"{significance['p_holm'][i, j]:.3g}",
+                    str(bool(significance["p_holm"][i, j] < alpha)),
+                ])
+
+
+def format_agreement_summary(agreement: dict, top_n: int = 5) -> list[str]:
+    """
+    Render pairwise agreement as Markdown: overall means, model clusters,
+    and the pairs with the most overlapping errors.
+    """
+    models = agreement["models"]
+    kappa = agreement["kappa"]
+    rows, cols = np.triu_indices(len(models), k=1)
+
+    lines = [
+        "### Pairwise agreement",
+        "",
+        f"- Mean answer agreement: {100*agreement['agreement'][rows, cols].mean():.1f}%",
+        f"- Mean Cohen's kappa: {kappa[rows, cols].mean():.2f}",
+        f"- Mean error overlap (Jaccard): {agreement['error_jaccard'][rows, cols].mean():.2f}",
+        "",
+        f"### Model clusters (average linkage, kappa >= {CLUSTER_MIN_KAPPA})",
+        "",
+        "| Cluster | Models | Mean kappa |",
+        "|---------|--------|------------|",
+    ]
+
+    clusters = cluster_models(kappa)
+    for n, members in enumerate((c for c in clusters if len(c) > 1), 1):
+        inner = kappa[np.ix_(members, members)]
+        mean_kappa = (inner.sum() - np.trace(inner)) / (len(members) * (len(members) - 1))
+        names = ", ".join(models[i] for i in members)
+        lines.append(f"| {n} | {names} | {mean_kappa:.2f} |")
+    singletons = [models[c[0]] for c in clusters if len(c) == 1]
+    if singletons:
+        lines.append(f"| - | {', '.join(singletons)} | (unclustered) |")
+
+    lines.extend([
+        "",
+        "### Most correlated errors",
+        "",
+        "| Model A | Model B | Agreement | Kappa | Both wrong | Error Jaccard |",
+        "|---------|---------|-----------|-------|------------|---------------|",
+    ])
+    jaccard = agreement["error_jaccard"][rows, cols]
+    for k in np.argsort(-jaccard, kind="stable")[:top_n]:
+        i, j = rows[k], cols[k]
+        lines.append(
+            f"| {models[i]} | {models[j]} | {100*agreement['agreement'][i, j]:.1f}% | "
+            f"{kappa[i, j]:.2f} | {agreement['both_wrong'][i, j]} | {jaccard[k]:.2f} |"
+        )
+    lines.append("")
+
+    return lines
+
+
+def write_agreement_csv(agreement: dict, output_path: Path) -> None:
+    """
+    Write pairwise agreement statistics (one row per model pair) to CSV.
+
+    Args:
+        agreement: Output of compute_agreement()
+    """
+    models = agreement["models"]
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "model_a", "model_b", "common_questions", "agreement",
+            "kappa", "both_wrong", "error_jaccard",
+        ])
+        for i in range(len(models)):
+            for j in range(i + 1, len(models)):
+                writer.writerow([
+                    models[i],
+                    models[j],
+                    int(agreement["common"][i, j]),
+                    f"{agreement['agreement'][i, j]:.4f}",
+                    f"{agreement['kappa'][i, j]:.4f}",
+                    int(agreement["both_wrong"][i, j]),
+                    f"{agreement['error_jaccard'][i, j]:.4f}",
+                ])
+
+
 def generate_analysis_md(
     all_runs: list[dict],
-    questions: list[dict],
+    questions: list[dict] | QuestionIndex,
     output_path: Path,
     benchmark_version: str = "formationeval_v0.1",
+    matrix: ResultsMatrix | None = None,
+    agreement: dict | None = None,
 ) -> None:
     """
     Generate detailed analysis Markdown with hardest questions and patterns.
+
+    Args:
+        matrix: Results matrix of all_runs (built if not given)
+        agreement: Output of compute_agreement() for matrix (computed if not given)
     """
     if not all_runs:
         return
 
+    if matrix is None:
+        matrix = ResultsMatrix.from_runs(all_runs, questions)
+    if agreement is None:
+        agreement = compute_agreement(matrix)
+
     latest_ts = max(r.get("run_timestamp", "") for r in all_runs)
 
     lines = [
@@ -373,7 +707,7 @@ def generate_analysis_md(
     ]
 
     # Hardest questions
-    hardest = find_hardest_questions(all_runs, questions, top_n=10)
+    hardest = find_hardest_questions(all_runs, questions, top_n=10, matrix=matrix)
     if hardest:
         lines.extend([
             "## Hardest questions",
@@ -420,26 +754,7 @@ def generate_analysis_md(
         "",
     ])
 
-    q_by_id = {q["id"]: q for q in questions}
-    all_correct = 0
-    all_wrong = 0
-    mixed = 0
-
-    for qid in q_by_id:
-        results = []
-        for run in all_runs:
-            answers = run.get("answers", {})
-            if qid in answers:
-                results.append(answers[qid].get("correct", False))
-
-        if not results:
-            continue
-        if all(results):
-            all_correct += 1
-        elif not any(results):
-            all_wrong += 1
-        else:
-            mixed += 1
+    all_correct, all_wrong, mixed = matrix.agreement_counts()
 
     total = all_correct + all_wrong + mixed
     if total > 0:
@@ -450,6 +765,9 @@ def generate_analysis_md(
             "",
         ])
 
+    if len(matrix) > 1:
+        lines.extend(format_agreement_summary(agreement))
+
     # Position bias details
     lines.extend([
         "## Bias exploitation analysis",
@@ -536,7 +854,7 @@ def generate_analysis_md(
 
 def generate_questions_csv(
     all_runs: list[dict],
-    questions: list[dict],
+    questions: list[dict] | QuestionIndex,
     output_path: Path,
 ) -> None:
     """
@@ -545,7 +863,7 @@ def generate_questions_csv(
     if not all_runs or not questions:
         return
 
-    q_by_id = {q["id"]: q for q in questions}
+    index = question_index(questions)
     models = [run.get("model", f"model_{i}") for i, run in enumerate(all_runs)]
 
     # Build header
@@ -574,78 +892,286 @@ def generate_questions_csv(
 
     header = base_columns + model_columns
 
-    rows = []
-    for q in questions:
-        qid = q["id"]
-        choices = q.get("choices", ["", "", "", ""])
-
-        row = {
-            "question_id": qid,
-            "question_text": q.get("question", ""),
-            "choice_a": choices[0] if len(choices) > 0 else "",
-            "choice_b": choices[1] if len(choices) > 1 else "",
-            "choice_c": choices[2] if len(choices) > 2 else "",
-            "choice_d": choices[3] if len(choices) > 3 else "",
-            "correct_answer": chr(ord('A') + q.get("answer_index", 0)),
-            "difficulty": q.get("difficulty", "unknown"),
-            "domains": ";".join(q.get("domains", [])),
-            "topics": ";".join(q.get("topics", [])),
-            "calc_required": str(q.get("metadata", {}).get("calc_required", False)),
-        }
-
-        for run in all_runs:
-            model = run.get("model", "unknown")
-            answers = run.get("answers", {})
-            result = answers.get(qid, {})
-
-            # Truncate raw response for CSV
-            raw = result.get("raw_response", "")
-            if len(raw) > 500:
-                raw = raw[:497] + "..."
-
-            row[f"{model}_answer"] = result.get("predicted", "")
-            row[f"{model}_correct"] = str(result.get("correct", False))
-            row[f"{model}_pattern"] = result.get("extraction_pattern", "")
-            row[f"{model}_raw"] = raw
-
-        rows.append(row)
-
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with open(output_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=header, extrasaction="ignore")
         writer.writeheader()
-        writer.writerows(rows)
+        # Rows are written as they are built
+        for record in index.records:
+            writer.writerow(_question_row(record, all_runs))
+
+
+def _question_row(record: QuestionRecord, all_runs: list[dict]) -> dict:
+    """One questions.csv row: question facts plus each run's answer."""
+    qid = record.id
+    choices = record.choices or ("", "", "", "")
+
+    row = {
+        "question_id": qid,
+        "question_text": record.question,
+        "choice_a": choices[0] if len(choices) > 0 else "",
+        "choice_b": choices[1] if len(choices) > 1 else "",
+        "choice_c": choices[2] if len(choices) > 2 else "",
+        "choice_d": choices[3] if len(choices) > 3 else "",
+        "correct_answer": record.correct_letter,
+        "difficulty": record.difficulty,
+        "domains": ";".join(record.domains),
+        "topics": ";".join(record.topics),
+        "calc_required": str(record.calc_required),
+    }
+
+    for run in all_runs:
+        model = run.get("model", "unknown")
+        answers = run.get("answers", {})
+        result = answers.get(qid, {})
+
+        # Truncate raw response for CSV
+        raw = truncate_raw(result.get("raw_response", ""))
+
+        row[f"{model}_answer"] = result.get("predicted", "")
+        row[f"{model}_correct"] = str(result.get("correct", False))
+        row[f"{model}_pattern"] = result.get("extraction_pattern", "")
+        row[f"{model}_raw"] = raw
+
+    return row
 
 
 def generate_all_reports(
-    all_runs: list[dict],
-    questions: list[dict],
+    all_runs: Iterable[dict],
+    questions: list[dict] | QuestionIndex,
     output_dir: Path,
     benchmark_version: str = "formationeval_v0.1",
+    n_resamples: int = 10000,
+    stratify_by_domain: bool = False,
+    columnar_format: str | None = "parquet",
+    jobs: int = 1,
+    render_figures: bool = True,
+    include_subsets: bool = False,
 ) -> dict[str, Path]:
     """
     Generate all output reports.
 
+    Runs are consumed one at a time (all_runs may be a generator): each is
+    appended to the run log, turned into a results-matrix row and kept only
+    as a compact copy (raw responses truncated as in questions.csv), so full
+    responses are held for one model at a time. all_results.json is not
+    written; see RunLog.export_json().
+
+    Args:
+        n_resamples: Bootstrap resamples for paired comparisons and rank CIs
+        stratify_by_domain: Resample rank CIs within each question's primary domain
+        columnar_format: 'parquet' or 'arrow' for the long-format results
+            export (skipped if None or pyarrow is not installed)
+        jobs: Worker processes for the independent reports (significance,
+            rank CIs, agreement/analysis, questions CSV) and for rendering
+            figures; 1 runs them serially
+        render_figures: Render the paper figures into output_dir/figures
+            (only those whose data changed; skipped if matplotlib is not installed)
+        include_subsets: Also publish subset runs (see subset.py) in the
+            long-format results, aggregates and figures. By default they
+            appear in the run log, leaderboard, analysis and CSVs only, and
+            when all runs are subset runs, those reports are written to
+            output_dir/subset instead of replacing the published ones.
+
     Returns:
-        Dict mapping report type to output path
+        Dict mapping report type to output path (empty if there were no runs)
     """
+    runs = iter(all_runs)
+    first = next(runs, None)
+    if first is None:
+        return {}
+
     output_dir.mkdir(parents=True, exist_ok=True)
+    index = question_index(questions)
+    run_log = RunLog(output_dir)
+
+    # Carry runs of an all_results.json written before the run log existed
+    legacy_json = output_dir / "all_results.json"
+    if not run_log and legacy_json.exists():
+        run_log.import_json(legacy_json)
+
+    # Opened at the first published run, so subset-only reports keep the previous export
+    columnar = None
+    export_columnar = columnar_format and LongResultsWriter.available()
 
+    # Log each run and keep its matrix row and compact copy
+    compact_runs = []
+    rows = []
+    for run in itertools.chain([first], runs):
+        run_log.append(run)
+        if export_columnar and (include_subsets or not run.get("subset")):
+            if columnar is None:
+                columnar = LongResultsWriter(output_dir, columnar_format)
+            columnar.write_run(run)
+        rows.append(ResultsMatrix.run_row(run, index))
+        compact_runs.append(compact_run(run))
+
+    # Subset runs are quick checks on part of the benchmark and are not ranked:
+    # significance and rank CIs cover the full runs only
+    ranked = [row for row, run in enumerate(compact_runs) if not run.get("subset")]
+
+    report_dir = output_dir
+    if not ranked and not include_subsets:
+        report_dir = output_dir / SUBSET_REPORT_DIR
+        report_dir.mkdir(exist_ok=True)
+        print(f"  Only subset runs: reports written to {report_dir}")
     paths = {
-        "json": output_dir / "all_results.json",
-        "leaderboard": output_dir / "leaderboard.md",
-        "analysis": output_dir / "analysis.md",
-        "csv": output_dir / "questions.csv",
+        "run_log": run_log.path,
+        "leaderboard": report_dir / "leaderboard.md",
+        "analysis": report_dir / "analysis.md",
+        "csv": report_dir / "questions.csv",
+        "significance": report_dir / "significance.csv",
+        "agreement": report_dir / "model_agreement.csv",
     }
 
-    save_all_results_json(
-        all_runs, paths["json"],
-        benchmark_version=benchmark_version,
-        total_questions=len(questions),
-    )
+    if columnar is not None:
+        columnar_paths = columnar.close()
+        paths["results_long"] = columnar_paths["long"]
+        paths["results_raw"] = columnar_paths["raw"]
 
-    generate_leaderboard_md(all_runs, paths["leaderboard"], benchmark_version)
-    generate_analysis_md(all_runs, questions, paths["analysis"], benchmark_version)
-    generate_questions_csv(all_runs, questions, paths["csv"])
+    matrix = ResultsMatrix.from_rows([run.get("model", "unknown") for run in compact_runs], index, rows)
 
+    ranked_matrix = matrix
+    if len(ranked) < len(compact_runs):
+        ranked_matrix = ResultsMatrix.from_rows(
+            [matrix.models[row] for row in ranked], index, [rows[row] for row in ranked],
+        )
+
+    snapshot = {
+        "runs": compact_runs,
+        "questions": index,
+        "matrix": matrix,
+        "ranked_matrix": ranked_matrix,
+        "paths": paths,
+        "benchmark_version": benchmark_version,
+        "n_resamples": n_resamples,
+        "stratify_by_domain": stratify_by_domain,
+    }
+    start = time.perf_counter()
+    results, timings = _run_report_tasks(snapshot, jobs)
+
+    # The leaderboard and aggregates need both bootstrap results, so they run last
+    task_start = time.perf_counter()
+    generate_leaderboard_md(
+        compact_runs, paths["leaderboard"], benchmark_version,
+        significance=results["significance"], rank_ci=results["rank_ci"],
+    )
+    timings["leaderboard"] = time.perf_counter() - task_start
+
+    # Unless asked for, subset runs also stay out of the published aggregates and figures
+    published = [row for row, run in enumerate(compact_runs) if include_subsets or not run.get("subset")]
+    if not published:
+        print("  Aggregates and figures skipped: only subset runs (see include_subsets)")
+        print_report_timings(timings, time.perf_counter() - start, jobs)
+        return paths
+
+    published_runs = [compact_runs[row] for row in published]
+    published_matrix = ranked_matrix
+    significance = results["significance"]
+    rank_ci = results["rank_ci"]
+    if len(published) > len(ranked):
+        # Subset runs published on request: statistics over every published run
+        task_start = time.perf_counter()
+        published_matrix = ResultsMatrix.from_rows(
+            [run.get("model", "unknown") for run in published_runs], index, [rows[row] for row in published],
+        )
+        significance = compare_models(published_matrix, n_resamples=n_resamples)
+        rank_ci = bootstrap_ranks(published_matrix, n_resamples=n_resamples, stratified=stratify_by_domain)
+        timings["published_stats"] = time.perf_counter() - task_start
+
+    task_start = time.perf_counter()
+    bundle = build_aggregates(published_runs, benchmark_version, significance=significance, rank_ci=rank_ci)
+    aggregates_paths = write_aggregates_bundle(bundle, output_dir)
+    paths["aggregates"] = aggregates_paths["pointer"]
+    paths["aggregates_bundle"] = aggregates_paths["bundle"]
+    timings["aggregates"] = time.perf_counter() - task_start
+
+    if render_figures and figures.available():
+        task_start = time.perf_counter()
+        metadata = {model: get_model_metadata(model) for model in published_matrix.models}
+        figure_results = figures.generate_figures(published_matrix, output_dir / "figures", metadata, jobs=jobs)
+        paths["figures"] = output_dir / "figures"
+        timings["figures"] = time.perf_counter() - task_start
+        print(
+            f"  Figures: {len(figure_results['rendered'])} rendered, "
+            f"{len(figure_results['skipped'])} unchanged"
+        )
+
+    print_report_timings(timings, time.perf_counter() - start, jobs)
     return paths
+
+
+# Independent report tasks, run over one read-only snapshot of the results
+REPORT_TASKS = ("significance", "rank_ci", "agreement", "csv")
+
+# Snapshot of a report worker (inherited when the pool forks, else sent once)
+_report_snapshot: dict | None = None
+
+
+def _init_report_worker(snapshot: dict) -> None:
+    global _report_snapshot
+    _report_snapshot = snapshot
+
+
+def _report_task(name: str) -> tuple[str, dict | None, float]:
+    """
+    Run one report task against the snapshot.
+
+    Returns:
+        Tuple of (name, result needed by the leaderboard or None, seconds)
+    """
+    start = time.perf_counter()
+    snapshot = _report_snapshot
+    paths = snapshot["paths"]
+    matrix = snapshot["matrix"]
+    result = None
+
+    if name == "significance":
+        result = compare_models(snapshot["ranked_matrix"], n_resamples=snapshot["n_resamples"])
+        write_significance_csv(result, paths["significance"])
+    elif name == "rank_ci":
+        result = bootstrap_ranks(
+            snapshot["ranked_matrix"], n_resamples=snapshot["n_resamples"], stratified=snapshot["stratify_by_domain"],
+        )
+    elif name == "agreement":
+        agreement = compute_agreement(matrix)
+        generate_analysis_md(
+            snapshot["runs"], snapshot["questions"], paths["analysis"], snapshot["benchmark_version"],
+            matrix=matrix, agreement=agreement,
+        )
+        write_agreement_csv(agreement, paths["agreement"])
+    elif name == "csv":
+        generate_questions_csv(snapshot["runs"], snapshot["questions"], paths["csv"])
+
+    return name, result, time.perf_counter() - start
+
+
+def _run_report_tasks(snapshot: dict, jobs: int) -> tuple[dict, dict]:
+    """Run REPORT_TASKS serially or across a process pool; returns (results, timings)."""
+    results = {}
+    timings = {}
+    if jobs <= 1:
+        _init_report_worker(snapshot)
+        for name in REPORT_TASKS:
+            _, results[name], timings[name] = _report_task(name)
+        return results, timings
+
+    # Resolve the CI z-score (imports scipy) once here so forked workers inherit it
+    compute_wilson_ci(1, 1)
+
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(REPORT_TASKS)),
+        initializer=_init_report_worker,
+        initargs=(snapshot,),
+    ) as executor:
+        for name, result, elapsed in executor.map(_report_task, REPORT_TASKS):
+            results[name] = result
+            timings[name] = elapsed
+    return results, timings
+
+
+def print_report_timings(timings: dict[str, float], wall_time: float, jobs: int) -> None:
+    """Print per-report generation time and the wall time of all reports."""
+    print(f"  Generated reports in {wall_time:.2f}s with {jobs} job(s)")
+    for name, elapsed in timings.items():
+        print(f"    {name:<14} {elapsed:.2f}s")
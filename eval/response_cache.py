@@ -0,0 +1,1012 @@
+"""
+Response cache helpers for FormationEval evaluation pipeline.
+
+Loads cached model responses and keeps their persisted extraction results
+in sync with the current extractor version. Whole model cache directories
+can be analyzed in parallel across a process pool.
+
+A model cache directory holds loose `{question_id}.json` files and,
+once compacted, an append-only pack (`responses.pack`) of length-prefixed
+JSON records with a sidecar offset index (`responses.pack.idx`). Readers
+check loose files first, so entries written after compaction win.
+
+Parsed responses are kept in a byte-bounded in-process LRU in front of
+the disk store. The disk store itself can be pruned to a size and age
+limit; responses referenced by published runs are never evicted.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from cache_manifest import AnalysisSnapshots
+from extraction import EXTRACTOR_VERSION, extract_answers, extraction_record, stored_extraction
+from metrics import compute_all_metrics, compute_wilson_ci
+from question_index import QuestionIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: pack updates are not locked
+    fcntl = None
+
+
+# Default byte limit of the in-process response LRU
+DEFAULT_MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ResponseLRU:
+    """
+    In-process LRU of parsed cached responses, bounded by their size on disk.
+
+    Keys identify one version of a stored response (a loose file's path,
+    size and mtime, or a pack record's position), so a rewritten file is a
+    miss rather than a stale hit. get() returns a shallow copy: callers may
+    set top-level keys without touching the cached entry.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Counters reported back by worker processes (see record_worker)
+        self.worker_counts = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: tuple) -> dict | None:
+        """Return a copy of the cached response for key, or None (counted as a miss)."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[0])
+
+    def put(self, key: tuple, response: dict, size: int) -> None:
+        """Cache a parsed response of `size` bytes, evicting least recently used entries."""
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (dict(response), size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self.entries.clear()
+        self.bytes = 0
+
+    def counters(self) -> dict:
+        """This process's hit, miss and eviction counters."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def record_worker(self, counts: dict) -> None:
+        """Add the counters of lookups made by a worker process's own LRU."""
+        for key in self.worker_counts:
+            self.worker_counts[key] += counts.get(key, 0)
+
+    def stats(self) -> dict:
+        """
+        Counters and occupancy.
+
+        hits, misses and evictions include the lookups of worker processes
+        (also given separately as worker_hits, worker_misses and
+        worker_evictions); entries and bytes are this process's LRU only.
+        """
+        return {
+            "hits": self.hits + self.worker_counts["hits"],
+            "misses": self.misses + self.worker_counts["misses"],
+            "evictions": self.evictions + self.worker_counts["evictions"],
+            "worker_hits": self.worker_counts["hits"],
+            "worker_misses": self.worker_counts["misses"],
+            "worker_evictions": self.worker_counts["evictions"],
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Shared by every reader in this process (providers, analysis, reports)
+memory_cache = ResponseLRU()
+
+
+def configure_memory_cache(max_bytes: int) -> None:
+    """Set the byte limit of the shared response LRU (0 disables it)."""
+    memory_cache.max_bytes = max_bytes
+    memory_cache.clear()
+
+
+def read_cache_file(cache_path: Path) -> dict:
+    """
+    Read a loose cached response through the shared LRU.
+
+    Raises:
+        OSError, json.JSONDecodeError: as for reading the file directly
+    """
+    stat = cache_path.stat()
+    key = (str(cache_path), stat.st_size, stat.st_mtime_ns)
+    response = memory_cache.get(key)
+    if response is not None:
+        return response
+    with open(cache_path, "r") as f:
+        response = json.load(f)
+    memory_cache.put(key, response, stat.st_size)
+    return response
+
+
+def write_cache_file(cache_path: Path, response: dict) -> None:
+    """Write a cached response atomically (temp file + rename)."""
+    tmp_path = cache_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(response, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+PACK_NAME = "responses.pack"
+PACK_INDEX_SUFFIX = ".idx"
+PACK_INDEX_VERSION = 1
+# Lock file serializing pack updates across processes (dot-prefixed, so it
+# is not part of the cache state or the cache size)
+PACK_LOCK_NAME = ".responses.lock"
+
+# Record header: payload length as unsigned 32-bit big-endian
+_RECORD_HEADER = struct.Struct(">I")
+
+
+def _open_temp(path: Path, mode: str):
+    """Open a uniquely named temp file next to path; returns (file, temp path)."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    return os.fdopen(fd, mode), Path(tmp_path)
+
+
+def cache_file_stem(question_id: str) -> str:
+    """File name stem of a loose cache file for a question id."""
+    return question_id.replace("/", "_").replace("\\", "_")
+
+
+class ResponsePack:
+    """
+    Append-only pack of cached responses for one model directory.
+
+    The pack is a sequence of records, each a 4-byte length followed by the
+    compact JSON of one response. The sidecar index maps question_id to
+    [offset, length] of the latest record for that question; lookups mmap
+    the pack and decode only the requested record.
+    """
+
+    def __init__(self, model_cache: Path):
+        self.path = model_cache / PACK_NAME
+        self.index_path = self.path.with_name(PACK_NAME + PACK_INDEX_SUFFIX)
+        self.lock_path = model_cache / PACK_LOCK_NAME
+        self.entries = {}
+        self._file = None
+        self._mmap = None
+        self._identity = None
+        self._lock = None
+        self.entries = self._read_index()
+
+    def _read_index(self) -> dict[str, list[int]]:
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r") as f:
+                    return json.load(f).get("entries", {})
+            except (json.JSONDecodeError, OSError):
+                return self.scan()
+        if self.path.exists():
+            # Index lost (e.g. interrupted compaction): rebuild from the records
+            return self.scan()
+        return {}
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the pack's exclusive lock (across processes) and reload the
+        index, so a read-modify-write sees the latest pack. Re-entrant
+        within one ResponsePack.
+        """
+        if self._lock is not None:
+            yield
+            return
+
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            self._lock = lock
+            try:
+                self.close()
+                self.entries = self._read_index()
+                yield
+            finally:
+                self._lock = None
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, question_id: str) -> bool:
+        return question_id in self.entries
+
+    def _view(self) -> mmap.mmap | None:
+        if self._mmap is None and self.path.exists() and self.path.stat().st_size > 0:
+            self._file = open(self.path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            # Identifies this version of the pack file for the shared LRU
+            stat = os.fstat(self._file.fileno())
+            self._identity = (str(self.path), stat.st_ino, stat.st_mtime_ns)
+        return self._mmap
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def scan(self) -> dict[str, list[int]]:
+        """Rebuild the index by walking all records (later records win)."""
+        self.close()
+        entries = {}
+        view = self._view()
+        if view is None:
+            return entries
+
+        offset = 0
+        while offset + _RECORD_HEADER.size <= len(view):
+            (length,) = _RECORD_HEADER.unpack_from(view, offset)
+            start = offset + _RECORD_HEADER.size
+            if start + length > len(view):
+                break  # Truncated trailing record
+            try:
+                response = json.loads(view[start:start + length])
+                entries[response["question_id"]] = [offset, length]
+            except (json.JSONDecodeError, KeyError, UnicodeDecodeError):
+                pass
+            offset = start + length
+        return entries
+
+    def get(self, question_id: str) -> dict | None:
+        """Return the packed response for a question (via the shared LRU), or None."""
+        entry = self.entries.get(question_id)
+        view = self._view() if entry else None
+        if view is None:
+            return None
+        offset, length = entry
+        key = (*self._identity, offset, length)
+        response = memory_cache.get(key)
+        if response is not None:
+            return response
+
+        start = offset + _RECORD_HEADER.size
+        try:
+            response = json.loads(view[start:start + length])
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        memory_cache.put(key, response, length)
+        return response
+
+    def items(self) -> Iterator[tuple[str, dict]]:
+        """Yield (question_id, response) for all packed responses in offset order."""
+        for question_id, _ in sorted(self.entries.items(), key=lambda item: item[1][0]):
+            response = self.get(question_id)
+            if response is not None:
+                yield question_id, response
+
+    def append(self, responses: list[dict]) -> None:
+        """Append responses (keyed by their 'question_id') and update the index."""
+        if not responses:
+            return
+
+        with self.locked():
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                for response in responses:
+                    payload = json.dumps(response, separators=(",", ":")).encode("utf-8")
+                    f.write(_RECORD_HEADER.pack(len(payload)))
+                    f.write(payload)
+                    self.entries[response["question_id"]] = [offset, len(payload)]
+                    offset += _RECORD_HEADER.size + len(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Index is replaced atomically after the records are on disk
+            self._write_index()
+
+    def _write_index(self) -> None:
+        f, tmp_path = _open_temp(self.index_path, "w")
+        try:
+            with f:
+                json.dump({"version": PACK_INDEX_VERSION, "entries": self.entries}, f)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def drop(self, question_ids: set[str]) -> int:
+        """
+        Rewrite the pack without the given questions (and superseded records).
+
+        Returns:
+            Size of the pack file in bytes after the rewrite
+        """
+        with self.locked():
+            keep = [response for question_id, response in self.items() if question_id not in question_ids]
+            return self.rewrite(keep)
+
+    def rewrite(self, responses: list[dict]) -> int:
+        """
+        Replace the pack with exactly the given responses, one record each.
+
+        Returns:
+            Size of the pack file in bytes after the rewrite
+        """
+        with self.locked():
+            self.close()
+
+            f, tmp_path = _open_temp(self.path, "wb")
+            entries = {}
+            try:
+                with f:
+                    for response in responses:
+                        payload = json.dumps(response, separators=(",", ":")).encode("utf-8")
+                        entries[response["question_id"]] = [f.tell(), len(payload)]
+                        f.write(_RECORD_HEADER.pack(len(payload)))
+                        f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # Without an index the pack is rescanned, so a crash here is recoverable
+                self.index_path.unlink(missing_ok=True)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            self.entries = entries
+            self._write_index()
+            return self.path.stat().st_size
+
+
+def request_fingerprint(request: dict) -> str:
+    """
+    Content address of an API request.
+
+    Hashes the exact request kwargs (model, messages, sampling parameters),
+    so any change to the system prompt, question text or parameters yields a
+    new fingerprint, while identical requests share one across benchmarks.
+    """
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def build_fingerprint_index(model_cache: Path) -> dict[str, dict]:
+    """
+    Map request fingerprint -> cached response for one model directory.
+
+    Covers packed and loose entries (loose win); entries cached before
+    fingerprints were recorded are skipped.
+    """
+    index = {}
+    if not model_cache.exists():
+        return index
+
+    pack = ResponsePack(model_cache)
+    for _, response in pack.items():
+        if response.get("request_fingerprint"):
+            index[response["request_fingerprint"]] = response
+    pack.close()
+
+    for cache_file in sorted(model_cache.glob("*.json")):
+        try:
+            response = read_cache_file(cache_file)
+        except (json.JSONDecodeError, OSError):
+            continue
+        if response.get("request_fingerprint"):
+            index[response["request_fingerprint"]] = response
+    return index
+
+
+# Request parameters that cache entries record; an entry cached before
+# request fingerprints is only reused if the ones it recorded still match
+_RECORDED_REQUEST_FIELDS = ("temperature", "max_tokens", "reasoning_effort")
+
+
+def legacy_entry_matches(entry: dict, request: dict) -> bool:
+    """
+    Whether a cache entry without a request fingerprint may answer a request.
+
+    The entry must have been produced for the requested model (its recorded
+    deployment, else model) and agree on every request parameter it
+    recorded. Prompt changes cannot be detected this way.
+    """
+    recorded_model = entry.get("deployment", entry.get("model"))
+    if recorded_model != request.get("model"):
+        return False
+    return all(entry[key] == request.get(key) for key in _RECORDED_REQUEST_FIELDS if key in entry)
+
+
+class RequestCache:
+    """
+    Request-level reads and writes of the response cache, shared by the
+    API providers.
+
+    Each model directory's pack is opened once, and its fingerprint index
+    is built on the first fingerprint lookup and kept current by save().
+    """
+
+    def __init__(self, reuse_legacy: bool = True):
+        """
+        Args:
+            reuse_legacy: Serve entries cached before request fingerprints
+                when legacy_entry_matches() the request; False re-sends
+                those requests
+        """
+        self.reuse_legacy = reuse_legacy
+        self._packs = {}
+        self._fingerprints = {}
+
+    def load(self, model_cache: Path, question_id: str) -> dict | None:
+        """Load the cached response for a question: its loose file, else its packed record."""
+        cache_path = model_cache / f"{cache_file_stem(question_id)}.json"
+        if not cache_path.exists():
+            if model_cache not in self._packs:
+                self._packs[model_cache] = ResponsePack(model_cache)
+            return self._packs[model_cache].get(question_id)
+
+        try:
+            return read_cache_file(cache_path)
+        except (json.JSONDecodeError, OSError):
+            return None
+
+    def load_request(self, model_cache: Path, question_id: str, fingerprint: str, request: dict) -> dict | None:
+        """
+        Load the cached response for an exact request.
+
+        The entry cached for question_id is used if it was produced by the same
+        request (fingerprint of the request kwargs). Entries cached before
+        fingerprints were recorded are used as legacy entries, with
+        reuse_legacy and only when their recorded model and parameters match
+        the request; they are left unstamped, as the exact request that
+        produced them is unknown. Otherwise any entry of this model with the
+        same request fingerprint (e.g. an unchanged question under another
+        benchmark version's id) is reused and cached under question_id.
+        Returns None if the request has to be sent.
+        """
+        cached = self.load(model_cache, question_id)
+        if cached is not None:
+            stored = cached.get("request_fingerprint")
+            if stored == fingerprint:
+                return cached
+            if stored is None and self.reuse_legacy and legacy_entry_matches(cached, request):
+                return cached
+
+        if model_cache not in self._fingerprints:
+            self._fingerprints[model_cache] = build_fingerprint_index(model_cache)
+
+        match = self._fingerprints[model_cache].get(fingerprint)
+        if match is None:
+            return None
+        result = {**match, "question_id": question_id}
+        self.save(model_cache, question_id, result)
+        return result
+
+    def save(self, model_cache: Path, question_id: str, response: dict) -> None:
+        """Save a response as the loose cache file of a question."""
+        # Atomic write: an interrupted run never leaves a torn entry behind
+        write_cache_file(model_cache / f"{cache_file_stem(question_id)}.json", response)
+
+        index = self._fingerprints.get(model_cache)
+        if index is not None and response.get("request_fingerprint"):
+            index[response["request_fingerprint"]] = response
+
+    def close(self) -> None:
+        """Close the open packs."""
+        for pack in self._packs.values():
+            pack.close()
+
+
+def compact_model_cache(model_cache: Path) -> int:
+    """
+    Roll the loose cache files of one model directory into its pack.
+
+    Loose files are appended to the pack (superseding older packed
+    records) and removed once the pack index has been written.
+
+    Returns:
+        Number of responses moved into the pack
+    """
+    loose = []
+    responses = []
+    for cache_file in sorted(model_cache.glob("*.json")):
+        try:
+            with open(cache_file, "r") as f:
+                response = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            continue
+        response.setdefault("question_id", cache_file.stem)
+        responses.append(response)
+        loose.append(cache_file)
+
+    pack = ResponsePack(model_cache)
+    pack.append(responses)
+    pack.close()
+
+    for cache_file in loose:
+        cache_file.unlink()
+    return len(responses)
+
+
+def published_responses(runs: Iterable[dict]) -> set[tuple[str, str]]:
+    """
+    Cache entries referenced by published runs (e.g. RunLog.iter_runs()).
+
+    Runs record the cache directory their responses came from under
+    model_info['cache_dir']. Older runs without it may name the directory by
+    model name, (sanitized) model ID or deployment; every candidate is
+    protected.
+
+    Returns:
+        Set of (model cache directory name, question_id)
+    """
+    protected = set()
+    for run in runs:
+        model_info = run.get("model_info", {})
+        if model_info.get("cache_dir"):
+            names = {model_info["cache_dir"]}
+        else:
+            names = {run.get("model"), model_info.get("model_id"), model_info.get("deployment")}
+            names = {name.replace("/", "_").replace(":", "_") for name in names if name}
+        for question_id in run.get("answers", {}):
+            protected.update((name, question_id) for name in names)
+    return protected
+
+
+def _response_age(response: dict, default: float) -> float:
+    """Epoch seconds of a response's timestamp (default if missing or invalid)."""
+    try:
+        return datetime.fromisoformat(response["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def prune_disk_cache(
+    cache_dir: Path,
+    max_bytes: int | None = None,
+    max_age_days: float | None = None,
+    protected: set[tuple[str, str]] | None = None,
+) -> dict:
+    """
+    Evict cached responses to respect a disk size and age limit.
+
+    Entries are aged by their response timestamp (file modification time
+    if they have none). Entries older than max_age_days are evicted first;
+    then the oldest remaining entries until the live responses fit in
+    max_bytes. Protected
+    entries (see published_responses) are never evicted, so the limits may
+    be exceeded if they alone take more space. Loose files are deleted;
+    packs are rewritten without their evicted (and superseded) records.
+
+    Args:
+        cache_dir: Cache root directory
+        max_bytes: Size limit in bytes (None = unlimited)
+        max_age_days: Age limit (None = unlimited)
+        protected: (model cache directory name, question_id) pairs to keep
+
+    Returns:
+        Dict with 'entries', 'evicted', 'protected', 'bytes_before', 'bytes_after'
+    """
+    protected = protected or set()
+    now = time.time()
+    bytes_before = _cache_bytes(cache_dir)
+
+    # (age, size, model_cache, question_id, loose file or None); packed
+    # records shadowed by a loose file go with it
+    entries = []
+    shadowed = {}
+    for model_cache in sorted(cache_dir.iterdir()):
+        if not model_cache.is_dir() or model_cache.name.startswith('.'):
+            continue
+        loose = {}
+        for cache_file in model_cache.glob("*.json"):
+            stat = cache_file.stat()
+            loose[cache_file.stem] = cache_file
+            # Aged by the response timestamp, like packed records: re-extraction
+            # rewrites loose files, so their mtime is not the response's age
+            try:
+                age = _response_age(read_cache_file(cache_file), stat.st_mtime)
+            except (json.JSONDecodeError, OSError):
+                age = stat.st_mtime
+            entries.append((age, stat.st_size, model_cache, cache_file.stem, cache_file))
+
+        pack = ResponsePack(model_cache)
+        if pack.path.exists():
+            pack_mtime = pack.path.stat().st_mtime
+            for question_id, response in pack.items():
+                if cache_file_stem(question_id) in loose:
+                    shadowed[(model_cache, cache_file_stem(question_id))] = question_id
+                    continue
+                size = _RECORD_HEADER.size + pack.entries[question_id][1]
+                entries.append((_response_age(response, pack_mtime), size, model_cache, question_id, None))
+        pack.close()
+
+    total = sum(entry[1] for entry in entries)
+    evict = []
+    n_protected = 0
+    for entry in sorted(entries, key=lambda e: e[0]):
+        age, size, model_cache, question_id, _ = entry
+        if (model_cache.name, question_id) in protected:
+            n_protected += 1
+            continue
+        too_old = max_age_days is not None and now - age > max_age_days * 86400
+        too_big = max_bytes is not None and total > max_bytes
+        if too_old or too_big:
+            evict.append(entry)
+            total -= size
+
+    packed_evictions = {}
+    for _, _, model_cache, question_id, cache_file in evict:
+        if cache_file is not None:
+            cache_file.unlink(missing_ok=True)
+            question_id = shadowed.get((model_cache, cache_file.stem))
+            if question_id is None:
+                continue
+        packed_evictions.setdefault(model_cache, set()).add(question_id)
+    for model_cache, question_ids in packed_evictions.items():
+        pack = ResponsePack(model_cache)
+        pack.drop(question_ids)
+        pack.close()
+
+    return {
+        "entries": len(entries),
+        "evicted": len(evict),
+        "protected": n_protected,
+        "bytes_before": bytes_before,
+        "bytes_after": _cache_bytes(cache_dir),
+    }
+
+
+def _cache_bytes(cache_dir: Path) -> int:
+    """Bytes of cached responses on disk (loose files and packs)."""
+    total = 0
+    for model_cache in cache_dir.iterdir():
+        if model_cache.is_dir() and not model_cache.name.startswith('.'):
+            total += sum(path.stat().st_size for path in model_cache.glob("*.json"))
+            pack_path = model_cache / PACK_NAME
+            if pack_path.exists():
+                total += pack_path.stat().st_size
+    return total
+
+
+def read_model_cache(model_cache: Path) -> dict[str, tuple[Path | None, dict]]:
+    """
+    Read every packed and loose response of one model directory as stored.
+
+    Nothing is re-extracted or written back, so this is safe for read-only
+    tools; loose files override packed records for the same question.
+
+    Returns:
+        Dict mapping loose file stem to (cache_file, response), where
+        cache_file is None for responses read from the pack
+    """
+    # Keyed by loose file stem so packed and loose entries merge in file order
+    by_stem = {}
+    pack = ResponsePack(model_cache)
+    for question_id, response in pack.items():
+        by_stem[cache_file_stem(question_id)] = (None, response)
+    pack.close()
+
+    for cache_file in model_cache.glob("*.json"):
+        try:
+            by_stem[cache_file.stem] = (cache_file, read_cache_file(cache_file))
+        except (json.JSONDecodeError, OSError):
+            continue
+    return by_stem
+
+
+def load_model_responses(model_cache: Path, jobs: int | None = None) -> tuple[list[dict], list[dict]]:
+    """
+    Load all cached responses for one model directory.
+
+    Responses whose extraction result was produced by another extractor
+    version are re-extracted in one batch and written back, so later runs
+    skip them.
+
+    Args:
+        model_cache: Model cache directory
+        jobs: Worker processes for re-extraction (see extract_answers)
+
+    Returns:
+        Tuple of (responses, flips) where flips lists the re-extracted
+        responses whose answer changed compared to the stored result
+    """
+    by_stem = read_model_cache(model_cache)
+    stems = sorted(by_stem)
+    cache_files = [by_stem[stem][0] for stem in stems]
+    responses = [by_stem[stem][1] for stem in stems]
+
+    stale = [i for i, response in enumerate(responses) if stored_extraction(response) is None]
+    extracted = extract_answers([responses[i].get("raw_response", "") for i in stale], jobs=jobs)
+
+    flips = []
+    repacked = []
+    for i, (answer, pattern) in zip(stale, extracted):
+        response = responses[i]
+        previous = response.get("extraction") or {}
+        if previous and previous.get("answer") != answer:
+            flips.append({
+                "question_id": response.get("question_id", stems[i]),
+                "old_answer": previous.get("answer"),
+                "old_pattern": previous.get("pattern"),
+                "new_answer": answer,
+                "new_pattern": pattern,
+            })
+
+        response["extraction"] = extraction_record(answer, pattern)
+        if cache_files[i] is None:
+            repacked.append(response)
+            continue
+        try:
+            write_cache_file(cache_files[i], response)
+        except OSError:
+            pass
+
+    # Packed responses are updated by rewriting the pack in one pass, so
+    # re-extraction does not leave a superseded copy of every record behind
+    if repacked:
+        updated = {response["question_id"]: response for response in repacked}
+        pack = ResponsePack(model_cache)
+        try:
+            # Under the lock, so concurrent loads of this directory cannot interleave
+            with pack.locked():
+                pack.rewrite([updated.get(question_id, response) for question_id, response in pack.items()])
+        except OSError:
+            pass
+        pack.close()
+
+    return responses, flips
+
+
+def model_cache_state(model_cache: Path) -> dict:
+    """
+    Cheap change-detection state of a model cache directory (stat only).
+
+    Returns:
+        Dict with 'files' (cache and pack files), 'max_mtime' (ns) and
+        'listing' (digest of every file's name, size and mtime)
+    """
+    entries = []
+    for path in model_cache.iterdir():
+        if path.suffix == ".json" or (path.name.startswith(PACK_NAME) and path.suffix != ".tmp"):
+            stat = path.stat()
+            entries.append((path.name, stat.st_size, stat.st_mtime_ns))
+    entries.sort()
+
+    listing = "\n".join(f"{name}\t{size}\t{mtime}" for name, size, mtime in entries)
+    return {
+        "files": len(entries),
+        "max_mtime": max((mtime for _, _, mtime in entries), default=0),
+        "listing": hashlib.sha256(listing.encode("utf-8")).hexdigest()[:16],
+    }
+
+
+def analyze_model_cache(model_cache: Path, questions: QuestionIndex, jobs: int | None = None) -> dict:
+    """
+    Load one model cache directory and compute its metrics.
+
+    Returns:
+        Dict with 'model_cache', 'n_responses', 'flips', 'elapsed'
+        (seconds), and, when responses were found, 'metrics', 'provider',
+        'model_id' and 'latest_timestamp'
+    """
+    start = time.perf_counter()
+    responses, flips = load_model_responses(model_cache, jobs=jobs)
+
+    result = {
+        "model_cache": model_cache,
+        "n_responses": len(responses),
+        "flips": flips,
+    }
+    if responses:
+        # Provider and model ID from the first response
+        first_resp = responses[0]
+        timestamps = [r.get("timestamp", "") for r in responses if r.get("timestamp")]
+        result.update({
+            "metrics": compute_all_metrics(responses, questions),
+            "provider": first_resp.get("provider", "azure" if "deployment" in first_resp else "openrouter"),
+            "model_id": first_resp.get("model", model_cache.name),
+            "latest_timestamp": max(timestamps) if timestamps else datetime.now(timezone.utc).isoformat(),
+        })
+
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def restore_raw_responses(result: dict) -> dict:
+    """
+    Fill the raw responses of a snapshot result back in from its model
+    cache directory (stored as is, so nothing is re-extracted).
+    """
+    answers = result.get("metrics", {}).get("answers")
+    if not answers:
+        return result
+    for stem, (_, response) in read_model_cache(result["model_cache"]).items():
+        answer = answers.get(response.get("question_id", stem))
+        if answer is not None:
+            answer["raw_response"] = response.get("raw_response", "")
+    return result
+
+
+# Benchmark index of a pool worker, built once by its initializer
+_worker_questions: QuestionIndex | None = None
+
+
+def _init_analysis_worker(questions: list[dict]) -> None:
+    global _worker_questions
+    _worker_questions = QuestionIndex(questions)
+
+
+def _analyze_in_worker(model_cache: Path) -> dict:
+    # One level of parallelism: no nested extraction pool inside a worker
+    before = memory_cache.counters()
+    result = analyze_model_cache(model_cache, _worker_questions, jobs=1)
+    # This worker's LRU lookups, summed into the parent's stats
+    result["memory_cache_counts"] = {
+        key: value - before[key] for key, value in memory_cache.counters().items()
+    }
+    return result
+
+
+def analyze_model_caches(
+    model_caches: list[Path],
+    questions: QuestionIndex,
+    jobs: int = 1,
+    snapshots: AnalysisSnapshots | None = None,
+) -> Iterator[dict]:
+    """
+    Analyze several model cache directories, optionally in parallel.
+
+    Results are yielded in the order of model_caches regardless of which
+    worker finishes first, so output is deterministic.
+
+    Args:
+        model_caches: Model cache directories
+        questions: Benchmark index
+        jobs: Worker processes (1 = serial, in this process)
+        snapshots: Saved analyses; directories unchanged since their snapshot
+            are not reloaded (result has 'from_snapshot'), the rest are
+            analyzed and their snapshots and the manifest updated
+
+    Yields:
+        analyze_model_cache() result per directory
+    """
+    if snapshots is None:
+        yield from _analyze_all(model_caches, questions, jobs)
+        return
+
+    reused = {}
+    for model_cache in model_caches:
+        result = snapshots.load(model_cache, model_cache_state(model_cache))
+        if result is not None:
+            reused[model_cache] = result
+
+    changed = [model_cache for model_cache in model_caches if model_cache not in reused]
+    analyzed = _analyze_all(changed, questions, jobs)
+    try:
+        for model_cache in model_caches:
+            if model_cache in reused:
+                # Raw responses are read back one model at a time, as they are yielded
+                yield restore_raw_responses(reused.pop(model_cache))
+                continue
+            result = next(analyzed)
+            # State is taken after analysis, which may have rewritten stale entries
+            snapshots.save(result, model_cache_state(model_cache))
+            yield result
+    finally:
+        # Shut the worker pool down now, also when the caller stops early
+        analyzed.close()
+
+    snapshots.write_manifest()
+
+
+def _analyze_all(model_caches: list[Path], questions: QuestionIndex, jobs: int) -> Iterator[dict]:
+    if jobs <= 1 or len(model_caches) <= 1:
+        for model_cache in model_caches:
+            yield analyze_model_cache(model_cache, questions)
+        return
+
+    # Resolve the CI z-score (imports scipy) once here so forked workers inherit it
+    compute_wilson_ci(1, 1)
+
+    # The index holds read-only mappings; workers rebuild it from the raw dicts
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(model_caches)),
+        initializer=_init_analysis_worker,
+        initargs=(list(questions.questions),),
+    ) as executor:
+        # At most `jobs` results in flight, so a slow consumer does not let
+        # finished models pile up in memory (executor.map submits everything)
+        pending = deque()
+        for model_cache in model_caches:
+            pending.append(executor.submit(_analyze_in_worker, model_cache))
+            if len(pending) >= jobs:
+                yield _worker_result(pending.popleft())
+        while pending:
+            yield _worker_result(pending.popleft())
+
+
+def _worker_result(future) -> dict:
+    """Result of a worker analysis, with its LRU counters added to the parent's."""
+    result = future.result()
+    memory_cache.record_worker(result.pop("memory_cache_counts", {}))
+    return result
+
+
+def print_analysis_timing(timings: list[tuple[str, float, bool]], wall_time: float, jobs: int) -> None:
+    """
+    Print analysis wall time and speed-up over the summed per-model (serial) time.
+
+    timings holds one (model cache name, elapsed seconds, from_snapshot)
+    tuple per analyzed model cache.
+    """
+    serial_time = sum(elapsed for _, elapsed, _ in timings)
+    reused = sum(1 for _, _, from_snapshot in timings if from_snapshot)
+    print(f"  Analyzed {len(timings)} model cache(s) in {wall_time:.2f}s with {jobs} job(s)")
+    if reused:
+        print(f"    Reused {reused} unchanged snapshot(s), recomputed {len(timings) - reused}")
+    if jobs > 1 and wall_time > 0:
+        print(f"    Summed per-model time: {serial_time:.2f}s (speed-up {serial_time / wall_time:.1f}x)")
+
+
+def print_cache_stats(prune_stats: dict | None = None, indent: str = "  ") -> None:
+    """
+    Print the LRU counters (this process plus analysis workers) and, if
+    given, a prune_disk_cache() result.
+    """
+    stats = memory_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+    worker_lookups = stats["worker_hits"] + stats["worker_misses"]
+    workers = f" ({worker_lookups} lookups in worker processes)" if worker_lookups else ""
+    print(
+        f"{indent}Memory cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1f}% hit rate), "
+        f"{stats['evictions']} evictions{workers}; "
+        f"{stats['entries']} entries / {stats['bytes'] / 1e6:.1f} of {stats['max_bytes'] / 1e6:.1f} MB in this process"
+    )
+    if prune_stats is not None:
+        print(
+            f"{indent}Disk cache: evicted {prune_stats['evicted']} of {prune_stats['entries']} responses "
+            f"({prune_stats['protected']} protected by published runs), "
+            f"{prune_stats['bytes_before'] / 1e6:.1f} -> {prune_stats['bytes_after'] / 1e6:.1f} MB"
+        )
+
+
+def print_extraction_flips(flips: list[dict], indent: str = "    ") -> None:
+    """Print answers that changed after re-extraction with a new extractor version."""
+    if not flips:
+        return
+
+    print(f"{indent}Extraction changed {len(flips)} answer(s) (extractor {EXTRACTOR_VERSION}):")
+    for flip in flips:
+        print(
+            f"{indent}  {flip['question_id']}: "
+            f"{flip['old_answer'] or 'failed'} ({flip['old_pattern']}) -> "
+            f"{flip['new_answer'] or 'failed'} ({flip['new_pattern']})"
+        )
@@ -0,0 +1,196 @@
+"""
+Columnar results matrix for FormationEval evaluation pipeline.
+
+Holds the per-question results of one or more runs as NumPy arrays
+(models x questions), built once, so that breakdowns, bias metrics and
+question rankings are computed as vectorized operations.
+"""
+
+from typing import Iterable
+
+import numpy as np
+
+from question_index import LETTERS, QuestionIndex, question_index
+
+_LETTER_CODES = {letter: i for i, letter in enumerate(LETTERS)}
+
+
+class ResultsMatrix:
+    """
+    Per-question results of several runs as (models x questions) arrays.
+
+    Attributes:
+        models: Model name per row
+        questions: QuestionIndex for the columns
+        answered: bool, True where the run has a result for the question
+        correct: bool, True where the answer was correct
+        predicted: int8, predicted choice index (0-3), -1 if failed or missing
+    """
+
+    def __init__(
+        self,
+        models: list[str],
+        questions: QuestionIndex,
+        answered: np.ndarray,
+        correct: np.ndarray,
+        predicted: np.ndarray,
+    ):
+        self.models = models
+        self.questions = questions
+        self.answered = answered
+        self.correct = correct
+        self.predicted = predicted
+        self._cache = {}
+
+    @staticmethod
+    def run_row(run: dict, questions: QuestionIndex) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Convert one run's 'answers' mapping into matrix rows.
+
+        Returns:
+            Tuple of (answered, correct, predicted) arrays over the questions
+        """
+        n_questions = len(questions)
+        answered = np.zeros(n_questions, dtype=bool)
+        correct = np.zeros(n_questions, dtype=bool)
+        predicted = np.full(n_questions, -1, dtype=np.int8)
+
+        answers = run.get("answers", {})
+        count = len(answers)
+        cols = np.fromiter((questions.column.get(qid, -1) for qid in answers), dtype=np.int64, count=count)
+        is_correct = np.fromiter(
+            (bool(result.get("correct", False)) for result in answers.values()), dtype=bool, count=count
+        )
+        letters = np.fromiter(
+            (_LETTER_CODES.get(result.get("predicted"), -1) for result in answers.values()),
+            dtype=np.int8, count=count,
+        )
+        known = cols >= 0
+        cols = cols[known]
+        answered[cols] = True
+        correct[cols] = is_correct[known]
+        predicted[cols] = letters[known]
+        return answered, correct, predicted
+
+    @classmethod
+    def from_rows(
+        cls,
+        models: list[str],
+        questions: QuestionIndex,
+        rows: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    ) -> "ResultsMatrix":
+        """Stack run_row() results (one per model) into a matrix."""
+        n_questions = len(questions)
+        if not rows:
+            empty = np.zeros((0, n_questions), dtype=bool)
+            return cls(list(models), questions, empty, empty.copy(), np.zeros((0, n_questions), dtype=np.int8))
+        answered, correct, predicted = (np.stack(arrays) for arrays in zip(*rows))
+        return cls(list(models), questions, answered, correct, predicted)
+
+    @classmethod
+    def from_runs(cls, runs: Iterable[dict], questions: list[dict] | QuestionIndex) -> "ResultsMatrix":
+        """Build the matrix from run dicts with an 'answers' mapping (any iterable, read once)."""
+        index = question_index(questions)
+        models = []
+        rows = []
+        for run in runs:
+            models.append(run.get("model", "unknown"))
+            rows.append(cls.run_row(run, index))
+        return cls.from_rows(models, index, rows)
+
+    @classmethod
+    def from_answers(cls, answers: dict, questions: list[dict] | QuestionIndex, model: str = "unknown") -> "ResultsMatrix":
+        """Build a single-row matrix from one run's results_by_qid."""
+        return cls.from_runs([{"model": model, "answers": answers}], questions)
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def _cached(self, key: str, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def group_counts(self, membership: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Count correct and answered questions per model and group.
+
+        Args:
+            membership: bool array (questions x groups)
+
+        Returns:
+            Tuple of (correct, total) int arrays (models x groups)
+        """
+        weights = membership.astype(np.float32)
+        correct = self.correct.astype(np.float32) @ weights
+        total = self.answered.astype(np.float32) @ weights
+        return np.rint(correct).astype(np.int64), np.rint(total).astype(np.int64)
+
+    def difficulty_counts(self) -> tuple[list[str], np.ndarray, np.ndarray]:
+        """Return (labels, correct, total) per model and difficulty level."""
+        def compute():
+            correct, total = self.group_counts(self.questions.difficulty_membership())
+            return self.questions.difficulty_labels, correct, total
+        return self._cached("difficulty", compute)
+
+    def domain_counts(self) -> tuple[list[str], np.ndarray, np.ndarray]:
+        """Return (labels, correct, total) per model and domain."""
+        def compute():
+            correct, total = self.group_counts(self.questions.domains)
+            return self.questions.domain_labels, correct, total
+        return self._cached("domain", compute)
+
+    def position_counts(self) -> np.ndarray:
+        """Return predicted A/B/C/D counts per model (models x 4)."""
+        def compute():
+            return np.stack(
+                [(self.predicted == i).sum(axis=1) for i in range(len(LETTERS))], axis=1
+            )
+        return self._cached("position", compute)
+
+    def length_counts(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return length-bias counts per model.
+
+        Returns:
+            Tuple of (longest_picked, valid_total, correct_is_longest) where
+            valid_total counts questions with an extracted answer
+        """
+        def compute():
+            valid = self.predicted >= 0
+            longest = self.questions.longest_index
+            longest_picked = (valid & (self.predicted == longest)).sum(axis=1)
+            correct_is_longest = (valid & (self.questions.answer_index == longest)).sum(axis=1)
+            return longest_picked, valid.sum(axis=1), correct_is_longest
+        return self._cached("length", compute)
+
+    def failure_counts(self) -> np.ndarray:
+        """Return the number of runs that answered each question incorrectly."""
+        return self._cached("failures", lambda: (self.answered & ~self.correct).sum(axis=0))
+
+    def hardest_columns(self, top_n: int) -> list[int]:
+        """
+        Return column indices of the most-failed questions.
+
+        Only questions failed by at least one run are included. Ties keep
+        benchmark order.
+        """
+        failures = self.failure_counts()
+        order = np.argsort(-failures, kind="stable")
+        order = order[failures[order] > 0]
+        return order[:top_n].tolist()
+
+    def agreement_counts(self) -> tuple[int, int, int]:
+        """
+        Count questions answered correctly by all, none, or some of the runs.
+
+        Only runs that have a result for a question are considered; questions
+        without any result are skipped.
+        """
+        n_answered = self.answered.sum(axis=0)
+        n_correct = self.correct.sum(axis=0)
+        has_results = n_answered > 0
+        all_correct = int((has_results & (n_correct == n_answered)).sum())
+        all_wrong = int((has_results & (n_correct == 0)).sum())
+        mixed = int(has_results.sum()) - all_correct - all_wrong
+        return all_correct, all_wrong, mixed
@@ -8,16 +8,20 @@ Usage:
     python eval/run_evaluation.py                      # Run all models
     python eval/run_evaluation.py --models gpt-4o-mini # Run specific model(s)
     python eval/run_evaluation.py --analyze-only       # Regenerate reports from cache
+    python eval/run_evaluation.py --analyze-only --jobs 8  # ... across 8 processes
+    python eval/run_evaluation.py --compact                # Pack cache files per model
+    python eval/run_evaluation.py --models X --sample 50 --stratify-by domain,difficulty  # Smoke run
 """
 
 import argparse
 import asyncio
-import json
 import os
 import re
 import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterator
 
 import yaml
 
@@ -29,8 +33,23 @@ sys.path.insert(0, str(SCRIPT_DIR))
 from dotenv import load_dotenv
 
 from providers.azure_openai import AzureOpenAIProvider
-from metrics import compute_all_metrics
+from metrics import OnlineMetrics
+from question_index import QuestionIndex, load_benchmark
 from reports import generate_all_reports
+from run_log import RunLog
+from subset import describe_subset, select_subset, stratified_estimate
+from cache_manifest import AnalysisSnapshots
+from response_cache import (
+    DEFAULT_MEMORY_CACHE_BYTES,
+    analyze_model_caches,
+    compact_model_cache,
+    configure_memory_cache,
+    print_analysis_timing,
+    print_cache_stats,
+    print_extraction_flips,
+    prune_disk_cache,
+    published_responses,
+)
 
 # Load environment variables
 load_dotenv(PROJECT_ROOT / ".env")
@@ -61,18 +80,12 @@ def load_config(config_path: Path) -> dict:
     return config
 
 
-def load_benchmark(benchmark_path: Path) -> list[dict]:
-    """Load benchmark questions from JSON file."""
-    with open(benchmark_path, "r") as f:
-        questions = json.load(f)
-    return questions
-
-
 async def run_model_evaluation(
     provider: AzureOpenAIProvider,
     model_config: dict,
-    questions: list[dict],
+    questions: QuestionIndex,
     concurrency: int = 20,
+    subset: dict | None = None,
 ) -> dict:
     """
     Run evaluation for a single model.
@@ -92,6 +105,9 @@ async def run_model_evaluation(
     print(f"  Questions: {len(questions)}")
     print(f"{'='*60}")
 
+    # Metrics are accumulated as responses arrive and shown with the progress
+    live_metrics = OnlineMetrics(questions)
+
     # Progress callback
     try:
         from tqdm import tqdm
@@ -99,13 +115,14 @@ async def run_model_evaluation(
 
         def progress(completed, total):
             pbar.n = completed
+            pbar.set_postfix_str(live_metrics.summary(), refresh=False)
             pbar.refresh()
     except ImportError:
         pbar = None
 
         def progress(completed, total):
             if completed % 50 == 0 or completed == total:
-                print(f"  Progress: {completed}/{total}")
+                print(f"  Progress: {completed}/{total} {live_metrics.summary()}")
 
     # Run evaluation (use model_name as cache_key to separate reasoning_effort variations)
     responses = await provider.evaluate_batch(
@@ -115,13 +132,14 @@ async def run_model_evaluation(
         reasoning_effort=reasoning_effort,
         cache_key=model_name,
         progress_callback=progress,
+        metrics=live_metrics,
     )
 
     if pbar:
         pbar.close()
 
-    # Compute metrics
-    metrics = compute_all_metrics(responses, questions)
+    # Final metrics (identical to compute_all_metrics on the responses)
+    metrics = live_metrics.finalize()
 
     # Build run result
     run_id = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H%M%S")
@@ -132,23 +150,34 @@ async def run_model_evaluation(
         "model_info": {
             "deployment": deployment,
             "reasoning_effort": reasoning_effort,
+            "cache_dir": model_name,
         },
         **metrics,
     }
+    if subset:
+        run_result["subset"] = subset
+        run_result.update(stratified_estimate(metrics["answers"], questions, subset))
 
     # Print summary
     print(f"\n  Results for {model_name}:")
     print(f"    Accuracy: {metrics['accuracy']*100:.1f}% ({metrics['correct']}/{metrics['total']})")
     print(f"    95% CI: [{metrics['ci_lower']*100:.1f}%, {metrics['ci_upper']*100:.1f}%]")
     print(f"    Failed extractions: {metrics['failed_extractions']}")
+    if "weighted_accuracy" in run_result:
+        print(
+            f"    Reweighted accuracy: {run_result['weighted_accuracy']*100:.1f}% "
+            f"[{run_result['weighted_ci_lower']*100:.1f}%, {run_result['weighted_ci_upper']*100:.1f}%]"
+        )
 
     return run_result
 
 
 async def run_all_evaluations(
     config: dict,
-    questions: list[dict],
+    questions: QuestionIndex,
     selected_models: list[str] | None = None,
+    subset: dict | None = None,
+    requery_legacy: bool = False,
 ) -> list[dict]:
     """
     Run evaluations for all configured models.
@@ -157,6 +186,9 @@ async def run_all_evaluations(
         config: Loaded config dict
         questions: List of questions
         selected_models: Optional list of model names to run (None = all)
+        subset: Subset metadata from select_subset() when questions is a subset
+        requery_legacy: Re-send requests whose cached responses predate
+            request fingerprints instead of reusing the matching ones
 
     Returns:
         List of run result dicts
@@ -177,6 +209,7 @@ async def run_all_evaluations(
         cache_dir=cache_dir,
         max_retries=config.get("inference", {}).get("max_retries", 3),
         timeout=config.get("inference", {}).get("timeout_seconds", 30),
+        reuse_legacy_cache=not requery_legacy,
     )
 
     concurrency = config.get("inference", {}).get("concurrency", 20)
@@ -202,6 +235,7 @@ async def run_all_evaluations(
                 model_config=model_config,
                 questions=questions,
                 concurrency=concurrency,
+                subset=subset,
             )
             all_runs.append(run_result)
         except Exception as e:
@@ -212,70 +246,142 @@ async def run_all_evaluations(
     return all_runs
 
 
-def analyze_from_cache(config: dict, questions: list[dict]) -> list[dict]:
+def analyze_from_cache(
+    config: dict,
+    questions: QuestionIndex,
+    jobs: int = 1,
+    incremental: bool = True,
+) -> Iterator[dict]:
     """
     Rebuild metrics from cached responses (no API calls).
 
-    Useful for re-analyzing results after code changes.
+    Runs are yielded one model at a time, so only one model's responses
+    and answers are held in memory.
+
+    With incremental=True, model caches unchanged since the last analysis
+    (per the cache manifest) are taken from their saved metrics snapshots.
+
+    Useful for re-analyzing results after code changes. Model caches are
+    loaded and analyzed across `jobs` processes, each cache directory once
+    even when several configured models share its deployment. Runs follow
+    config order, with the models of one directory next to each other.
     """
     cache_dir = PROJECT_ROOT / config.get("cache", {}).get("directory", "eval/cache")
 
     if not cache_dir.exists():
         print(f"Cache directory not found: {cache_dir}")
-        return []
-
-    models = config.get("models", [])
-    all_runs = []
+        return
 
-    for model_config in models:
+    # Models sharing a deployment (e.g. reasoning effort variants) share one
+    # cache directory, which is analyzed once
+    models_by_cache = {}
+    for model_config in config.get("models", []):
         model_name = model_config["name"]
         deployment = model_config.get("deployment", model_name)
-        model_cache = cache_dir / deployment
 
-        if not model_cache.exists():
+        if not (cache_dir / deployment).exists():
             print(f"  No cache for {model_name}, skipping")
             continue
+        models_by_cache.setdefault(cache_dir / deployment, []).append(model_config)
 
-        print(f"  Loading cache for {model_name}...")
+    model_caches = list(models_by_cache)
+    # Only the timings are kept: holding the results would keep every model's answers alive
+    timings = []
+    start = time.perf_counter()
 
-        # Load all cached responses
-        responses = []
-        for cache_file in model_cache.glob("*.json"):
-            try:
-                with open(cache_file, "r") as f:
-                    responses.append(json.load(f))
-            except (json.JSONDecodeError, OSError):
+    snapshots = AnalysisSnapshots(cache_dir, questions, reuse=incremental)
+    # Iterate the generator to the end (not zip): the manifest is written once it is exhausted
+    for position, result in enumerate(analyze_model_caches(model_caches, questions, jobs=jobs, snapshots=snapshots)):
+        timings.append((result["model_cache"].name, result["elapsed"], bool(result.get("from_snapshot"))))
+
+        for model_config in models_by_cache[model_caches[position]]:
+            model_name = model_config["name"]
+            deployment = model_config.get("deployment", model_name)
+
+            print(f"  Loading cache for {model_name}...")
+
+            if not result["n_responses"]:
+                print(f"    No cached responses found")
                 continue
 
-        if not responses:
-            print(f"    No cached responses found")
+            if result.get("from_snapshot"):
+                print(f"    Unchanged, using snapshot ({result['n_responses']} responses)")
+            else:
+                print(f"    Loaded {result['n_responses']} cached responses")
+            print_extraction_flips(result["flips"])
+
+            metrics = result["metrics"]
+            run_result = {
+                "run_id": f"cache_{model_name}",
+                "run_timestamp": result["latest_timestamp"],
+                "model": model_name,
+                "model_info": {
+                    "deployment": deployment,
+                    "reasoning_effort": model_config.get("reasoning_effort"),
+                    "source": "cache",
+                    "cache_dir": result["model_cache"].name,
+                },
+                **metrics,
+            }
+
+            print(f"    Accuracy: {metrics['accuracy']*100:.1f}%")
+            yield run_result
+
+    print_analysis_timing(timings, time.perf_counter() - start, jobs)
+
+
+def compact_cache(config: dict) -> None:
+    """Roll loose cache files of every model directory into its pack file."""
+    cache_dir = PROJECT_ROOT / config.get("cache", {}).get("directory", "eval/cache")
+
+    if not cache_dir.exists():
+        print(f"Cache directory not found: {cache_dir}")
+        return
+
+    for model_cache in sorted(cache_dir.iterdir()):
+        if not model_cache.is_dir() or model_cache.name.startswith('.'):
             continue
+        packed = compact_model_cache(model_cache)
+        if packed:
+            print(f"  {model_cache.name}: packed {packed} response(s)")
 
-        print(f"    Loaded {len(responses)} cached responses")
 
-        # Compute metrics
-        metrics = compute_all_metrics(responses, questions)
+def prune_cache(config: dict, force: bool = False) -> dict | None:
+    """
+    Enforce the configured disk cache limits (cache.max_size_mb, cache.max_age_days).
 
-        # Get timestamp from most recent response
-        timestamps = [r.get("timestamp", "") for r in responses if r.get("timestamp")]
-        latest_ts = max(timestamps) if timestamps else datetime.now(timezone.utc).isoformat()
+    Responses referenced by runs in the results run log are kept.
+    Returns the prune_disk_cache() stats, or None if no limit is configured
+    and force is False.
+    """
+    cache_config = config.get("cache", {})
+    cache_dir = PROJECT_ROOT / cache_config.get("directory", "eval/cache")
+    max_size_mb = cache_config.get("max_size_mb")
+    max_age_days = cache_config.get("max_age_days")
 
-        run_result = {
-            "run_id": f"cache_{model_name}",
-            "run_timestamp": latest_ts,
-            "model": model_name,
-            "model_info": {
-                "deployment": deployment,
-                "reasoning_effort": model_config.get("reasoning_effort"),
-                "source": "cache",
-            },
-            **metrics,
-        }
+    if not cache_dir.exists() or (max_size_mb is None and max_age_days is None and not force):
+        return None
 
-        all_runs.append(run_result)
-        print(f"    Accuracy: {metrics['accuracy']*100:.1f}%")
+    output_dir = PROJECT_ROOT / config.get("output", {}).get("directory", "eval/results")
+    return prune_disk_cache(
+        cache_dir,
+        max_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb is not None else None,
+        max_age_days=max_age_days,
+        protected=published_responses(RunLog(output_dir).iter_runs()),
+    )
 
-    return all_runs
+
+def export_results_json(config: dict, total_questions: int) -> None:
+    """Write all_results.json (all logged runs with raw responses) from the run log."""
+    output_dir = PROJECT_ROOT / config.get("output", {}).get("directory", "eval/results")
+    run_log = RunLog(output_dir)
+    output_path = output_dir / "all_results.json"
+    count = run_log.export_json(
+        output_path,
+        benchmark_version=config.get("benchmark", {}).get("version", "formationeval_v0.1"),
+        total_questions=total_questions,
+    )
+    print(f"  Exported {count} run(s) to {output_path}")
 
 
 def main():
@@ -288,6 +394,12 @@ Examples:
   python eval/run_evaluation.py --models gpt-4o-mini  # Run one model
   python eval/run_evaluation.py --models gpt-4o gpt-5-mini  # Run multiple
   python eval/run_evaluation.py --analyze-only        # Rebuild reports from cache
+  python eval/run_evaluation.py --analyze-only --jobs 8  # Same, 8 worker processes
+  python eval/run_evaluation.py --compact              # Pack cache files per model
+  python eval/run_evaluation.py --prune                # Apply cache size/age limits
+  python eval/run_evaluation.py --export-json          # Write all_results.json from the run log
+  python eval/run_evaluation.py --models X --sample 50 --stratify-by domain,difficulty
+  python eval/run_evaluation.py --models X --domain Petrophysics --difficulty hard
         """,
     )
     parser.add_argument(
@@ -306,6 +418,76 @@ Examples:
         action="store_true",
         help="Regenerate reports from cached responses (no API calls)",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for --analyze-only and report generation (default: 1, serial)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="With --analyze-only, recompute every model instead of reusing unchanged snapshots",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Roll loose cache files into one pack file per model and exit",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Evict cached responses beyond the configured size/age limits and exit",
+    )
+    parser.add_argument(
+        "--export-json",
+        action="store_true",
+        help="Export all logged runs to results/all_results.json and exit",
+    )
+    parser.add_argument(
+        "--domain",
+        nargs="+",
+        help="Only evaluate questions in these domain(s)",
+    )
+    parser.add_argument(
+        "--difficulty",
+        nargs="+",
+        help="Only evaluate questions of these difficulty level(s)",
+    )
+    parser.add_argument(
+        "--topic",
+        nargs="+",
+        help="Only evaluate questions with these topic(s)",
+    )
+    parser.add_argument(
+        "--ids-file",
+        type=Path,
+        help="Only evaluate the question ids listed in this file (one per line)",
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        help="Evaluate a random sample of N of the selected questions",
+    )
+    parser.add_argument(
+        "--stratify-by",
+        help="Stratify --sample by comma-separated fields: domain, difficulty",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed for --sample (default: 0)",
+    )
+    parser.add_argument(
+        "--requery-legacy",
+        action="store_true",
+        help=(
+            "Re-send requests whose cached response predates request fingerprints. By default such "
+            "responses are reused when their recorded model and parameters (deployment, reasoning "
+            "effort) match the request; prompt or temperature changes cannot be detected for them"
+        ),
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -317,13 +499,55 @@ Examples:
     # Load config
     print(f"Loading config from: {args.config}")
     config = load_config(args.config)
+    memory_cache_mb = config.get("cache", {}).get("memory_cache_mb")
+    configure_memory_cache(
+        int(memory_cache_mb * 1024 * 1024) if memory_cache_mb is not None else DEFAULT_MEMORY_CACHE_BYTES
+    )
+
+    if args.compact:
+        print("\n=== COMPACTING CACHE ===")
+        compact_cache(config)
+        return
+
+    if args.prune:
+        print("\n=== PRUNING CACHE ===")
+        print_cache_stats(prune_cache(config, force=True))
+        return
 
     # Load benchmark
     benchmark_path = PROJECT_ROOT / config.get("benchmark", {}).get("path", "data/benchmark/formationeval_v0.1.json")
     print(f"Loading benchmark from: {benchmark_path}")
-    questions = load_benchmark(benchmark_path)
+    # Validated index snapshot next to the response cache (skips JSON parsing on later starts)
+    snapshot_dir = None
+    if config.get("cache", {}).get("enabled", True):
+        snapshot_dir = PROJECT_ROOT / config.get("cache", {}).get("directory", "eval/cache") / ".benchmark"
+    questions = load_benchmark(benchmark_path, snapshot_dir)
     print(f"  Loaded {len(questions)} questions")
 
+    if args.export_json:
+        print("\n=== EXPORTING RESULTS ===")
+        export_results_json(config, len(questions))
+        return
+
+    # Benchmark subset for quick runs (labelled in the run metadata)
+    try:
+        questions, subset = select_subset(
+            questions,
+            domains=args.domain,
+            difficulties=args.difficulty,
+            topics=args.topic,
+            ids_file=args.ids_file,
+            sample=args.sample,
+            stratify_by=args.stratify_by,
+            seed=args.seed,
+        )
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    if subset:
+        if args.analyze_only:
+            parser.error("subset options select questions to evaluate and cannot be combined with --analyze-only")
+        print(f"  Subset: {describe_subset(subset)}")
+
     # Dry run - just show config
     if args.dry_run:
         print("\n=== DRY RUN ===")
@@ -341,45 +565,65 @@ Examples:
     if args.analyze_only:
         print("\n=== ANALYZE ONLY MODE ===")
         print("Rebuilding metrics from cache (no API calls)")
-        all_runs = analyze_from_cache(config, questions)
+        all_runs = analyze_from_cache(config, questions, jobs=args.jobs, incremental=not args.full)
     else:
         print("\n=== RUNNING EVALUATION ===")
         all_runs = asyncio.run(run_all_evaluations(
             config=config,
             questions=questions,
             selected_models=args.models,
+            subset=subset,
+            requery_legacy=args.requery_legacy,
         ))
 
-    if not all_runs:
-        print("\nNo evaluation results to report.")
-        return
-
     # Generate reports
     output_dir = PROJECT_ROOT / config.get("output", {}).get("directory", "eval/results")
     benchmark_version = config.get("benchmark", {}).get("version", "formationeval_v0.1")
+    stats_config = config.get("statistics", {})
 
     print(f"\n=== GENERATING REPORTS ===")
     print(f"Output directory: {output_dir}")
 
+    # Runs stream through the reports; keep only their aggregates for the summary
+    summaries = []
+
+    def summarize(runs):
+        for run in runs:
+            summaries.append({key: value for key, value in run.items() if key != "answers"})
+            yield run
+
     paths = generate_all_reports(
-        all_runs=all_runs,
+        all_runs=summarize(all_runs),
         questions=questions,
         output_dir=output_dir,
         benchmark_version=benchmark_version,
+        n_resamples=stats_config.get("bootstrap_resamples", 10000),
+        stratify_by_domain=stats_config.get("stratify_by_domain", False),
+        columnar_format=config.get("output", {}).get("columnar_format", "parquet"),
+        jobs=args.jobs,
+        render_figures=config.get("output", {}).get("figures", True),
     )
 
+    if not paths:
+        print("\nNo evaluation results to report.")
+        return
+
     print(f"\nReports generated:")
     for name, path in paths.items():
         print(f"  - {name}: {path}")
 
+    # Disk limits are applied after the runs are logged, so new runs are protected
+    print(f"\nCache:")
+    print_cache_stats(prune_cache(config))
+
     # Print final summary
     print(f"\n{'='*60}")
     print("EVALUATION COMPLETE")
     print(f"{'='*60}")
-    print(f"Models evaluated: {len(all_runs)}")
+    print(f"Models evaluated: {len(summaries)}")
     print(f"Questions per model: {len(questions)}")
     print(f"\nTop performers:")
-    sorted_runs = sorted(all_runs, key=lambda x: -x.get("accuracy", 0))
+    sorted_runs = sorted(summaries, key=lambda x: -x.get("accuracy", 0))
     for i, run in enumerate(sorted_runs[:3], 1):
         print(f"  {i}. {run['model']}: {run['accuracy']*100:.1f}%")
 
@@ -0,0 +1,310 @@
+"""
+Append-only run log for FormationEval evaluation pipeline.
+
+Every evaluation run is appended as one JSON line to `runs.jsonl` in the
+results directory; a sidecar index (`runs.jsonl.idx`) maps run_id to the
+[offset, length] of its line. Raw model responses are stripped from the
+logged answers and stored per run in `runs_raw/{run_id}.json`, so the log
+stays small. Appends take an exclusive file lock, so concurrent Azure and
+OpenRouter runs can share one results directory.
+
+Runs analyzed from the response cache (run_id `cache_{model}`) are
+re-derived on every --analyze-only pass. A changed analysis is appended
+again and replaces the logged one; the old line is no longer indexed, and
+once superseded lines make up more than COMPACT_RATIO of the log it is
+rewritten without them.
+
+`all_results.json` is no longer written on every run; export_json()
+rebuilds it from the log on demand.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked
+    fcntl = None
+
+RUN_LOG_NAME = "runs.jsonl"
+RUN_INDEX_SUFFIX = ".idx"
+RUN_INDEX_VERSION = 2
+RAW_DIR_NAME = "runs_raw"
+LOCK_NAME = "runs.lock"
+
+# Run ids of cache analyses, which a newer analysis replaces
+REPLACEABLE_PREFIX = "cache_"
+
+# Share of the log taken by superseded lines that triggers a compaction
+COMPACT_RATIO = 0.5
+
+
+def _safe_run_id(run_id: str) -> str:
+    """File name stem for a run id."""
+    return run_id.replace("/", "_").replace("\\", "_").replace(":", "_")
+
+
+def _write_json(path: Path, data) -> None:
+    """Write JSON atomically (temp file + rename)."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def replaceable(run_id: str) -> bool:
+    """Whether a newer run with this id replaces the logged one."""
+    return run_id.startswith(REPLACEABLE_PREFIX)
+
+
+def _indent_json(value, level: int) -> str:
+    """json.dumps(value, indent=2) nested `level` spaces deep."""
+    return json.dumps(value, indent=2).replace("\n", "\n" + " " * level)
+
+
+def split_raw_responses(run: dict) -> tuple[dict, dict]:
+    """
+    Separate raw responses from a run.
+
+    Returns:
+        Tuple of (run without 'raw_response' in its answers,
+        mapping question_id -> raw response)
+    """
+    answers = {}
+    raw = {}
+    for qid, result in run.get("answers", {}).items():
+        result = dict(result)
+        raw[qid] = result.pop("raw_response", "")
+        answers[qid] = result
+    return {**run, "answers": answers}, raw
+
+
+class RunLog:
+    """
+    Append-only JSONL log of evaluation runs in a results directory.
+
+    Runs are unique by 'run_id': appending a run whose id is already logged
+    is a no-op, as with the append-only all_results.json it replaces. Cache
+    analyses (see replaceable()) are the exception: a changed one replaces
+    the logged run and moves to the end of the append order.
+    """
+
+    def __init__(self, results_dir: Path):
+        self.dir = results_dir
+        self.path = results_dir / RUN_LOG_NAME
+        self.index_path = self.path.with_name(RUN_LOG_NAME + RUN_INDEX_SUFFIX)
+        self.raw_dir = results_dir / RAW_DIR_NAME
+        self.lock_path = results_dir / LOCK_NAME
+        self.entries = {}
+        self.size = 0
+        self.inode = None
+
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r") as f:
+                    index = json.load(f)
+                if index.get("version") == RUN_INDEX_VERSION:
+                    self.entries = index.get("entries", {})
+                    self.size = index.get("size", 0)
+                    self.inode = index.get("inode")
+            except (json.JSONDecodeError, OSError):
+                pass
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, run_id: str) -> bool:
+        return run_id in self.entries
+
+    def run_ids(self) -> list[str]:
+        """Logged run ids in append order."""
+        return [run_id for run_id, _ in sorted(self.entries.items(), key=lambda item: item[1][0])]
+
+    @contextmanager
+    def _locked(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def refresh(self) -> None:
+        """Index lines appended since the last read (e.g. by another process)."""
+        try:
+            stat = self.path.stat()
+            size, inode = stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            size, inode = 0, None
+        if size < self.size or inode != self.inode:
+            # Log replaced (e.g. compacted) or truncated: rebuild the index from scratch
+            self.entries = {}
+            self.size = 0
+            self.inode = inode
+        if size == self.size:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self.size)
+            offset = self.size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Incomplete trailing line (interrupted append)
+                try:
+                    run_id = json.loads(line)["run_id"]
+                    if run_id not in self.entries or replaceable(run_id):
+                        self.entries[run_id] = [offset, len(line) - 1]
+                except (json.JSONDecodeError, KeyError, UnicodeDecodeError):
+                    pass
+                offset += len(line)
+        self.size = offset
+
+    def append(self, run: dict) -> bool:
+        """
+        Append a run (raw responses go to its sidecar file).
+
+        Returns:
+            False if a run with the same run_id was already logged (for
+            cache analyses: logged with identical content)
+        """
+        run_id = run.get("run_id")
+        logged, raw = split_raw_responses(run)
+        line = json.dumps(logged, separators=(",", ":")).encode("utf-8")
+
+        with self._locked():
+            self.refresh()
+            if run_id in self.entries and (not replaceable(run_id) or self._read_line(run_id) == line):
+                return False
+
+            self.raw_dir.mkdir(parents=True, exist_ok=True)
+            _write_json(self.raw_dir / f"{_safe_run_id(run_id)}.json", raw)
+
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                if offset > self.size:
+                    # Terminate a partial line left by an interrupted append
+                    f.write(b"\n")
+                    offset += 1
+                f.write(line + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+                self.inode = os.fstat(f.fileno()).st_ino
+
+            self.entries[run_id] = [offset, len(line)]
+            self.size = offset + len(line) + 1
+            if self.superseded_bytes() > COMPACT_RATIO * self.size:
+                self._compact()
+            self._write_index()
+        return True
+
+    def superseded_bytes(self) -> int:
+        """Bytes of the log taken by lines that are no longer indexed."""
+        return self.size - sum(length + 1 for _, length in self.entries.values())
+
+    def _compact(self) -> None:
+        """Rewrite the log with only its indexed lines (caller holds the lock)."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        entries = {}
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            for run_id in self.run_ids():
+                offset, length = self.entries[run_id]
+                src.seek(offset)
+                entries[run_id] = [dst.tell(), length]
+                dst.write(src.read(length) + b"\n")
+            dst.flush()
+            os.fsync(dst.fileno())
+            size = dst.tell()
+        os.replace(tmp_path, self.path)
+        self.entries = entries
+        self.size = size
+        self.inode = self.path.stat().st_ino
+
+    def _write_index(self) -> None:
+        _write_json(self.index_path, {
+            "version": RUN_INDEX_VERSION,
+            "size": self.size,
+            "inode": self.inode,
+            "entries": self.entries,
+        })
+
+    def extend(self, runs: Iterable[dict]) -> int:
+        """Append runs; returns the number of runs that were new."""
+        return sum(1 for run in runs if self.append(run))
+
+    def raw_responses(self, run_id: str) -> dict:
+        """Raw responses of a run (question_id -> text), empty if missing."""
+        try:
+            with open(self.raw_dir / f"{_safe_run_id(run_id)}.json", "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _read_line(self, run_id: str) -> bytes:
+        """Logged JSON line of a run (without the newline)."""
+        offset, length = self.entries[run_id]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def get(self, run_id: str, with_raw: bool = False) -> dict | None:
+        """Return a logged run, optionally with raw responses restored."""
+        if run_id not in self.entries:
+            return None
+        run = json.loads(self._read_line(run_id))
+
+        if with_raw:
+            raw = self.raw_responses(run_id)
+            for qid, result in run.get("answers", {}).items():
+                result["raw_response"] = raw.get(qid, "")
+        return run
+
+    def iter_runs(self, with_raw: bool = False) -> Iterator[dict]:
+        """Yield logged runs in append order, one at a time."""
+        for run_id in self.run_ids():
+            yield self.get(run_id, with_raw=with_raw)
+
+    def import_json(self, all_results_path: Path) -> int:
+        """Append the runs of a legacy all_results.json; returns the number imported."""
+        try:
+            with open(all_results_path, "r") as f:
+                runs = json.load(f).get("runs", [])
+        except (json.JSONDecodeError, OSError):
+            return 0
+        return self.extend(runs)
+
+    def export_json(
+        self,
+        output_path: Path,
+        benchmark_version: str = "formationeval_v0.1",
+        total_questions: int = 505,
+    ) -> int:
+        """
+        Write all logged runs, with raw responses, as all_results.json.
+
+        Runs are streamed one at a time into the same indent=2 layout the
+        pipeline used to write on every run.
+
+        Returns:
+            Number of runs exported
+        """
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        count = 0
+        with open(tmp_path, "w") as f:
+            f.write("{\n")
+            f.write(f'  "benchmark": {json.dumps(benchmark_version)},\n')
+            f.write(f'  "total_questions": {json.dumps(total_questions)},\n')
+            f.write('  "runs": [')
+            for run in self.iter_runs(with_raw=True):
+                f.write(f"{',' if count else ''}\n    {_indent_json(run, 4)}")
+                count += 1
+            f.write("\n  ]\n}" if count else "]\n}")
+        os.replace(tmp_path, output_path)
+        return count
@@ -0,0 +1,309 @@
+"""
+Paired significance testing for FormationEval evaluation pipeline.
+
+Compares every pair of models on per-question correctness with McNemar
+exact tests (Holm-corrected) and paired bootstrap accuracy differences,
+and derives leaderboard rank intervals from the same bootstrap.
+All pairs are computed at once from the results matrix; each pair is
+compared on the questions both of its models answered, so a partial run
+does not shrink the comparisons between other models.
+"""
+
+import numpy as np
+
+from results_matrix import ResultsMatrix
+
+# Resamples are generated in chunks to bound the weight matrix size
+_RESAMPLE_CHUNK = 1000
+
+# Upper bound on elements of the models x models x resamples rank comparison
+_RANK_COMPARISON_ELEMENTS = 1 << 25
+
+
+def discordant_counts(correct: np.ndarray, answered: np.ndarray) -> np.ndarray:
+    """
+    Count discordant questions for every model pair.
+
+    Args:
+        correct: Bool array (models x questions), False where unanswered
+        answered: Bool array (models x questions)
+
+    Returns:
+        Int array where [i, j] = questions model i got right and model j
+        answered wrong
+    """
+    right = correct.astype(np.float32)
+    return np.rint(right @ (answered.astype(np.float32) - right).T).astype(np.int64)
+
+
+def mcnemar_exact(discordant: np.ndarray) -> np.ndarray:
+    """
+    Two-sided McNemar exact test for every model pair.
+
+    Args:
+        discordant: Output of discordant_counts()
+
+    Returns:
+        Symmetric array of p-values (1.0 on the diagonal and for pairs
+        without discordant questions)
+    """
+    n = discordant + discordant.T
+    k = np.minimum(discordant, discordant.T)
+
+    # Use scipy if available, otherwise fallback to normal approximation
+    try:
+        from scipy.stats import binom
+        pvalues = 2 * binom.cdf(k, n, 0.5)
+    except ImportError:
+        # Continuity-corrected normal approximation: p = erfc(z / sqrt(2))
+        from math import erfc
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (np.abs(discordant - discordant.T) - 1) / np.sqrt(n)
+        z = np.nan_to_num(np.maximum(z, 0.0))
+        pvalues = np.vectorize(erfc)(z / np.sqrt(2))
+
+    pvalues = np.minimum(np.where(n > 0, pvalues, 1.0), 1.0)
+    np.fill_diagonal(pvalues, 1.0)
+    return pvalues
+
+
+def holm_correction(pvalues: np.ndarray) -> np.ndarray:
+    """
+    Holm-Bonferroni adjusted p-values (step-down, monotone).
+
+    Args:
+        pvalues: 1-D array of raw p-values
+
+    Returns:
+        Adjusted p-values in the input order
+    """
+    m = len(pvalues)
+    if m == 0:
+        return pvalues.copy()
+    order = np.argsort(pvalues, kind="stable")
+    scaled = (m - np.arange(m)) * pvalues[order]
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(np.maximum.accumulate(scaled), 1.0)
+    return adjusted
+
+
+def bootstrap_weights(
+    n_questions: int,
+    n_resamples: int,
+    rng: np.random.Generator,
+    strata: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Draw question-level bootstrap resamples as count weights.
+
+    Args:
+        n_questions: Number of questions
+        n_resamples: Number of resamples (rows)
+        rng: NumPy random generator
+        strata: Optional stratum code per question; questions are then
+            resampled within each stratum, keeping stratum sizes fixed
+
+    Returns:
+        float32 array (resamples x questions) of times each question is drawn
+    """
+    if strata is None:
+        return rng.multinomial(n_questions, np.full(n_questions, 1.0 / n_questions), size=n_resamples).astype(np.float32)
+
+    weights = np.zeros((n_resamples, n_questions), dtype=np.float32)
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        size = len(members)
+        weights[:, members] = rng.multinomial(size, np.full(size, 1.0 / size), size=n_resamples)
+    return weights
+
+
+def paired_bootstrap(
+    correct: np.ndarray,
+    answered: np.ndarray,
+    n_resamples: int,
+    seed: int = 0,
+    alpha: float = 0.05,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile confidence intervals of accuracy differences for all pairs.
+
+    All pairs share the same question resamples. On each resample, a pair's
+    difference is taken over the drawn questions both models answered.
+
+    Args:
+        correct: Bool array (models x questions), False where unanswered
+        answered: Bool array (models x questions)
+        n_resamples: Number of bootstrap resamples
+        seed: Random seed
+        alpha: Significance level (default 0.05 for 95% CI)
+
+    Returns:
+        Tuple of (lower, upper) arrays where [i, j] bounds acc_i - acc_j
+    """
+    n_models, n_questions = correct.shape
+    lower = np.zeros((n_models, n_models))
+    upper = np.zeros((n_models, n_models))
+    rows, cols = np.triu_indices(n_models, k=1)
+    if n_questions == 0 or len(rows) == 0:
+        return lower, upper
+
+    right = correct.astype(np.float32)
+    seen = answered.astype(np.float32)
+    # Per pair and question: contribution to acc_i - acc_j, and whether both answered
+    delta = right[rows] * seen[cols] - right[cols] * seen[rows]
+    both = seen[rows] * seen[cols]
+
+    rng = np.random.default_rng(seed)
+    diffs = np.empty((len(rows), n_resamples), dtype=np.float32)
+    for start in range(0, n_resamples, _RESAMPLE_CHUNK):
+        size = min(_RESAMPLE_CHUNK, n_resamples - start)
+        weights = bootstrap_weights(n_questions, size, rng).T
+        totals = both @ weights
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diffs[:, start:start + size] = np.where(totals > 0, (delta @ weights) / totals, 0.0)
+
+    lo, hi = np.quantile(diffs, [alpha / 2, 1 - alpha / 2], axis=1)
+    lower[rows, cols], upper[rows, cols] = lo, hi
+    lower[cols, rows], upper[cols, rows] = -hi, -lo
+    return lower, upper
+
+
+def compare_models(
+    matrix: ResultsMatrix,
+    n_resamples: int = 10000,
+    seed: int = 0,
+    alpha: float = 0.05,
+) -> dict:
+    """
+    Paired comparison of every model pair on the questions both models answered.
+
+    Returns:
+        Dict with 'models' and pairwise (models x models) arrays
+        'n_questions' (answered by both), 'accuracy' ([i, j] = accuracy of
+        model i on the questions shared with j), 'discordant', 'p_mcnemar',
+        'p_holm', 'diff', 'diff_lower', 'diff_upper'
+    """
+    correct = matrix.correct & matrix.answered
+    answered = matrix.answered
+    n_models = len(matrix)
+
+    seen = answered.astype(np.float32)
+    n_questions = np.rint(seen @ seen.T).astype(np.int64)
+    shared_correct = np.rint(correct.astype(np.float32) @ seen.T)
+    discordant = discordant_counts(correct, answered)
+    p_mcnemar = mcnemar_exact(discordant)
+
+    # Holm correction over the unordered pairs
+    rows, cols = np.triu_indices(n_models, k=1)
+    p_holm = np.ones((n_models, n_models))
+    p_holm[rows, cols] = holm_correction(p_mcnemar[rows, cols])
+    p_holm[cols, rows] = p_holm[rows, cols]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = np.where(n_questions > 0, shared_correct / n_questions, 0.0)
+        diff = np.where(n_questions > 0, (discordant - discordant.T) / n_questions, 0.0)
+    lower, upper = paired_bootstrap(correct, answered, n_resamples, seed, alpha)
+
+    return {
+        "models": list(matrix.models),
+        "n_questions": n_questions,
+        "n_resamples": n_resamples,
+        "alpha": alpha,
+        "accuracy": accuracy,
+        "discordant": discordant,
+        "p_mcnemar": p_mcnemar,
+        "p_holm": p_holm,
+        "diff": diff,
+        "diff_lower": lower,
+        "diff_upper": upper,
+    }
+
+
+def bootstrap_ranks(
+    matrix: ResultsMatrix,
+    n_resamples: int = 10000,
+    seed: int = 0,
+    alpha: float = 0.05,
+    stratified: bool = False,
+) -> dict:
+    """
+    Bootstrap confidence intervals for each model's leaderboard rank.
+
+    Questions are resampled (shared across models); on every resample each
+    model's accuracy is recomputed over the questions it answered, and models
+    are ranked by it (ties share the best rank, as on the leaderboard).
+
+    Args:
+        matrix: Results matrix of all runs
+        n_resamples: Number of bootstrap resamples
+        seed: Random seed
+        alpha: Significance level (default 0.05 for 95% CI)
+        stratified: Resample within each question's primary domain
+
+    Returns:
+        Dict with 'models', 'n_resamples', 'alpha', 'stratified', and
+        per-model integer arrays 'rank_lower', 'rank_upper'
+    """
+    n_models = len(matrix)
+    n_questions = len(matrix.questions)
+    strata = matrix.questions.primary_domain if stratified else None
+
+    rank_lower = np.ones(n_models, dtype=int)
+    rank_upper = np.ones(n_models, dtype=int)
+    if n_models and n_questions:
+        rng = np.random.default_rng(seed)
+        right = matrix.correct.astype(np.float32)
+        answered = matrix.answered.astype(np.float32)
+        ranks = np.empty((n_models, n_resamples), dtype=np.int32)
+        chunk = max(1, min(_RESAMPLE_CHUNK, _RANK_COMPARISON_ELEMENTS // (n_models * n_models)))
+
+        for start in range(0, n_resamples, chunk):
+            size = min(chunk, n_resamples - start)
+            weights = bootstrap_weights(n_questions, size, rng, strata).T
+            totals = answered @ weights
+            with np.errstate(divide="ignore", invalid="ignore"):
+                accuracies = np.where(totals > 0, (right @ weights) / totals, 0.0)
+            # Rank = 1 + number of models with strictly higher accuracy
+            ranks[:, start:start + size] = 1 + (accuracies[None, :, :] > accuracies[:, None, :]).sum(axis=1)
+
+        rank_lower = np.floor(np.quantile(ranks, alpha / 2, axis=1)).astype(int)
+        rank_upper = np.ceil(np.quantile(ranks, 1 - alpha / 2, axis=1)).astype(int)
+
+    return {
+        "models": list(matrix.models),
+        "n_resamples": n_resamples,
+        "alpha": alpha,
+        "stratified": stratified,
+        "rank_lower": rank_lower,
+        "rank_upper": rank_upper,
+    }
+
+
+def significance_groups(comparison: dict, order: list[int]) -> list[int]:
+    """
+    Assign leaderboard significance groups.
+
+    Walking down the ranking, a model stays in the current group unless it is
+    significantly different (Holm-adjusted McNemar p < alpha) from the
+    group's top model, in which case it starts a new group.
+
+    Args:
+        comparison: Output of compare_models()
+        order: Matrix row indices in leaderboard order
+
+    Returns:
+        Group number (1 = top group) per matrix row
+    """
+    groups = [0] * len(comparison["models"])
+    if not order:
+        return groups
+
+    p_holm = comparison["p_holm"]
+    group = 1
+    leader = order[0]
+    for row in order:
+        if p_holm[leader, row] < comparison["alpha"]:
+            group += 1
+            leader = row
+        groups[row] = group
+    return groups
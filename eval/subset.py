@@ -0,0 +1,311 @@
+"""
+Benchmark subsets for FormationEval evaluation pipeline.
+
+Selects a slice of the benchmark for quick runs: filters by domain,
+difficulty, topic or an id list, optionally followed by a random sample
+of N questions, stratified by primary domain and/or difficulty.
+Subset runs record the selection under 'subset' in their metadata. For
+stratified samples, they also carry an accuracy estimate reweighted to the
+stratum sizes of the filtered population.
+"""
+
+import math
+from pathlib import Path
+
+import numpy as np
+
+from metrics import z_score
+from question_index import QuestionIndex, QuestionRecord
+
+STRATIFY_FIELDS = ("domain", "difficulty")
+
+
+def read_ids_file(path: Path) -> list[str]:
+    """Question ids from a text file: one per line, '#' starts a comment."""
+    ids = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                ids.append(line)
+    return ids
+
+
+def _match(values: list[str] | None, available: list[str], what: str) -> set[str] | None:
+    """Resolve case-insensitive filter values against the benchmark labels."""
+    if not values:
+        return None
+    by_lower = {label.lower(): label for label in available}
+    unknown = [value for value in values if value.lower() not in by_lower]
+    if unknown:
+        raise ValueError(f"Unknown {what}: {', '.join(unknown)} (available: {', '.join(sorted(available))})")
+    return {by_lower[value.lower()] for value in values}
+
+
+def filter_columns(
+    index: QuestionIndex,
+    domains: list[str] | None = None,
+    difficulties: list[str] | None = None,
+    topics: list[str] | None = None,
+    ids: list[str] | None = None,
+) -> list[int]:
+    """
+    Columns of the questions matching every given filter.
+
+    A question matches a domain or topic filter if any of its labels is
+    listed. Labels match case-insensitively.
+
+    Raises:
+        ValueError: For labels or ids not in the benchmark
+    """
+    all_topics = sorted({topic for record in index.records for topic in record.topics})
+    domains = _match(domains, index.domain_labels, "domain")
+    difficulties = _match(difficulties, index.difficulty_labels, "difficulty")
+    topics = _match(topics, all_topics, "topic")
+    if ids is not None:
+        unknown = [qid for qid in ids if qid not in index.column]
+        if unknown:
+            more = f" and {len(unknown) - 5} more" if len(unknown) > 5 else ""
+            raise ValueError(f"Unknown question ids: {', '.join(unknown[:5])}{more}")
+        ids = set(ids)
+
+    return [
+        record.column for record in index.records
+        if (domains is None or domains.intersection(record.domains))
+        and (difficulties is None or record.difficulty in difficulties)
+        and (topics is None or topics.intersection(record.topics))
+        and (ids is None or record.id in ids)
+    ]
+
+
+def stratum_key(record: QuestionRecord, fields: tuple[str, ...]) -> str:
+    """Stratum label of a question, e.g. 'Petrophysics|easy' (primary domain)."""
+    parts = []
+    for field in fields:
+        if field == "domain":
+            parts.append(record.domains[0] if record.domains else "unknown")
+        else:
+            parts.append(record.difficulty)
+    return "|".join(parts)
+
+
+def _allocate(sizes: dict[str, int], n: int) -> dict[str, int]:
+    """
+    Proportional allocation of n draws over strata (largest remainder).
+
+    Every stratum gets at least one question when n covers all strata, so
+    each one can be reweighted.
+    """
+    population = sum(sizes.values())
+    floor_one = n >= len(sizes)
+    allocation = {}
+    remainders = []
+    for key, size in sizes.items():
+        share = n * size / population
+        allocation[key] = min(size, max(1 if floor_one else 0, int(share)))
+        remainders.append((share - int(share), key))
+
+    # Hand out the remaining draws by largest remainder, then trim any excess
+    remaining = n - sum(allocation.values())
+    for _, key in sorted(remainders, key=lambda item: (-item[0], item[1])):
+        if remaining <= 0:
+            break
+        if allocation[key] < sizes[key]:
+            allocation[key] += 1
+            remaining -= 1
+    while remaining < 0:
+        key = max(allocation, key=lambda k: (allocation[k], k))
+        allocation[key] -= 1
+        remaining += 1
+    return allocation
+
+
+def sample_columns(
+    index: QuestionIndex,
+    columns: list[int],
+    n: int,
+    stratify_by: tuple[str, ...] = (),
+    seed: int = 0,
+) -> tuple[list[int], dict[str, list[int]]]:
+    """
+    Randomly sample n of the given columns.
+
+    Args:
+        index: Benchmark index
+        columns: Candidate columns (e.g. from filter_columns)
+        n: Sample size (all columns if n >= len(columns))
+        stratify_by: Fields from STRATIFY_FIELDS; empty for a simple random sample
+        seed: Random seed
+
+    Returns:
+        Tuple of (sampled columns in benchmark order, strata mapping
+        stratum -> [population size, sample size]; empty if not stratified)
+    """
+    rng = np.random.default_rng(seed)
+    if not stratify_by:
+        if n >= len(columns):
+            return list(columns), {}
+        return sorted(rng.choice(columns, size=n, replace=False).tolist()), {}
+
+    members = {}
+    for column in columns:
+        members.setdefault(stratum_key(index.records[column], stratify_by), []).append(column)
+    members = dict(sorted(members.items()))
+    allocation = _allocate({key: len(cols) for key, cols in members.items()}, min(n, len(columns)))
+
+    sampled = []
+    strata = {}
+    for key, cols in members.items():
+        sampled.extend(rng.choice(cols, size=allocation[key], replace=False).tolist())
+        strata[key] = [len(cols), allocation[key]]
+    return sorted(sampled), strata
+
+
+def select_subset(
+    index: QuestionIndex,
+    domains: list[str] | None = None,
+    difficulties: list[str] | None = None,
+    topics: list[str] | None = None,
+    ids_file: Path | None = None,
+    sample: int | None = None,
+    stratify_by: str | None = None,
+    seed: int = 0,
+) -> tuple[QuestionIndex, dict | None]:
+    """
+    Apply subset options to the benchmark.
+
+    Args:
+        index: Full benchmark index
+        domains, difficulties, topics: Label filters (None = no filter)
+        ids_file: File of question ids to keep (see read_ids_file)
+        sample: Random sample size drawn from the filtered questions
+        stratify_by: Comma-separated STRATIFY_FIELDS for the sample, e.g. 'domain,difficulty'
+        seed: Random seed for the sample
+
+    Returns:
+        Tuple of (subset index, subset metadata for the run dict); the full
+        index and None when no option is given
+
+    Raises:
+        ValueError: For unknown labels, ids or stratification fields, or an
+            empty selection
+    """
+    fields = tuple(field.strip() for field in stratify_by.split(",") if field.strip()) if stratify_by else ()
+    unknown = [field for field in fields if field not in STRATIFY_FIELDS]
+    if unknown:
+        raise ValueError(f"Cannot stratify by: {', '.join(unknown)} (use: {', '.join(STRATIFY_FIELDS)})")
+    if fields and sample is None:
+        raise ValueError("--stratify-by needs --sample")
+
+    ids = read_ids_file(ids_file) if ids_file else None
+    if not any([domains, difficulties, topics, ids is not None, sample is not None]):
+        return index, None
+
+    # Record the benchmark's spelling of the filter labels
+    if domains:
+        domains = sorted(_match(domains, index.domain_labels, "domain"))
+    if difficulties:
+        difficulties = sorted(_match(difficulties, index.difficulty_labels, "difficulty"))
+
+    columns = filter_columns(index, domains, difficulties, topics, ids)
+    population = len(columns)
+    strata = {}
+    if sample is not None:
+        if sample < 1:
+            raise ValueError("--sample must be at least 1")
+        columns, strata = sample_columns(index, columns, sample, fields, seed)
+    if not columns:
+        raise ValueError("No questions match the subset options")
+
+    filters = {
+        key: value for key, value in (
+            ("domains", domains), ("difficulties", difficulties), ("topics", topics),
+            ("ids_file", str(ids_file) if ids_file else None),
+        ) if value
+    }
+    subset = {
+        "filters": filters,
+        "sample": sample,
+        "stratify_by": list(fields),
+        "seed": seed if sample is not None else None,
+        "questions": len(columns),
+        "population": population,
+        "benchmark_questions": len(index),
+        "strata": strata,
+    }
+    return QuestionIndex([index.questions[column] for column in columns]), subset
+
+
+def stratified_estimate(answers: dict, index: QuestionIndex, subset: dict | None, alpha: float = 0.05) -> dict:
+    """
+    Accuracy reweighted to the stratum sizes of the sampled population.
+
+    Each stratum's accuracy is weighted by its population share. The
+    normal-approximation CI uses the stratified variance with a finite
+    population correction. Strata with a single sampled question have no
+    sample variance and use the conservative p(1-p) = 0.25 instead.
+
+    Args:
+        answers: Run answers (question_id -> {'correct': ...})
+        index: Benchmark index covering the answered questions
+        subset: Subset metadata from select_subset()
+
+    Returns:
+        Dict with 'weighted_accuracy', 'weighted_ci_lower' and
+        'weighted_ci_upper'; empty if the run is not a stratified sample
+    """
+    if not subset or not subset.get("strata"):
+        return {}
+    fields = tuple(subset["stratify_by"])
+    population = sum(size for size, _ in subset["strata"].values())
+
+    correct = {}
+    answered = {}
+    for qid, result in answers.items():
+        record = index.get(qid)
+        if record is None:
+            continue
+        key = stratum_key(record, fields)
+        answered[key] = answered.get(key, 0) + 1
+        correct[key] = correct.get(key, 0) + int(bool(result.get("correct", False)))
+
+    estimate = 0.0
+    variance = 0.0
+    for key, (size, _) in subset["strata"].items():
+        n = answered.get(key, 0)
+        if n == 0:
+            continue
+        weight = size / population
+        p = correct[key] / n
+        estimate += weight * p
+        if n > 1:
+            stratum_variance = p * (1 - p) / (n - 1)
+        else:
+            # One question says nothing about the spread: assume the worst case
+            stratum_variance = 0.25
+        variance += weight ** 2 * (1 - n / size) * stratum_variance
+
+    # Strata without answers are left out; rescale to the covered share
+    covered = sum(size for key, (size, _) in subset["strata"].items() if answered.get(key)) / population
+    if covered == 0:
+        return {}
+    estimate /= covered
+    variance /= covered ** 2
+
+    spread = z_score(alpha) * math.sqrt(variance)
+    return {
+        "weighted_accuracy": estimate,
+        "weighted_ci_lower": max(0.0, estimate - spread),
+        "weighted_ci_upper": min(1.0, estimate + spread),
+    }
+
+
+def describe_subset(subset: dict) -> str:
+    """One-line description of a subset, e.g. '50/505 questions, stratified by domain, seed 0'."""
+    parts = [f"{subset['questions']}/{subset['benchmark_questions']} questions"]
+    for key, value in subset.get("filters", {}).items():
+        parts.append(f"{key}: {', '.join(value) if isinstance(value, list) else value}")
+    if subset.get("sample") is not None:
+        stratified = f", stratified by {'+'.join(subset['stratify_by'])}" if subset.get("stratify_by") else ""
+        parts.append(f"sample of {subset['population']}{stratified}, seed {subset['seed']}")
+    return "; ".join(parts)
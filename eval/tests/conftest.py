@@ -0,0 +1,70 @@
+"""Shared fixtures for the eval pipeline tests."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Eval modules import each other as top-level modules (as the runners do);
+# scripts/ holds the reference implementations some tests compare against
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT / "eval"))
+sys.path.insert(1, str(PROJECT_ROOT / "scripts"))
+
+DOMAINS = ["Petrophysics", "Geophysics", "Drilling Engineering"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def make_questions(n: int) -> list[dict]:
+    """Synthetic benchmark questions spread over domains and difficulties."""
+    return [
+        {
+            "id": f"test_q_{i:03d}",
+            "domains": [DOMAINS[i % len(DOMAINS)]],
+            "topics": [f"Topic {i % 4}"],
+            "difficulty": DIFFICULTIES[(i // 3) % len(DIFFICULTIES)],
+            "question": f"Question {i}?",
+            "choices": [f"choice {c} of {i}" + "x" * c for c in range(4)],
+            "answer_index": i % 4,
+        }
+        for i in range(n)
+    ]
+
+
+def write_responses(model_cache: Path, questions: list[dict], model: str, **fields) -> None:
+    """Loose cache files for every question, answering 'B'."""
+    model_cache.mkdir(parents=True, exist_ok=True)
+    for question in questions:
+        response = {
+            "model": model,
+            "question_id": question["id"],
+            "timestamp": "2025-01-01T00:00:00+00:00",
+            "raw_response": "B",
+            **fields,
+        }
+        with open(model_cache / f"{question['id']}.json", "w") as f:
+            json.dump(response, f)
+
+
+@pytest.fixture
+def questions() -> list[dict]:
+    return make_questions(24)
+
+
+def make_run(run_id: str, model: str, questions, letters: str, **fields) -> dict:
+    """A run whose answer to the i-th question is letters[i % len(letters)]."""
+    from metrics import compute_all_metrics
+
+    responses = [
+        {"question_id": record.id, "raw_response": letters[record.column % len(letters)]}
+        for record in questions.records
+    ]
+    return {
+        "run_id": run_id,
+        "run_timestamp": "2025-01-01T00:00:00+00:00",
+        "model": model,
+        "model_info": {},
+        **compute_all_metrics(responses, questions),
+        **fields,
+    }
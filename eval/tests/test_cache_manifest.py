@@ -0,0 +1,89 @@
+"""Analyze-only runs: snapshot reuse for unchanged model caches, and streaming."""
+
+import gc
+import weakref
+
+import pytest
+
+import run_evaluation
+import run_openrouter
+from cache_manifest import ANALYSIS_DIR, MANIFEST_NAME
+from conftest import write_responses
+from question_index import QuestionIndex
+
+
+RUNNERS = [
+    (run_evaluation, [{"name": "gpt-x", "deployment": "gpt-x"}, {"name": "gpt-y"}]),
+    (run_openrouter, [{"name": "X", "model": "gpt-x"}, {"name": "Y", "model": "gpt-y"}]),
+]
+
+
+class _Result(dict):
+    """A model cache result that can be weakly referenced."""
+
+
+@pytest.mark.parametrize("runner, models", RUNNERS)
+def test_second_analysis_uses_snapshots(tmp_path, capsys, questions, runner, models):
+    config = {"cache": {"directory": str(tmp_path)}, "models": models}
+    for name in ("gpt-x", "gpt-y"):
+        write_responses(tmp_path / name, questions, name, deployment=name)
+    index = QuestionIndex(questions)
+
+    first = list(runner.analyze_from_cache(config, index))
+    assert (tmp_path / ANALYSIS_DIR / MANIFEST_NAME).exists()
+    assert capsys.readouterr().out.count("Loaded 24 cached responses") == 2
+
+    # Snapshots keep per-question results but not the raw responses
+    snapshot = (tmp_path / ANALYSIS_DIR / "gpt-x.json").read_text()
+    assert '"correct"' in snapshot and "raw_response" not in snapshot
+
+    second = list(runner.analyze_from_cache(config, index))
+    assert second == first
+    assert capsys.readouterr().out.count("Unchanged, using snapshot") == 2
+
+
+@pytest.mark.parametrize("runner, models", RUNNERS)
+def test_earlier_results_are_released_while_streaming(tmp_path, monkeypatch, questions, runner, models):
+    config = {"cache": {"directory": str(tmp_path)}, "models": models}
+    for name in ("gpt-x", "gpt-y"):
+        write_responses(tmp_path / name, questions, name, deployment=name)
+
+    analyze_model_caches = runner.analyze_model_caches
+    yielded = []
+
+    def tracked(*args, **kwargs):
+        for result in analyze_model_caches(*args, **kwargs):
+            result = _Result(result)
+            yielded.append(weakref.ref(result))
+            yield result
+
+    monkeypatch.setattr(runner, "analyze_model_caches", tracked)
+    runs = runner.analyze_from_cache(config, QuestionIndex(questions), incremental=False)
+    next(runs)
+    next(runs)
+    gc.collect()
+    # The first model's result (with its answers) is gone once the consumer moved on
+    assert yielded[0]() is None
+    assert list(runs) == []
+
+
+def test_shared_deployment_is_analyzed_once(tmp_path, monkeypatch, questions):
+    models = [
+        {"name": f"gpt-x-{effort}", "deployment": "gpt-x", "reasoning_effort": effort}
+        for effort in ("low", "high")
+    ]
+    config = {"cache": {"directory": str(tmp_path)}, "models": models}
+    write_responses(tmp_path / "gpt-x", questions, "gpt-x", deployment="gpt-x")
+
+    analyze_model_caches = run_evaluation.analyze_model_caches
+    analyzed = []
+
+    def recording(model_caches, *args, **kwargs):
+        analyzed.append([model_cache.name for model_cache in model_caches])
+        return analyze_model_caches(model_caches, *args, **kwargs)
+
+    monkeypatch.setattr(run_evaluation, "analyze_model_caches", recording)
+    runs = list(run_evaluation.analyze_from_cache(config, QuestionIndex(questions), jobs=2, incremental=False))
+    assert analyzed == [["gpt-x"]]
+    assert [run["model"] for run in runs] == ["gpt-x-low", "gpt-x-high"]
+    assert [run["model_info"]["reasoning_effort"] for run in runs] == ["low", "high"]
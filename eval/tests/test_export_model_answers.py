@@ -0,0 +1,72 @@
+"""Website answer shards from the long-format results or the run log."""
+
+import gzip
+import json
+import sys
+
+import numpy as np
+import pytest
+
+import export_model_answers
+from columnar_export import LongResultsWriter
+from conftest import make_run
+from export_model_answers import long_results_matrix, question_shards
+from question_index import QuestionIndex
+from results_matrix import ResultsMatrix
+from run_log import RunLog
+
+pytestmark = pytest.mark.skipif(not LongResultsWriter.available(), reason="pyarrow is not installed")
+
+
+def _write_long_results(output_dir, runs):
+    writer = LongResultsWriter(output_dir)
+    for run in runs:
+        writer.write_run(run)
+    return writer.close()["long"]
+
+
+def test_long_results_matrix_matches_the_run_matrix(tmp_path, questions):
+    index = QuestionIndex(questions)
+    runs = [make_run("a", "Model A", index, "ABCD"), make_run("b", "Model B", index, "B")]
+    # A failed extraction and a question dropped from the benchmark
+    runs[1]["answers"][index.ids[0]]["predicted"] = None
+    runs[1]["answers"]["retired_q"] = {"predicted": "A", "correct": True}
+    path = _write_long_results(tmp_path, runs)
+
+    expected = ResultsMatrix.from_runs(runs, index)
+    matrix = long_results_matrix(path, index)
+    assert matrix.models == expected.models
+    for name in ("answered", "correct", "predicted"):
+        assert np.array_equal(getattr(matrix, name), getattr(expected, name))
+    assert question_shards(matrix) == question_shards(expected)
+
+
+def _export(monkeypatch, results_dir, benchmark, output_dir):
+    monkeypatch.setattr(sys, "argv", [
+        "export_model_answers.py", "--results-dir", str(results_dir),
+        "--benchmark", str(benchmark), "--output-dir", str(output_dir),
+    ])
+    export_model_answers.main()
+    return json.loads((output_dir / "index.json").read_text())
+
+
+def test_partial_long_results_fall_back_to_the_run_log(tmp_path, monkeypatch, capsys, questions):
+    index = QuestionIndex(questions)
+    benchmark = tmp_path / "benchmark.json"
+    benchmark.write_text(json.dumps([{**q, "answer_key": "ABCD"[q["answer_index"]]} for q in questions]))
+    runs = [make_run("a", "Model A", index, "ABCD"), make_run("b", "Model B", index, "B")]
+    RunLog(tmp_path).extend(runs)
+
+    # The last report generation only covered Model B
+    _write_long_results(tmp_path, runs[1:])
+    manifest = _export(monkeypatch, tmp_path, benchmark, tmp_path / "shards")
+    assert manifest["models"] == ["Model A", "Model B"]
+    assert "reading the run log" in capsys.readouterr().out
+
+    _write_long_results(tmp_path, runs)
+    manifest = _export(monkeypatch, tmp_path, benchmark, tmp_path / "shards")
+    assert manifest["models"] == ["Model A", "Model B"]
+    assert "Reading" in capsys.readouterr().out
+    shard = tmp_path / "shards" / manifest["questions"][index.ids[1]]
+    answers = json.loads(gzip.decompress(shard.read_bytes()))["answers"]
+    assert answers == {"Model A": {"answer": "B", "correct": True}, "Model B": {"answer": "B", "correct": True}}
@@ -0,0 +1,169 @@
+"""Answer extraction against the original regex-based extractor."""
+
+import importlib.util
+import itertools
+import random
+import re
+import time
+
+import pytest
+
+import extraction
+from bench_extraction import legacy_extract_answer
+from extraction import extract_answer, extract_answers, strip_thinking
+
+ANSWERS = [
+    "B",
+    "b) Porosity",
+    "**C**",
+    "The correct answer is: D",
+    "Answer: A",
+    "I would choose C because of the gamma ray response.",
+    "The best option is (B).",
+    "After weighing both, I'll go with D.",
+    "Option A is wrong; the answer is C.",
+    "Considering the density log, A.",
+    "It must be B, since shale is radioactive",
+    "Neither fits perfectly, but D",
+    "None of these.",
+    "",
+    "   \n\t ",
+    "A and B are close, but C, definitely.",
+    "SELECT B",
+    "so the choice is: a",
+]
+
+THINK_LAYOUTS = [
+    "<think>{r}</think>{a}",
+    "<thinking>{r}</thinking>\n\n{a}",
+    "{a}\n<think>{r}</think>",
+    "<think>{r}</think> {a} <think>{r}</think>",
+    "<thinking>{r}</thinking>{a}<think>{r}</think>",
+    "<think>{r}</think><think>{r}</think>{a}",
+    "{a}\n</think>",
+    "{r}</think>\n{a}",
+]
+
+REASONING = ["", "Let me think. A looks plausible", "D? No, option B fits.", "multi\nline\nreasoning"]
+
+
+@pytest.mark.parametrize("response", ANSWERS)
+def test_matches_legacy_without_thinking_tags(response):
+    assert extract_answer(response) == legacy_extract_answer(response)
+
+
+@pytest.mark.parametrize("layout, answer, reasoning", list(itertools.product(THINK_LAYOUTS, ANSWERS, REASONING)))
+def test_never_loses_answer_legacy_found(layout, answer, reasoning):
+    response = layout.format(a=answer, r=reasoning)
+    legacy = legacy_extract_answer(response)
+    current = extract_answer(response)
+    if legacy[0] is not None:
+        assert current[0] is not None, f"{response!r}: legacy {legacy}, now {current}"
+
+
+@pytest.mark.parametrize("response, expected", [
+    ("<think>a</think> B <think>b</think>", ("B", "first_char")),
+    ("B\n</think>", ("B", "first_char")),
+    ("<think>The answer is A</think>\nThe answer is C", ("C", "answer_is")),
+    ("Reasoning from the chat template</think>D", ("D", "first_char")),
+    ("<thinking>A?</thinking><think>B?</think>Hence C.", ("C", "letter_period")),
+])
+def test_thinking_tag_edge_cases(response, expected):
+    assert extract_answer(response) == expected
+
+
+# ~1 MB responses that are quadratic for naive regexes (unbalanced thinking
+# tags, standalone-letter lookahead, markdown asterisk runs); the bound is loose for slow CI machines
+WORST_CASE_SIZE = 1_000_000
+WORST_CASE_SECONDS = 5.0
+
+
+@pytest.mark.parametrize("make_response, expected", [
+    pytest.param(lambda size: "The answer is B <think>" + "reasoning A or C? " * (size // 18), ("B", "answer_is"),
+                 id="unterminated-think"),
+    pytest.param(lambda size: "<think>" * (size // 7), (None, "failed"), id="repeated-think-openers"),
+    pytest.param(lambda size: "A or C? " * (size // 8) + "</think>D", ("D", "first_char"), id="orphan-close-tag"),
+    pytest.param(lambda size: "<think>A?</think>" * (size // 17) + " C", ("C", "first_char"), id="many-closed-blocks"),
+    pytest.param(lambda size: "x b " * (size // 4) + "z", ("B", "standalone"), id="standalone-letters"),
+    pytest.param(lambda size: ("THE ANSWER" + ":" * 1000) * (size // 1010), (None, "failed"), id="long-colon-runs"),
+    pytest.param(lambda size: "*" * size + " The answer is **C**", ("C", "answer_is"), id="asterisk-run"),
+])
+def test_worst_case_inputs_run_in_linear_time(make_response, expected):
+    response = make_response(WORST_CASE_SIZE)
+    start = time.perf_counter()
+    result = extract_answer(response)
+    elapsed = time.perf_counter() - start
+    assert result == expected
+    assert elapsed < WORST_CASE_SECONDS, f"{len(response):,} chars took {elapsed:.2f}s"
+
+
+def test_unterminated_thinking_block_is_dropped():
+    assert strip_thinking("<think>done</think> C <think>cut off mid-thou") == "C"
+    assert strip_thinking("<think>cut off before any answer: A") == ""
+
+
+def test_random_tag_layouts_keep_legacy_answers():
+    rng = random.Random(0)
+    pieces = ["<think>", "</think>", "<thinking>", "</thinking>", " A ", " B. ", "answer is C", "x", "\n"]
+    for _ in range(5000):
+        response = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 8)))
+        legacy = legacy_extract_answer(response)
+        if legacy[0] is not None:
+            assert extract_answer(response)[0] is not None, repr(response)
+
+
+def test_batched_extraction_matches_single(monkeypatch):
+    responses = [layout.format(a=a, r="r") for layout in THINK_LAYOUTS for a in ANSWERS]
+    pools = []
+
+    class RecordingPool(extraction.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    # Force the process-pool path with small, uneven chunks
+    monkeypatch.setattr(extraction, "PARALLEL_MIN_RESPONSES", 0)
+    monkeypatch.setattr(extraction, "ProcessPoolExecutor", RecordingPool)
+    batched = extract_answers(responses, jobs=2, chunk_size=7)
+
+    assert len(pools) == 1
+    assert batched == [extract_answer(r) for r in responses]
+    assert extract_answers(responses, jobs=1) == batched
+
+
+def test_extractor_version_tracks_the_pattern_table(monkeypatch):
+    assert extraction._extraction_fingerprint() == extraction.EXTRACTOR_VERSION
+
+    regex, name, literal = extraction._PATTERNS[0]
+    changed = [(re.compile(regex.pattern + "?"), name, literal)] + extraction._PATTERNS[1:]
+    monkeypatch.setattr(extraction, "_PATTERNS", changed)
+    assert extraction._extraction_fingerprint() != extraction.EXTRACTOR_VERSION
+
+
+def _source_function(tmp_path, name, source):
+    path = tmp_path / f"{name}.py"
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.pick
+
+
+def test_extractor_version_ignores_docstrings_and_comments(tmp_path):
+    plain = "def pick(text):\n    if text:\n        return text[0]\n    return None\n"
+    documented = (
+        "def pick(text):\n"
+        "    \"\"\"\n    First character.\n    \"\"\"\n"
+        "    # Empty text has none\n"
+        "    if text:  # non-empty\n\n"
+        "        return text[0]\n"
+        "    return None\n"
+    )
+    changed = "def pick(text):\n    if text:\n        return text[-1]\n    return None\n"
+
+    normalized = [
+        extraction._normalized_source(_source_function(tmp_path, f"pick_{i}", source))
+        for i, source in enumerate((plain, documented, changed))
+    ]
+    assert normalized[0] == normalized[1] == plain.rstrip()
+    assert normalized[2] != normalized[0]
@@ -0,0 +1,49 @@
+"""Streaming run metrics against the batch computation."""
+
+import random
+
+import pytest
+
+from metrics import OnlineMetrics, compute_all_metrics
+from question_index import QuestionIndex
+
+RAW = ["A", "B", "C", "D", "The answer is C", "<think>A?</think>D", "no idea", ""]
+
+
+def _responses(questions, seed):
+    rng = random.Random(seed)
+    responses = [
+        {
+            "question_id": question["id"],
+            "raw_response": rng.choice(RAW),
+            "latency_ms": rng.randint(100, 5000),
+            "usage": {"total_tokens": rng.randint(10, 900)},
+        }
+        for question in questions
+        if rng.random() < 0.9
+    ]
+    # An id outside the benchmark counts towards the total only
+    responses.append({"question_id": "unknown_question", "raw_response": "A"})
+    return responses
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_online_metrics_match_batch_in_any_order(questions, seed):
+    index = QuestionIndex(questions)
+    responses = _responses(questions, seed)
+    expected = compute_all_metrics(responses, index)
+
+    # Responses arrive in completion order, not benchmark order
+    arrived = list(responses)
+    random.Random(seed).shuffle(arrived)
+    online = OnlineMetrics(index)
+    for response in arrived:
+        online.update(response)
+
+    assert online.finalize() == expected
+    assert online.accuracy == expected["accuracy"]
+
+
+def test_online_metrics_without_responses(questions):
+    index = QuestionIndex(questions)
+    assert OnlineMetrics(index).finalize() == compute_all_metrics([], index)
@@ -0,0 +1,75 @@
+"""Cache pruning must keep the responses of logged runs."""
+
+import run_evaluation
+import run_openrouter
+from conftest import write_responses
+from question_index import QuestionIndex
+from response_cache import prune_disk_cache, published_responses
+from run_log import RunLog
+
+
+def _config(tmp_path, models):
+    return {
+        "cache": {"directory": str(tmp_path / "cache"), "max_size_mb": 0},
+        "output": {"directory": str(tmp_path / "results")},
+        "models": models,
+    }
+
+
+def test_prune_keeps_openrouter_analyze_only_runs(tmp_path, questions):
+    # The API reports a dated model id that matches neither the run name
+    # nor the cache directory
+    config = _config(tmp_path, [{"name": "GPT-4o", "model": "openai/gpt-4o"}])
+    model_cache = tmp_path / "cache" / "openai_gpt-4o"
+    write_responses(model_cache, questions, "openai/gpt-4o-2024-08-06", provider="openrouter")
+
+    runs = list(run_openrouter.analyze_from_cache(config, QuestionIndex(questions), incremental=False))
+    assert [run["model_info"]["cache_dir"] for run in runs] == ["openai_gpt-4o"]
+    RunLog(tmp_path / "results").extend(runs)
+
+    stats = run_openrouter.prune_cache(config)
+    assert stats["evicted"] == 0
+    assert len(list(model_cache.glob("*.json"))) == len(questions)
+
+
+def test_prune_keeps_azure_analyze_only_runs(tmp_path, questions):
+    config = _config(tmp_path, [{"name": "gpt-x-high", "deployment": "gpt-x", "reasoning_effort": "high"}])
+    model_cache = tmp_path / "cache" / "gpt-x"
+    write_responses(model_cache, questions, "gpt-x-2025-01-01", deployment="gpt-x")
+
+    runs = list(run_evaluation.analyze_from_cache(config, QuestionIndex(questions), incremental=False))
+    assert [run["model_info"]["cache_dir"] for run in runs] == ["gpt-x"]
+    RunLog(tmp_path / "results").extend(runs)
+
+    stats = run_evaluation.prune_cache(config)
+    assert stats["evicted"] == 0
+    assert len(list(model_cache.glob("*.json"))) == len(questions)
+
+
+def test_prune_evicts_unlogged_responses(tmp_path, questions):
+    config = _config(tmp_path, [])
+    write_responses(tmp_path / "cache" / "other", questions, "other")
+    stats = run_openrouter.prune_cache(config)
+    assert stats["evicted"] == len(questions)
+
+
+def test_published_responses_falls_back_for_runs_without_cache_dir():
+    runs = [{"model": "Model A", "model_info": {"model_id": "org/model:free"}, "answers": {"q1": {}}}]
+    assert published_responses(runs) == {("Model A", "q1"), ("org_model_free", "q1")}
+
+    runs[0]["model_info"]["cache_dir"] = "org_model"
+    assert published_responses(runs) == {("org_model", "q1")}
+
+
+def test_rewritten_loose_files_keep_their_response_age(tmp_path, questions):
+    model_cache = tmp_path / "cache" / "model"
+    write_responses(model_cache, questions[:2], "model")  # timestamped 2025-01-01
+    # Just rewritten (e.g. re-extracted after an extractor version bump)
+    for cache_file in model_cache.glob("*.json"):
+        cache_file.touch()
+    # No timestamp: falls back to the file's modification time
+    (model_cache / "fresh.json").write_text('{"question_id": "fresh", "raw_response": "A"}')
+
+    stats = prune_disk_cache(tmp_path / "cache", max_age_days=30)
+    assert stats["evicted"] == 2
+    assert [path.name for path in model_cache.glob("*.json")] == ["fresh.json"]
@@ -0,0 +1,136 @@
+"""Benchmark loading: validation and the pickled index snapshot."""
+
+import json
+import pickle
+from types import MappingProxyType
+
+import numpy as np
+import pytest
+
+import question_index
+from conftest import PROJECT_ROOT, make_questions
+from question_index import LETTERS, QuestionIndex, load_benchmark, validate_benchmark
+
+BENCHMARK = PROJECT_ROOT / "data" / "benchmark" / "formationeval_v0.1.json"
+
+
+def _valid_questions(n=6):
+    questions = make_questions(n)
+    for question in questions:
+        question["answer_key"] = LETTERS[question["answer_index"]]
+    return questions
+
+
+def _assert_same_index(loaded: QuestionIndex, expected: QuestionIndex):
+    assert loaded.ids == expected.ids
+    assert loaded.questions == expected.questions
+    assert loaded.fingerprint == expected.fingerprint
+    assert loaded.difficulty_labels == expected.difficulty_labels
+    assert loaded.domain_labels == expected.domain_labels
+    for name in ("answer_index", "longest_index", "difficulty", "primary_domain", "calc_required"):
+        array = getattr(loaded, name)
+        np.testing.assert_array_equal(array, getattr(expected, name))
+        assert not array.flags.writeable
+    for name in ("by_id", "column"):
+        assert isinstance(getattr(loaded, name), MappingProxyType)
+    for record, original in zip(loaded.records, expected.records):
+        assert [getattr(record, slot) for slot in record.__slots__] == \
+            [getattr(original, slot) for slot in original.__slots__]
+    assert loaded.by_id[loaded.ids[0]] is loaded.records[0]
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    expected = load_benchmark(BENCHMARK)
+    written = load_benchmark(BENCHMARK, tmp_path)
+    _assert_same_index(written, expected)
+    snapshots = list(tmp_path.glob(f"{BENCHMARK.stem}-*.pickle"))
+    assert len(snapshots) == 1
+
+    # The next load comes from the snapshot without parsing the JSON
+    monkeypatch.setattr(question_index.json, "loads", lambda data: pytest.fail("JSON parsed"))
+    loaded = load_benchmark(BENCHMARK, tmp_path)
+    _assert_same_index(loaded, expected)
+    with pytest.raises(AttributeError):
+        loaded.records[0].difficulty = "easy"
+
+
+def test_index_pickles_without_snapshot_file():
+    index = QuestionIndex(_valid_questions())
+    _assert_same_index(pickle.loads(pickle.dumps(index)), index)
+
+
+def test_snapshot_follows_benchmark_edits(tmp_path):
+    benchmark = tmp_path / "bench.json"
+    snapshot_dir = tmp_path / "snapshots"
+    questions = _valid_questions()
+    benchmark.write_text(json.dumps(questions))
+    load_benchmark(benchmark, snapshot_dir)
+
+    questions[0]["question"] = "Edited?"
+    benchmark.write_text(json.dumps(questions))
+    assert load_benchmark(benchmark, snapshot_dir).records[0].question == "Edited?"
+    assert len(list(snapshot_dir.glob("bench-*.pickle"))) == 1
+
+    # An unreadable snapshot is rebuilt
+    snapshot = next(snapshot_dir.glob("bench-*.pickle"))
+    snapshot.write_bytes(b"not a pickle")
+    assert load_benchmark(benchmark, snapshot_dir).records[0].question == "Edited?"
+    assert pickle.loads(snapshot.read_bytes())["version"] == question_index.SNAPSHOT_VERSION
+
+
+def test_snapshots_of_other_benchmarks_survive(tmp_path):
+    snapshot_dir = tmp_path / "snapshots"
+    benchmarks = [tmp_path / "bench.json", tmp_path / "bench-v2.json", tmp_path / "other" / "bench.json"]
+    benchmarks[2].parent.mkdir()
+    for benchmark in benchmarks:
+        benchmark.write_text(json.dumps(_valid_questions()))
+        load_benchmark(benchmark, snapshot_dir)
+    assert len(list(snapshot_dir.glob("*.pickle"))) == 3
+
+    # Editing one benchmark replaces only its own snapshot
+    questions = _valid_questions()
+    questions[0]["question"] = "Edited?"
+    for benchmark in benchmarks:
+        benchmark.write_text(json.dumps(questions))
+        assert load_benchmark(benchmark, snapshot_dir).records[0].question == "Edited?"
+        assert len(list(snapshot_dir.glob("*.pickle"))) == 3
+
+
+def _broken(change):
+    questions = _valid_questions()
+    change(questions)
+    return questions
+
+
+@pytest.mark.parametrize("questions, message", [
+    ({"questions": []}, "must be a JSON list"),
+    (_broken(lambda q: q.append("text")), r"question 6: not an object"),
+    (_broken(lambda q: q[1].pop("id")), r"question 1: missing id"),
+    (_broken(lambda q: q[2].update(id=q[0]["id"])), r"question 2 \(test_q_000\): duplicate id"),
+    (_broken(lambda q: q[0].update(question="")), "missing question text"),
+    (_broken(lambda q: q[0]["choices"].pop()), "expected 4 string choices"),
+    (_broken(lambda q: q[0].update(answer_index=4)), "answer_index 4 out of range"),
+    (_broken(lambda q: q[0].update(answer_key="D")), "answer_key 'D' does not match answer_index 0"),
+])
+def test_validate_benchmark_errors(questions, message):
+    with pytest.raises(ValueError, match=message):
+        validate_benchmark(questions)
+
+
+def test_validate_benchmark_lists_problems():
+    questions = _valid_questions(15)
+    for question in questions:
+        question["answer_index"] = -1
+    with pytest.raises(ValueError, match=r"15 problem\(s\)[\s\S]*and 5 more"):
+        validate_benchmark(questions)
+
+    validate_benchmark(_valid_questions())
+    validate_benchmark(json.loads(BENCHMARK.read_text()))
+
+
+def test_invalid_benchmark_is_not_snapshotted(tmp_path):
+    benchmark = tmp_path / "bench.json"
+    benchmark.write_text(json.dumps(_broken(lambda q: q[0].update(answer_index=9))))
+    with pytest.raises(ValueError):
+        load_benchmark(benchmark, tmp_path / "snapshots")
+    assert not list(tmp_path.glob("snapshots/*.pickle"))
@@ -0,0 +1,312 @@
+"""Response cache packs and their index."""
+
+import json
+import multiprocessing
+
+import pytest
+
+import response_cache
+from cache_manifest import AnalysisSnapshots
+from conftest import write_responses
+from providers.azure_openai import AzureOpenAIProvider
+from providers.openrouter import OpenRouterProvider
+from question_index import QuestionIndex
+from response_cache import (
+    PACK_NAME,
+    ResponsePack,
+    analyze_model_caches,
+    build_fingerprint_index,
+    compact_model_cache,
+    legacy_entry_matches,
+    load_model_responses,
+    memory_cache,
+    request_fingerprint,
+)
+
+
+def _response(question_id, raw="B", **fields):
+    return {"question_id": question_id, "raw_response": raw, "timestamp": "2025-01-01T00:00:00+00:00", **fields}
+
+
+def test_pack_reads_latest_record_per_question(tmp_path):
+    pack = ResponsePack(tmp_path)
+    pack.append([_response("q1", "A"), _response("q2", "B")])
+    pack.append([_response("q1", "C")])
+    pack.close()
+
+    for reopened in (ResponsePack(tmp_path), ResponsePack(tmp_path)):
+        assert len(reopened) == 2
+        assert reopened.get("q1")["raw_response"] == "C"
+        assert reopened.get("q2")["raw_response"] == "B"
+        assert reopened.get("q3") is None
+        assert [qid for qid, _ in reopened.items()] == ["q2", "q1"]
+        reopened.close()
+
+
+def test_pack_index_rebuilt_from_records(tmp_path):
+    pack = ResponsePack(tmp_path)
+    pack.append([_response("q1", "A"), _response("q2", "B"), _response("q1", "D")])
+    expected = dict(pack.entries)
+    pack.close()
+
+    # Lost index: rescanned from the records (later records win)
+    (tmp_path / (PACK_NAME + ".idx")).unlink()
+    assert ResponsePack(tmp_path).entries == expected
+
+    # Truncated trailing record from an interrupted append is ignored
+    with open(tmp_path / PACK_NAME, "ab") as f:
+        f.write(b"\x00\x00\x10\x00{\"question_id\":")
+    rescanned = ResponsePack(tmp_path)
+    assert rescanned.entries == expected
+    assert rescanned.get("q1")["raw_response"] == "D"
+    rescanned.close()
+
+
+def test_pack_drop_rewrites_without_superseded_records(tmp_path):
+    pack = ResponsePack(tmp_path)
+    pack.append([_response("q1", "A"), _response("q2", "B")])
+    pack.append([_response("q1", "C")])
+    size = pack.drop({"q2"})
+    pack.close()
+
+    reopened = ResponsePack(tmp_path)
+    assert list(reopened.entries) == ["q1"]
+    assert reopened.get("q1")["raw_response"] == "C"
+    assert size == (tmp_path / PACK_NAME).stat().st_size
+    reopened.close()
+
+
+def test_compaction_keeps_loaded_responses(tmp_path):
+    model_cache = tmp_path / "model"
+    model_cache.mkdir()
+    for i, raw in enumerate(["A", "The answer is C", "<think>B?</think>D"]):
+        with open(model_cache / f"q{i}.json", "w") as f:
+            json.dump(_response(f"q{i}", raw), f)
+
+    loose, _ = load_model_responses(model_cache)
+    assert compact_model_cache(model_cache) == 3
+    assert not list(model_cache.glob("*.json"))
+    packed, flips = load_model_responses(model_cache)
+    assert packed == loose
+    assert flips == []
+
+    # A newer loose file overrides its packed record
+    with open(model_cache / "q1.json", "w") as f:
+        json.dump(_response("q1", "A"), f)
+    responses, _ = load_model_responses(model_cache)
+    assert [r["raw_response"] for r in responses] == ["A", "A", "<think>B?</think>D"]
+
+
+def test_reextraction_rewrites_the_pack_in_place(tmp_path):
+    pack = ResponsePack(tmp_path)
+    pack.append([
+        _response(f"q{i}", raw, extraction={"answer": "A", "pattern": "first_char", "version": "old"})
+        for i, raw in enumerate(["The answer is C", "B", "D."])
+    ])
+    size = (tmp_path / PACK_NAME).stat().st_size
+    pack.close()
+
+    responses, flips = load_model_responses(tmp_path)
+    assert [flip["new_answer"] for flip in flips] == ["C", "B", "D"]
+    # One record per response, not an appended copy of each stale one
+    reopened = ResponsePack(tmp_path)
+    assert len(reopened.scan()) == 3
+    assert (tmp_path / PACK_NAME).stat().st_size < 1.5 * size
+    assert [response for _, response in reopened.items()] == responses
+    reopened.close()
+    assert load_model_responses(tmp_path) == (responses, [])
+
+
+def _reextract(model_cache):
+    load_model_responses(model_cache)
+
+
+def test_concurrent_reextraction_keeps_the_pack_intact(tmp_path):
+    stale = {"answer": "A", "pattern": "first_char", "version": "old"}
+    responses = [_response(f"q{i}", "The answer is C", extraction=stale) for i in range(200)]
+    for _ in range(3):
+        ResponsePack(tmp_path).rewrite(responses)
+        workers = [multiprocessing.Process(target=_reextract, args=(tmp_path,)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        pack = ResponsePack(tmp_path)
+        assert pack.entries == pack.scan()
+        assert [response["extraction"]["answer"] for _, response in pack.items()] == ["C"] * len(responses)
+        pack.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".responses.lock", PACK_NAME, PACK_NAME + ".idx"]
+
+
+def test_regression_check_reads_packed_responses(tmp_path):
+    from extraction_regression import run_extraction
+
+    model_cache = tmp_path / "model"
+    model_cache.mkdir()
+    for i, raw in enumerate(["A", "The answer is C"]):
+        with open(model_cache / f"q{i}.json", "w") as f:
+            json.dump(_response(f"q{i}", raw), f)
+    loose = run_extraction(tmp_path)["models"]["model"]
+
+    compact_model_cache(model_cache)
+    with open(model_cache / "q2.json", "w") as f:
+        json.dump(_response("q2", "D"), f)
+    stats = run_extraction(tmp_path)["models"]["model"]
+    assert stats["total"] == 3
+    assert {qid: stats["answers"][qid] for qid in loose["answers"]} == loose["answers"]
+    assert not list(model_cache.glob("q[01].json"))
+
+
+def test_benchmark_loads_packed_responses(tmp_path):
+    from bench_extraction import load_cached_responses
+
+    model_cache = tmp_path / "model"
+    model_cache.mkdir()
+    ResponsePack(model_cache).append([_response("q0", "A"), _response("q1", "B")])
+    with open(model_cache / "q1.json", "w") as f:
+        json.dump(_response("q1", "C"), f)
+    assert load_cached_responses(tmp_path) == [("model", "q0", "A"), ("model", "q1", "C")]
+
+
+def test_request_fingerprint_is_canonical():
+    request = {"model": "m", "messages": [{"role": "user", "content": "Q?"}], "temperature": 0}
+    reordered = {"temperature": 0, "messages": [{"content": "Q?", "role": "user"}], "model": "m"}
+    assert request_fingerprint(request) == request_fingerprint(reordered)
+    assert request_fingerprint(request) != request_fingerprint({**request, "temperature": 0.5})
+
+
+def test_fingerprint_index_covers_packed_and_loose_entries(tmp_path):
+    pack = ResponsePack(tmp_path)
+    pack.append([
+        _response("old_q1", "A", request_fingerprint="f1"),
+        _response("old_q2", "B", request_fingerprint="f2"),
+        _response("legacy", "C"),
+    ])
+    pack.close()
+    with open(tmp_path / "new_q2.json", "w") as f:
+        json.dump(_response("new_q2", "D", request_fingerprint="f2"), f)
+
+    index = build_fingerprint_index(tmp_path)
+    assert sorted(index) == ["f1", "f2"]
+    assert index["f1"]["question_id"] == "old_q1"
+    assert index["f2"]["question_id"] == "new_q2"  # loose entries win
+    assert build_fingerprint_index(tmp_path / "missing") == {}
+
+
+def test_cached_request_lookups(tmp_path):
+    provider = OpenRouterProvider(api_key="test", cache_dir=tmp_path)
+    model = "org/model:free"
+    model_cache = tmp_path / "org_model_free"
+    model_cache.mkdir()
+    with open(model_cache / "q1.json", "w") as f:
+        json.dump(_response("q1", "A", request_fingerprint="f1"), f)
+
+    # Same request: hit; changed request: miss
+    request = {"model": model}
+    assert provider.load_cached_request(model, "q1", "f1", request)["raw_response"] == "A"
+    assert provider.load_cached_request(model, "q1", "f9", request) is None
+
+    # Unchanged request under a new question id: reused and cached under that id
+    reused = provider.load_cached_request(model, "q1_v2", "f1", request)
+    assert reused["question_id"] == "q1_v2"
+    with open(model_cache / "q1_v2.json") as f:
+        assert json.load(f)["request_fingerprint"] == "f1"
+
+
+@pytest.mark.parametrize("make_provider", [
+    lambda cache_dir: OpenRouterProvider(api_key="test", cache_dir=cache_dir),
+    lambda cache_dir: AzureOpenAIProvider(endpoint="https://example.invalid", api_key="test", cache_dir=cache_dir),
+])
+def test_providers_share_packed_request_lookups(tmp_path, make_provider):
+    provider = make_provider(tmp_path)
+    (tmp_path / "model").mkdir()
+    ResponsePack(tmp_path / "model").append([_response("q1", "A", request_fingerprint="f1")])
+
+    assert provider.load_cached("model", "q1")["raw_response"] == "A"
+    reused = provider.load_cached_request("model", "q2", "f1", {"model": "model"})
+    assert reused["question_id"] == "q2"
+    assert (tmp_path / "model" / "q2.json").exists()
+    provider._cache.close()
+
+
+def test_legacy_entries_are_used_unstamped(tmp_path):
+    provider = OpenRouterProvider(api_key="test", cache_dir=tmp_path)
+    model_cache = tmp_path / "model"
+    model_cache.mkdir()
+    legacy_path = model_cache / "q1.json"
+    with open(legacy_path, "w") as f:
+        json.dump(_response("q1", "A", model="model"), f)
+    before = legacy_path.read_bytes()
+
+    assert provider.load_cached_request("model", "q1", "f1", {"model": "model"})["raw_response"] == "A"
+    assert legacy_path.read_bytes() == before
+    # Never reused for another question id: its request is unknown
+    assert provider.load_cached_request("model", "q2", "f1", {"model": "model"}) is None
+
+    # Re-sent when asked to
+    requery = OpenRouterProvider(api_key="test", cache_dir=tmp_path, reuse_legacy_cache=False)
+    assert requery.load_cached_request("model", "q1", "f1", {"model": "model"}) is None
+
+
+@pytest.mark.parametrize("entry, request_kwargs, reused", [
+    ({"model": "m"}, {"model": "m", "temperature": 0}, True),
+    ({"model": "other"}, {"model": "m"}, False),
+    ({}, {"model": "m"}, False),
+    ({"model": "gpt-x-2025", "deployment": "gpt-x", "reasoning_effort": None}, {"model": "gpt-x"}, True),
+    ({"deployment": "gpt-x", "reasoning_effort": "low"}, {"model": "gpt-x", "reasoning_effort": "high"}, False),
+    ({"model": "m", "temperature": 0}, {"model": "m", "temperature": 0.7}, False),
+])
+def test_legacy_entries_must_match_the_recorded_request(entry, request_kwargs, reused):
+    assert legacy_entry_matches(_response("q1", **entry), request_kwargs) is reused
+
+
+def _model_caches(tmp_path, questions, n=3):
+    caches = []
+    for i in range(n):
+        write_responses(tmp_path / f"model_{i}", questions, f"model_{i}")
+        caches.append(tmp_path / f"model_{i}")
+    return caches
+
+
+def test_parallel_analysis_counts_worker_lookups(tmp_path, questions):
+    index = QuestionIndex(questions)
+    model_caches = _model_caches(tmp_path, questions)
+    serial = [result["metrics"] for result in analyze_model_caches(model_caches, index, jobs=1)]
+
+    before = memory_cache.stats()
+    parallel = [result["metrics"] for result in analyze_model_caches(model_caches, index, jobs=2)]
+    after = memory_cache.stats()
+
+    assert parallel == serial
+    # Every worker read each of its files once: all misses in the worker's LRU
+    assert after["worker_misses"] - before["worker_misses"] == len(model_caches) * len(questions)
+    assert after["misses"] - before["misses"] == after["worker_misses"] - before["worker_misses"]
+
+
+def test_stopping_early_shuts_the_pool_down(tmp_path, questions):
+    index = QuestionIndex(questions)
+    model_caches = _model_caches(tmp_path, questions)
+    results = analyze_model_caches(model_caches, index, jobs=2, snapshots=AnalysisSnapshots(tmp_path, index))
+    next(results)
+    results.close()
+    assert multiprocessing.active_children() == []
+
+
+def test_interrupted_save_keeps_the_previous_entry(tmp_path, monkeypatch):
+    provider = OpenRouterProvider(api_key="test", cache_dir=tmp_path)
+    provider.save_to_cache("model", "q1", _response("q1", "A", request_fingerprint="f1"))
+
+    def torn_dump(data, f, **kwargs):
+        f.write('{"question_id": "q1", "raw_res')
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(response_cache.json, "dump", torn_dump)
+    try:
+        provider.save_to_cache("model", "q1", _response("q1", "B", request_fingerprint="f2"))
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.undo()
+
+    assert list((tmp_path / "model").glob("*.json")) == [tmp_path / "model" / "q1.json"]
+    assert build_fingerprint_index(tmp_path / "model")["f1"]["raw_response"] == "A"
@@ -0,0 +1,129 @@
+"""Run log appends, deduplication and export."""
+
+import json
+
+from run_log import RunLog
+
+
+def _run(run_id, model="Model A", correct=True):
+    return {
+        "run_id": run_id,
+        "model": model,
+        "accuracy": 1.0 if correct else 0.0,
+        "answers": {
+            "q1": {"predicted": "B", "correct": correct, "raw_response": "The answer is B"},
+        },
+    }
+
+
+def test_append_dedupes_by_run_id(tmp_path):
+    run_log = RunLog(tmp_path)
+    assert run_log.append(_run("run_1"))
+    assert not run_log.append(_run("run_1", correct=False))
+    assert run_log.extend([_run("run_1"), _run("run_2", model="Model B")]) == 1
+
+    reopened = RunLog(tmp_path)
+    assert len(reopened) == 2
+    assert reopened.run_ids() == ["run_1", "run_2"]
+    assert reopened.get("run_1")["accuracy"] == 1.0
+    assert reopened.get("missing") is None
+
+
+def test_raw_responses_kept_beside_the_log(tmp_path):
+    run_log = RunLog(tmp_path)
+    run_log.append(_run("run:1"))
+
+    line = json.loads((tmp_path / "runs.jsonl").read_text())
+    assert "raw_response" not in line["answers"]["q1"]
+    assert run_log.get("run:1")["answers"]["q1"] == {"predicted": "B", "correct": True}
+    assert run_log.get("run:1", with_raw=True)["answers"]["q1"]["raw_response"] == "The answer is B"
+
+
+def test_index_recovers_from_partial_lines(tmp_path):
+    RunLog(tmp_path).append(_run("run_1"))
+    # Interrupted append from another process
+    with open(tmp_path / "runs.jsonl", "ab") as f:
+        f.write(b'{"run_id": "run_x", "mod')
+
+    run_log = RunLog(tmp_path)
+    assert run_log.run_ids() == ["run_1"]
+    assert run_log.append(_run("run_2"))
+    assert RunLog(tmp_path).run_ids() == ["run_1", "run_2"]
+    (tmp_path / "runs.jsonl.idx").unlink()
+    assert RunLog(tmp_path).run_ids() == ["run_1", "run_2"]
+
+
+def test_export_json_matches_indented_layout(tmp_path):
+    run_log = RunLog(tmp_path)
+    runs = [_run("run_1"), _run("run_2", model="Model B", correct=False)]
+    run_log.extend(runs)
+
+    output_path = tmp_path / "all_results.json"
+    assert run_log.export_json(output_path, total_questions=1) == 2
+    text = output_path.read_text()
+    expected = {"benchmark": "formationeval_v0.1", "total_questions": 1, "runs": runs}
+    assert json.loads(text) == expected
+    assert text == json.dumps(expected, indent=2)
+
+    empty = RunLog(tmp_path / "empty")
+    assert empty.export_json(tmp_path / "empty.json") == 0
+    assert json.loads((tmp_path / "empty.json").read_text())["runs"] == []
+
+    # A legacy all_results.json imports into a fresh log
+    imported = RunLog(tmp_path / "imported")
+    assert imported.import_json(output_path) == 2
+    assert list(imported.iter_runs(with_raw=True)) == runs
+
+
+def test_cache_analysis_replaces_logged_run(tmp_path):
+    run_log = RunLog(tmp_path)
+    assert run_log.append(_run("cache_Model A", correct=False))
+    assert run_log.append(_run("2025-01-01_000000_Model B", model="Model B"))
+
+    # Unchanged re-analysis is not logged again
+    assert not run_log.append(_run("cache_Model A", correct=False))
+    # A changed analysis replaces the logged one and becomes the latest run
+    assert run_log.append(_run("cache_Model A", correct=True))
+
+    for log in (run_log, RunLog(tmp_path)):
+        assert log.run_ids() == ["2025-01-01_000000_Model B", "cache_Model A"]
+        assert log.get("cache_Model A")["accuracy"] == 1.0
+    assert len((tmp_path / "runs.jsonl").read_text().splitlines()) == 3
+
+
+def test_cache_analysis_replacement_seen_by_other_instances(tmp_path):
+    reader = RunLog(tmp_path)
+    # Enough other runs that the superseded line does not trigger a compaction
+    RunLog(tmp_path).extend(_run(f"2025-01-01_00000{i}_Model B", model="Model B") for i in range(3))
+    RunLog(tmp_path).append(_run("cache_Model A", correct=False))
+    reader.refresh()
+    RunLog(tmp_path).append(_run("cache_Model A", correct=True))
+    reader.refresh()
+    assert reader.get("cache_Model A", with_raw=True)["answers"]["q1"]["correct"] is True
+
+    # Rebuilding the index from the file keeps the latest line too
+    (tmp_path / "runs.jsonl.idx").unlink()
+    assert RunLog(tmp_path).get("cache_Model A")["accuracy"] == 1.0
+    assert json.loads((tmp_path / "runs.jsonl").read_text().splitlines()[3])["accuracy"] == 0.0
+
+
+def test_superseded_lines_are_compacted(tmp_path):
+    writer = RunLog(tmp_path)
+    writer.append(_run("2025-01-01_000000_Model B", model="Model B"))
+    writer.append(_run("cache_Model A"))
+    writer.append(_run("2025-01-01_000000_Model C", model="Model C"))
+    reader = RunLog(tmp_path)
+    for i in range(20):
+        writer.append({**_run("cache_Model A", correct=i % 2 == 0), "accuracy": i})
+        assert writer.superseded_bytes() <= 0.5 * writer.size
+
+    lines = (tmp_path / "runs.jsonl").read_text().splitlines()
+    assert len(lines) <= 5
+    assert json.loads(lines[-1])["accuracy"] == 19
+    # Instances indexed before the compaction rebuild their index
+    for log in (writer, reader, RunLog(tmp_path)):
+        log.refresh()
+        assert log.run_ids() == ["2025-01-01_000000_Model B", "2025-01-01_000000_Model C", "cache_Model A"]
+        assert log.get("cache_Model A", with_raw=True)["accuracy"] == 19
+        assert log.get("2025-01-01_000000_Model B")["model"] == "Model B"
+    assert len(list((tmp_path / "runs_raw").iterdir())) == 3
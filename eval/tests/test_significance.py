@@ -0,0 +1,58 @@
+"""Paired model comparisons on the questions each pair answered."""
+
+import numpy as np
+import pytest
+from scipy.stats import binomtest
+
+from conftest import make_questions, make_run
+from question_index import QuestionIndex
+from results_matrix import ResultsMatrix
+from significance import compare_models
+from subset import select_subset
+
+
+@pytest.fixture
+def index():
+    return QuestionIndex(make_questions(60))
+
+
+def _runs(index):
+    partial, _ = select_subset(index, sample=15, seed=2)
+    return [
+        make_run("a", "Model A", index, "ABCDDA"),
+        make_run("b", "Model B", index, "ABCA"),
+        make_run("c", "Model C", partial, "ABCD"),
+    ]
+
+
+def test_pairs_compared_on_shared_questions(index):
+    runs = _runs(index)
+    matrix = ResultsMatrix.from_runs(runs, index)
+    result = compare_models(matrix, n_resamples=200)
+
+    for i in range(len(runs)):
+        for j in range(len(runs)):
+            if i == j:
+                continue
+            shared = [qid for qid in runs[i]["answers"] if qid in runs[j]["answers"]]
+            right_i = np.array([runs[i]["answers"][qid]["correct"] for qid in shared])
+            right_j = np.array([runs[j]["answers"][qid]["correct"] for qid in shared])
+            b, c = int((right_i & ~right_j).sum()), int((~right_i & right_j).sum())
+
+            assert result["n_questions"][i, j] == len(shared)
+            assert result["discordant"][i, j] == b
+            assert result["accuracy"][i, j] == pytest.approx(right_i.mean())
+            assert result["diff"][i, j] == pytest.approx(right_i.mean() - right_j.mean())
+            expected_p = binomtest(min(b, c), b + c, 0.5).pvalue if b + c else 1.0
+            assert result["p_mcnemar"][i, j] == pytest.approx(min(1.0, expected_p))
+            assert result["diff_lower"][i, j] <= result["diff"][i, j] <= result["diff_upper"][i, j]
+
+
+def test_partial_run_does_not_shrink_other_pairs(index):
+    runs = _runs(index)
+    full = compare_models(ResultsMatrix.from_runs(runs[:2], index), n_resamples=200)
+    mixed = compare_models(ResultsMatrix.from_runs(runs, index), n_resamples=200)
+
+    assert mixed["n_questions"][0, 1] == len(index)
+    for key in ("n_questions", "accuracy", "discordant", "p_mcnemar", "diff", "diff_lower", "diff_upper"):
+        assert mixed[key][0, 1] == full[key][0, 1], key
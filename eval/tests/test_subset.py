@@ -0,0 +1,198 @@
+"""Benchmark subsets: selection, reweighting and publishing."""
+
+import gzip
+import json
+import random
+
+import pytest
+
+from columnar_export import LongResultsWriter
+from conftest import make_run
+from export_model_answers import latest_runs
+from metrics import find_hardest_questions
+from question_index import QuestionIndex
+from reports import generate_all_reports
+from run_log import RunLog
+from subset import _allocate, select_subset, stratified_estimate, stratum_key
+
+
+def test_allocate_is_proportional_and_exact():
+    rng = random.Random(0)
+    for _ in range(500):
+        sizes = {f"s{i}": rng.randint(1, 40) for i in range(rng.randint(1, 9))}
+        population = sum(sizes.values())
+        n = rng.randint(1, population)
+        allocation = _allocate(sizes, n)
+
+        assert sum(allocation.values()) == n
+        for key, size in sizes.items():
+            assert 0 <= allocation[key] <= size
+            if n >= len(sizes):
+                assert allocation[key] >= 1
+
+
+def test_allocate_examples():
+    assert _allocate({"a": 50, "b": 30, "c": 20}, 10) == {"a": 5, "b": 3, "c": 2}
+    assert _allocate({"a": 1, "b": 1, "c": 98}, 3) == {"a": 1, "b": 1, "c": 1}
+    assert _allocate({"a": 5, "b": 5}, 10) == {"a": 5, "b": 5}
+
+
+def test_select_subset_filters_and_samples(questions):
+    index = QuestionIndex(questions)
+    assert select_subset(index) == (index, None)
+
+    hard, subset = select_subset(index, domains=["petrophysics"], difficulties=["HARD"])
+    assert {record.difficulty for record in hard.records} == {"hard"}
+    assert all("Petrophysics" in record.domains for record in hard.records)
+    assert subset["filters"] == {"domains": ["Petrophysics"], "difficulties": ["hard"]}
+    assert subset["questions"] == subset["population"] == len(hard)
+
+    sampled, subset = select_subset(index, sample=9, stratify_by="domain,difficulty", seed=3)
+    assert len(sampled) == 9
+    assert sum(n for _, n in subset["strata"].values()) == 9
+    assert sum(size for size, _ in subset["strata"].values()) == len(index)
+    assert select_subset(index, sample=9, stratify_by="domain,difficulty", seed=3)[0].ids == sampled.ids
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"domains": ["Astrology"]}, "Unknown domain"),
+    ({"stratify_by": "topic", "sample": 5}, "Cannot stratify by"),
+    ({"stratify_by": "domain"}, "needs --sample"),
+    ({"sample": 0}, "at least 1"),
+    ({"domains": ["Geophysics"], "difficulties": ["easy"], "topics": ["Topic 0"]}, "No questions match"),
+])
+def test_select_subset_errors(questions, kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        select_subset(QuestionIndex(questions), **kwargs)
+
+
+def test_stratified_estimate_reweights_to_population(questions):
+    index = QuestionIndex(questions)
+    # Two strata of the population: 16 and 8 questions, 4 sampled from each
+    strata = {"Geophysics": [8, 4], "Petrophysics": [16, 4]}
+    subset = {"stratify_by": ["domain"], "strata": strata}
+    answers = {}
+    seen = {}
+    for record in index.records:
+        key = stratum_key(record, ("domain",))
+        if key in strata and seen.get(key, 0) < 4:
+            seen[key] = seen.get(key, 0) + 1
+            # Geophysics: all correct; Petrophysics: 1 of 4 correct
+            answers[record.id] = {"correct": key == "Geophysics" or seen[key] == 1}
+
+    estimate = stratified_estimate(answers, index, subset)
+    expected = 8 / 24 * 1.0 + 16 / 24 * 0.25
+    assert estimate["weighted_accuracy"] == pytest.approx(expected)
+    assert estimate["weighted_ci_lower"] < expected < estimate["weighted_ci_upper"]
+
+    # A census of every stratum has no sampling error
+    census = {"Geophysics": [4, 4], "Petrophysics": [4, 4]}
+    estimate = stratified_estimate(answers, index, {"stratify_by": ["domain"], "strata": census})
+    assert estimate["weighted_ci_lower"] == estimate["weighted_ci_upper"] == pytest.approx(0.625)
+
+    assert stratified_estimate(answers, index, None) == {}
+    assert stratified_estimate(answers, index, {"stratify_by": [], "strata": {}}) == {}
+
+
+def test_singleton_strata_keep_a_nonzero_ci(questions):
+    index = QuestionIndex(questions)
+    strata = {"Geophysics": [8, 1], "Petrophysics": [8, 1], "Drilling Engineering": [8, 1]}
+    subset = {"stratify_by": ["domain"], "strata": strata}
+    answers = {}
+    for record in index.records:
+        key = stratum_key(record, ("domain",))
+        if key not in {stratum_key(index.get(qid), ("domain",)) for qid in answers}:
+            answers[record.id] = {"correct": key != "Geophysics"}
+
+    estimate = stratified_estimate(answers, index, subset)
+    assert estimate["weighted_accuracy"] == pytest.approx(2 / 3)
+    # Worst-case variance per stratum: 1/9 * 7/8 * 0.25 each, three strata
+    spread = 1.959963984540054 * (3 * (1 / 3) ** 2 * (1 - 1 / 8) * 0.25) ** 0.5
+    assert estimate["weighted_ci_lower"] == pytest.approx(2 / 3 - spread)
+    assert estimate["weighted_ci_upper"] == pytest.approx(min(1.0, 2 / 3 + spread))
+
+
+@pytest.fixture
+def mixed_runs(questions):
+    index = QuestionIndex(questions)
+    subset_index, subset = select_subset(index, sample=6, stratify_by="domain", seed=1)
+    return index, [
+        make_run("full_a", "Model A", index, "ABCD"),
+        make_run("full_b", "Model B", index, "B"),
+        make_run("subset_a", "Model A", subset_index, "A", subset=subset),
+    ]
+
+
+def _report(runs, index, output_dir, **kwargs):
+    return generate_all_reports(
+        runs, index, output_dir, n_resamples=50, render_figures=False, **kwargs,
+    )
+
+
+def _bundle_models(output_dir):
+    pointer = json.loads((output_dir / "aggregates.json").read_text())
+    bundle = json.loads(gzip.decompress((output_dir / pointer["file"]).read_bytes()))
+    return [(entry["model"], "subset" in entry) for entry in bundle["models"]]
+
+
+def test_subset_runs_are_not_published_by_default(tmp_path, mixed_runs):
+    index, runs = mixed_runs
+    _report(runs, index, tmp_path)
+
+    assert sorted(_bundle_models(tmp_path)) == [("Model A", False), ("Model B", False)]
+    if LongResultsWriter.available():
+        import pyarrow.parquet as pq
+        assert pq.read_table(tmp_path / "results_long.parquet").num_rows == 2 * len(index)
+    # The leaderboard still lists the subset run
+    assert "6/24" in (tmp_path / "leaderboard.md").read_text()
+
+    # The website export takes the latest full run, not the later subset run
+    latest = latest_runs(RunLog(tmp_path))
+    assert [run["run_id"] for run in latest] == ["full_a", "full_b"]
+    assert [run["run_id"] for run in latest_runs(RunLog(tmp_path), include_subsets=True)] == ["subset_a", "full_b"]
+
+
+def _section(path, title):
+    return path.read_text().split(f"## {title}\n")[1].split("\n## ")[0]
+
+
+def test_subset_runs_listed_apart_from_the_ranking(tmp_path, mixed_runs):
+    index, runs = mixed_runs
+    _report(runs, index, tmp_path)
+    full_only = tmp_path / "full_only"
+    _report(runs[:2], index, full_only)
+
+    subsets = _section(tmp_path / "leaderboard.md", "Subset runs")
+    assert "Model A" in subsets and "6/24 questions" in subsets
+    # Ranks, rank CIs and groups of the full runs ignore the subset run
+    rankings = _section(tmp_path / "leaderboard.md", "Overall rankings")
+    assert rankings == _section(full_only / "leaderboard.md", "Overall rankings")
+    assert (tmp_path / "significance.csv").read_text() == (full_only / "significance.csv").read_text()
+
+
+def test_subset_runs_published_on_request(tmp_path, mixed_runs):
+    index, runs = mixed_runs
+    _report(runs, index, tmp_path, include_subsets=True)
+    assert sorted(_bundle_models(tmp_path)) == [("Model A", False), ("Model A", True), ("Model B", False)]
+
+
+def test_hardest_questions_count_only_runs_that_answered(mixed_runs):
+    index, runs = mixed_runs
+    sampled = set(runs[2]["answers"])
+    for question in find_hardest_questions(runs, index, top_n=len(index)):
+        assert question["total_models"] == (3 if question["question_id"] in sampled else 2)
+
+
+def test_subset_only_report_keeps_published_files(tmp_path, mixed_runs):
+    index, runs = mixed_runs
+    _report(runs[:2], index, tmp_path)
+    published = {path: path.read_bytes() for path in tmp_path.glob("results_long.*")}
+    for name in ("aggregates.json", "leaderboard.md", "analysis.md", "questions.csv", "significance.csv"):
+        published[tmp_path / name] = (tmp_path / name).read_bytes()
+
+    paths = _report(runs[2:], index, tmp_path)
+    assert "aggregates" not in paths and "results_long" not in paths
+    assert {path: path.read_bytes() for path in published} == published
+    # The subset run's own reports
+    assert paths["leaderboard"] == tmp_path / "subset" / "leaderboard.md"
+    assert "Model A" in _section(paths["leaderboard"], "Subset runs")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for answer extraction over the response cache.
+
+Replays every cached raw_response through the current extract_answer and the
+original (uncompiled, pattern-by-pattern) implementation, checks that both
+return identical (answer, pattern) pairs, and reports the timings.
+
+Responses containing thinking tags are listed separately when they differ:
+strip_thinking() now keeps only the text after the last closing tag and drops
+unterminated blocks, which intentionally changes unbalanced or interleaved
+tag layouts. A thinking-tag response whose answer was extracted before but
+now fails ("regression") fails the run, as does any other difference.
+
+Usage:
+    python scripts/bench_extraction.py                       # All of eval/cache
+    python scripts/bench_extraction.py --cache-dir eval/cache --repeat 5
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "eval"))
+
+from extraction import extract_answer, extract_answers
+from response_cache import read_model_cache
+
+
+def legacy_extract_answer(response: str) -> tuple[str | None, str]:
+    """Original extract_answer implementation, kept as the reference output."""
+    response = re.sub(r'<thinking>.*?</thinking>', '', response, flags=re.DOTALL)
+    response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
+    text = response.strip().upper()
+    text = re.sub(r'\*+([ABCD])\*+', r'\1', text)
+    text = ' '.join(text.split())
+
+    if not text:
+        return None, "failed"
+    if text[0] in 'ABCD':
+        return text[0], "first_char"
+
+    patterns = [
+        (r'CORRECT\s+ANSWER[:\s]+([ABCD])', "correct_answer"),
+        (r'ANSWER\s+IS[:\s]+([ABCD])', "answer_is"),
+        (r'ANSWER[:\s]+([ABCD])', "answer_colon"),
+        (r'CHOOSE\s+([ABCD])', "choose"),
+        (r'CHOICE\s+IS[:\s]+([ABCD])', "choice_is"),
+        (r'OPTION\s+([ABCD])', "option"),
+        (r'SELECT\s+([ABCD])', "select"),
+        (r'GO\s+WITH\s+([ABCD])', "go_with"),
+        (r'\(([ABCD])\)', "parentheses"),
+        (r'\b([ABCD])\)', "letter_paren"),
+        (r'\b([ABCD])\.', "letter_period"),
+        (r'\b([ABCD]),', "letter_comma"),
+        (r'^([ABCD])\b', "start_of_string"),
+        (r'\b([ABCD])\s*$', "end_of_string"),
+        (r'\bIS\s+([ABCD])\b', "is_x"),
+        (r'\b([ABCD])\b(?!.*\b[ABCD]\b)', "standalone"),
+    ]
+    for regex, pattern_name in patterns:
+        match = re.search(regex, text)
+        if match:
+            return match.group(1), pattern_name
+
+    return None, "failed"
+
+
+def load_cached_responses(cache_dir: Path) -> list[tuple[str, str, str]]:
+    """Load (model_dir, question_id, raw_response) for every packed and loose cached response."""
+    records = []
+    for model_cache in sorted(cache_dir.iterdir()):
+        if not model_cache.is_dir() or model_cache.name.startswith('.'):
+            continue
+        by_stem = read_model_cache(model_cache)
+        for stem in sorted(by_stem):
+            _, data = by_stem[stem]
+            records.append((model_cache.name, stem, data.get("raw_response", "")))
+    return records
+
+
+def time_extractor(extractor, raws: list[str], repeat: int) -> tuple[list, float]:
+    """Run extractor over all responses, returning results and best wall time."""
+    best = float("inf")
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [extractor(raw) for raw in raws]
+        best = min(best, time.perf_counter() - start)
+    return results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract_answer against the original implementation")
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=PROJECT_ROOT / "eval" / "cache",
+        help="Response cache directory (default: eval/cache)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Timing repetitions; the best run is reported (default: 3)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Worker processes for the extract_answers() batch (default: CPU count)",
+    )
+    args = parser.parse_args()
+
+    records = load_cached_responses(args.cache_dir)
+    if not records:
+        print(f"No cached responses found in {args.cache_dir}")
+        return
+
+    raws = [raw for _, _, raw in records]
+    total_chars = sum(len(raw) for raw in raws)
+    print(f"Loaded {len(raws)} cached responses ({total_chars / 1e6:.1f}M chars)")
+
+    legacy, legacy_time = time_extractor(legacy_extract_answer, raws, args.repeat)
+    current, current_time = time_extractor(extract_answer, raws, args.repeat)
+
+    start = time.perf_counter()
+    batch = extract_answers(raws, jobs=args.jobs)
+    batch_time = time.perf_counter() - start
+
+    mismatches = []
+    thinking_changes = []
+    for record, old, new in zip(records, legacy, current):
+        if old == new:
+            continue
+        if "think>" in record[2]:
+            thinking_changes.append((record, old, new))
+        else:
+            mismatches.append((record, old, new))
+
+    print(f"  Original: {legacy_time:.3f}s ({len(raws) / legacy_time:,.0f} responses/s)")
+    print(f"  Current:  {current_time:.3f}s ({len(raws) / current_time:,.0f} responses/s)")
+    print(f"  Speed-up: {legacy_time / current_time:.2f}x")
+    print(f"  Batch:    {batch_time:.3f}s ({len(raws) / batch_time:,.0f} responses/s, extract_answers)")
+
+    if batch != current:
+        print("\nFAIL: extract_answers() differs from per-response extract_answer()")
+        sys.exit(1)
+
+    # Answers the original extractor found must never be lost
+    regressions = [(record, old, new) for record, old, new in thinking_changes if old[0] and new[0] is None]
+    if thinking_changes:
+        print(f"\nNOTE: {len(thinking_changes)} responses with thinking tags extracted differently (tail-first)")
+        for (model, qid, _), old, new in thinking_changes[:20]:
+            print(f"  {model}/{qid}: {old} -> {new}")
+
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} responses with thinking tags no longer extracted")
+        for (model, qid, _), old, new in regressions[:20]:
+            print(f"  {model}/{qid}: {old} -> {new}")
+        sys.exit(1)
+
+    if mismatches:
+        print(f"\nFAIL: {len(mismatches)} responses extracted differently")
+        for (model, qid, _), old, new in mismatches[:20]:
+            print(f"  {model}/{qid}: {old} -> {new}")
+        sys.exit(1)
+
+    print("\nPASS: identical (answer, pattern) for every cached response without thinking tags,")
+    print("      and no answer lost on responses with thinking tags")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark the NumPy results matrix on a synthetic leaderboard.
+
+Builds a synthetic benchmark and results for N models x M questions, then
+times the vectorized breakdowns (difficulty, domain, position and length
+bias, hardest questions, agreement) for all models at once. For reference,
+the per-run dict loops are timed on a few runs and extrapolated.
+
+Usage:
+    python scripts/bench_results_matrix.py                          # 500 models x 50k questions
+    python scripts/bench_results_matrix.py --models 100 --questions 10000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "eval"))
+
+from metrics import compute_wilson_ci, _difficulty_breakdown, _domain_breakdown, _matrix_length_bias, _matrix_position_bias
+from question_index import LETTERS, QuestionIndex
+from results_matrix import ResultsMatrix
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+DOMAINS = [
+    "Petrophysics", "Petroleum Geology", "Sedimentology", "Geophysics",
+    "Reservoir Engineering", "Drilling Engineering", "Production Engineering",
+]
+
+
+def synthetic_questions(n_questions: int, rng: np.random.Generator) -> list[dict]:
+    """Generate question dicts with random answers, choice lengths and tags."""
+    answer_index = rng.integers(0, 4, n_questions)
+    lengths = rng.integers(10, 200, (n_questions, 4))
+    difficulty = rng.integers(0, len(DIFFICULTIES), n_questions)
+    questions = []
+    for i in range(n_questions):
+        domains = [DOMAINS[j] for j in rng.choice(len(DOMAINS), size=rng.integers(1, 3), replace=False)]
+        questions.append({
+            "id": f"q{i:06d}",
+            "question": f"Question {i}",
+            "choices": ["x" * int(n) for n in lengths[i]],
+            "answer_index": int(answer_index[i]),
+            "difficulty": DIFFICULTIES[difficulty[i]],
+            "domains": domains,
+            "topics": [],
+        })
+    return questions
+
+
+def synthetic_matrix(questions: QuestionIndex, n_models: int, rng: np.random.Generator) -> ResultsMatrix:
+    """Generate predictions with per-model skill and ~1% extraction failures."""
+    n_questions = len(questions)
+    skill = rng.uniform(0.3, 0.95, (n_models, 1))
+    right = rng.random((n_models, n_questions)) < skill
+    guesses = rng.integers(0, 4, (n_models, n_questions)).astype(np.int8)
+    predicted = np.where(right, questions.answer_index, guesses).astype(np.int8)
+    predicted[rng.random((n_models, n_questions)) < 0.01] = -1
+    answered = np.ones((n_models, n_questions), dtype=bool)
+    correct = predicted == questions.answer_index
+    models = [f"model-{i}" for i in range(n_models)]
+    return ResultsMatrix(models, questions, answered, correct, predicted)
+
+
+def to_answers(matrix: ResultsMatrix, row: int) -> dict:
+    """Convert one matrix row back to a results_by_qid dict."""
+    answers = {}
+    for col, qid in enumerate(matrix.questions.ids):
+        code = int(matrix.predicted[row, col])
+        answers[qid] = {
+            "predicted": LETTERS[code] if code >= 0 else None,
+            "correct": bool(matrix.correct[row, col]),
+        }
+    return answers
+
+
+def legacy_breakdowns(answers: dict, questions: list[dict]) -> None:
+    """Per-run dict loops equivalent to the pre-matrix breakdowns."""
+    q_by_id = {q["id"]: q for q in questions}
+    by_difficulty, by_domain = {}, {}
+    counts = {letter: 0 for letter in LETTERS}
+    longest_picked = 0
+    for qid, result in answers.items():
+        q = q_by_id[qid]
+        level = by_difficulty.setdefault(q["difficulty"], [0, 0])
+        level[0] += result["correct"]
+        level[1] += 1
+        for domain in q["domains"]:
+            entry = by_domain.setdefault(domain, [0, 0])
+            entry[0] += result["correct"]
+            entry[1] += 1
+        predicted = result["predicted"]
+        if predicted is not None:
+            counts[predicted] += 1
+            lengths = [len(c) for c in q["choices"]]
+            if ord(predicted) - ord('A') == lengths.index(max(lengths)):
+                longest_picked += 1
+
+
+def timed(label: str, func):
+    """Run func once and print its wall time."""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the results matrix on synthetic data")
+    parser.add_argument("--models", type=int, default=500, help="Number of models (default: 500)")
+    parser.add_argument("--questions", type=int, default=50_000, help="Number of questions (default: 50000)")
+    parser.add_argument("--legacy-runs", type=int, default=3, help="Runs timed with dict loops (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"Synthetic leaderboard: {args.models} models x {args.questions:,} questions\n")
+
+    questions, _ = timed("generate questions", lambda: synthetic_questions(args.questions, rng))
+    index, _ = timed("QuestionIndex (once per benchmark)", lambda: QuestionIndex(questions))
+    matrix, _ = timed("synthetic results matrix", lambda: synthetic_matrix(index, args.models, rng))
+
+    sample_answers = [to_answers(matrix, row) for row in range(min(args.legacy_runs, args.models))]
+    timed(
+        f"ResultsMatrix.from_runs ({len(sample_answers)} runs)",
+        lambda: ResultsMatrix.from_runs([{"model": "m", "answers": a} for a in sample_answers], index),
+    )
+
+    print()
+    total = 0.0
+    for label, func in [
+        ("difficulty counts", matrix.difficulty_counts),
+        ("domain counts", matrix.domain_counts),
+        ("position counts", matrix.position_counts),
+        ("length counts", matrix.length_counts),
+        ("hardest questions (top 10)", lambda: matrix.hardest_columns(10)),
+        ("agreement counts", matrix.agreement_counts),
+    ]:
+        _, elapsed = timed(label, func)
+        total += elapsed
+
+    compute_wilson_ci(1, 2)  # Warm up (imports scipy once)
+
+    def format_all():
+        for row in range(len(matrix)):
+            _difficulty_breakdown(matrix, row)
+            _domain_breakdown(matrix, row)
+            _matrix_position_bias(matrix, row)
+            _matrix_length_bias(matrix, row)
+
+    _, elapsed = timed("per-model metric dicts (all models)", format_all)
+    total += elapsed
+    print(f"  {'matrix total':<40} {total:8.3f}s")
+
+    if sample_answers:
+        print()
+        start = time.perf_counter()
+        for answers in sample_answers:
+            legacy_breakdowns(answers, questions)
+        per_run = (time.perf_counter() - start) / len(sample_answers)
+        print(f"  {'dict loops per run':<40} {per_run:8.3f}s")
+        print(f"  {'dict loops, extrapolated to all runs':<40} {per_run * args.models:8.3f}s")
+        print(f"\n  Speed-up: {per_run * args.models / total:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
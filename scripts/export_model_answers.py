@@ -1,30 +1,235 @@
 #!/usr/bin/env python3
-"""Export per-question model answers from questions.csv to JSON for website quiz feature."""
+"""
+Export per-question model answers as compressed JSON shards for the website quiz.
 
-import pandas as pd
+Reads the long-format results of the latest analysis
+(eval/results/results_long.parquet, written with the other reports) when
+present, pyarrow is installed and it covers every model of the run log;
+otherwise the latest logged run of each model from the run log
+(eval/results/runs.jsonl). Subset runs are left out of both unless
+--include-subsets is given. Either source is turned into one (models x
+questions) results matrix with pyarrow compute / NumPy, which is then cut
+into one small compressed shard per question, so the website can
+lazy-load the answers for a single question. A manifest (index.json)
+lists the models and the shard of every question.
+
+Shard format: {"question_id": ..., "answers": {model: {"answer": "B", "correct": true}}}
+
+Usage:
+    python scripts/export_model_answers.py                         # gzip shards
+    python scripts/export_model_answers.py --compression brotli    # needs brotli
+    python scripts/export_model_answers.py --output-dir /tmp/model-answers
+    python scripts/export_model_answers.py --run-log               # ignore results_long.parquet
+"""
+
+import argparse
+import gzip
 import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "eval"))
+
+from columnar_export import FORMATS, LONG_RESULTS_NAME
+from question_index import LETTERS, QuestionIndex, load_benchmark
+from results_matrix import ResultsMatrix
+from run_log import RunLog
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pq = None
+
+MANIFEST_VERSION = 1
+EXTENSIONS = {"gzip": ".json.gz", "brotli": ".json.br"}
+
+
+def latest_runs(run_log: RunLog, include_subsets: bool = False) -> list[dict]:
+    """
+    Latest logged run per model, in order of each model's first appearance.
+
+    Subset runs (quick runs on a slice of the benchmark, see subset.py) are
+    skipped unless include_subsets is set.
+    """
+    latest = {}
+    for run in run_log.iter_runs():
+        if run.get("subset") and not include_subsets:
+            continue
+        latest[run.get("model", "unknown")] = run
+    return list(latest.values())
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == "brotli":
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps shards byte-identical across exports
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def long_results_matrix(path: Path, questions: QuestionIndex) -> ResultsMatrix:
+    """
+    Build the (models x questions) results matrix from the long-format results.
+
+    Only the needed columns are read, and rows are mapped to matrix cells
+    with pyarrow compute (no per-row Python). Rows of questions no longer
+    in the benchmark are skipped; models keep their order of first
+    appearance.
+    """
+    table = pq.read_table(path, columns=["question_id", "model", "predicted", "correct"])
+    question_ids = table.column("question_id").cast(pa.string())
+    model_names = table.column("model").cast(pa.string())
+
+    models = pc.unique(model_names).to_pylist()
+    cols = pc.fill_null(pc.index_in(question_ids, value_set=pa.array(questions.ids, pa.string())), -1)
+    rows = pc.index_in(model_names, value_set=pa.array(models, pa.string()))
+    codes = pc.fill_null(pc.index_in(table.column("predicted"), value_set=pa.array(list(LETTERS))), -1)
+    correct = pc.fill_null(table.column("correct"), False)
+
+    cols = cols.to_numpy()
+    known = cols >= 0
+    cols = cols[known]
+    rows = rows.to_numpy()[known]
+
+    shape = (len(models), len(questions))
+    answered = np.zeros(shape, dtype=bool)
+    is_correct = np.zeros(shape, dtype=bool)
+    predicted = np.full(shape, -1, dtype=np.int8)
+    answered[rows, cols] = True
+    is_correct[rows, cols] = correct.to_numpy(zero_copy_only=False)[known]
+    predicted[rows, cols] = codes.to_numpy()[known]
+    return ResultsMatrix(models, questions, answered, is_correct, predicted)
+
+
+def question_shards(matrix: ResultsMatrix) -> dict[str, dict]:
+    """
+    Build one answers dict per question from the (models x questions) matrix.
+
+    Returns:
+        Dict question_id -> {model: {"answer": letter or None, "correct": bool}}
+        covering the models that answered the question
+    """
+    letters = list(LETTERS) + [None]  # predicted == -1 indexes None
+    # Question-major lists: one conversion for the whole matrix
+    answered = matrix.answered.T.tolist()
+    correct = matrix.correct.T.tolist()
+    predicted = matrix.predicted.T.tolist()
+
+    shards = {}
+    for col, qid in enumerate(matrix.questions.ids):
+        shards[qid] = {
+            model: {"answer": letters[code], "correct": is_correct}
+            for model, has_answer, is_correct, code in zip(matrix.models, answered[col], correct[col], predicted[col])
+            if has_answer
+        }
+    return shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export per-question model answers for the website")
+    parser.add_argument(
+        "--results-dir",
+        type=Path,
+        default=PROJECT_ROOT / "eval" / "results",
+        help="Results directory with results_long.parquet or the run log (default: eval/results)",
+    )
+    parser.add_argument(
+        "--run-log",
+        action="store_true",
+        help="Read the latest logged run per model even if results_long.parquet exists",
+    )
+    parser.add_argument(
+        "--include-subsets",
+        action="store_true",
+        help="Let subset runs count as a model's latest run (reads the run log)",
+    )
+    parser.add_argument(
+        "--benchmark",
+        type=Path,
+        default=PROJECT_ROOT / "data" / "benchmark" / "formationeval_v0.1.json",
+        help="Benchmark JSON (default: data/benchmark/formationeval_v0.1.json)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=PROJECT_ROOT.parent / "formationeval-website" / "src" / "data" / "model-answers",
+        help="Shard directory (default: ../formationeval-website/src/data/model-answers)",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=sorted(EXTENSIONS),
+        default="gzip",
+        help="Shard compression (default: gzip)",
+    )
+    args = parser.parse_args()
+
+    if args.compression == "brotli" and brotli is None:
+        sys.exit("brotli is not installed (pip install brotli); use --compression gzip")
+
+    questions = load_benchmark(args.benchmark)
+    runs = latest_runs(RunLog(args.results_dir), include_subsets=args.include_subsets)
+    long_results = args.results_dir / (LONG_RESULTS_NAME + FORMATS["parquet"])
+
+    matrix = None
+    if long_results.exists() and pq is not None and not (args.run_log or args.include_subsets):
+        matrix = long_results_matrix(long_results, questions)
+        # results_long only holds the latest report generation, which may
+        # have covered some of the models: then the run log is read instead
+        missing = {run.get("model", "unknown") for run in runs} - set(matrix.models)
+        if missing:
+            print(f"{long_results.name} lacks {len(missing)} logged model(s), reading the run log")
+            matrix = None
+        else:
+            print(f"Reading {long_results}")
+    if matrix is None:
+        if not runs:
+            sys.exit(f"No runs logged in {args.results_dir}")
+        matrix = ResultsMatrix.from_runs(runs, questions)
+    models, shards = matrix.models, question_shards(matrix)
 
-df = pd.read_csv('eval/results/questions.csv')
+    extension = EXTENSIONS[args.compression]
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    total_bytes = 0
+    for qid, answers in shards.items():
+        name = qid.replace("/", "_").replace("\\", "_") + extension
+        payload = json.dumps({"question_id": qid, "answers": answers}, separators=(",", ":"))
+        data = compress(payload.encode("utf-8"), args.compression)
+        (args.output_dir / name).write_bytes(data)
+        files[qid] = name
+        total_bytes += len(data)
 
-# CSV columns follow pattern: {model}_answer, {model}_correct, {model}_pattern, {model}_raw
-# We only need: question_id, {model}_answer, {model}_correct
+    # Drop shards of questions no longer in the benchmark
+    current = set(files.values())
+    for stale in args.output_dir.glob(f"*{extension}"):
+        if stale.name not in current:
+            stale.unlink()
 
-model_answers = {}
-for _, row in df.iterrows():
-    qid = row['question_id']
-    model_answers[qid] = {}
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "compression": args.compression,
+        "models": models,
+        "questions": files,
+    }
+    with open(args.output_dir / "index.json", "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
 
-    # Find all model columns (those ending in _answer)
-    for col in df.columns:
-        if col.endswith('_answer') and col != 'correct_answer':
-            model_id = col.replace('_answer', '')
-            correct_val = row[f'{model_id}_correct']
-            model_answers[qid][model_id] = {
-                'answer': str(row[col]) if pd.notna(row[col]) else None,
-                'correct': bool(correct_val) if isinstance(correct_val, bool) else str(correct_val).lower() == 'true'
-            }
+    print(
+        f"Exported {len(shards)} questions, {len(models)} models "
+        f"({total_bytes / 1024:.0f} KB {args.compression}) to {args.output_dir}"
+    )
 
-with open('../formationeval-website/src/data/model-answers.json', 'w') as f:
-    json.dump(model_answers, f)
 
-print(f"Exported {len(model_answers)} questions, {len(model_answers[list(model_answers.keys())[0]])} models")
+if __name__ == "__main__":
+    main()
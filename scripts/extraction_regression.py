@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Extraction regression and throughput check over the response cache.
+
+Streams every cached response under eval/cache through extract_answer and
+reports throughput, the extraction pattern histogram and failure rate per
+model. The results are diffed against a stored baseline, so extraction
+changes (including pure speed-ups) cannot silently change answers.
+
+Usage:
+    python scripts/extraction_regression.py                    # Diff against baseline
+    python scripts/extraction_regression.py --update-baseline  # Store current results
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "eval"))
+
+from extraction import EXTRACTOR_VERSION, extract_answer
+from response_cache import read_model_cache
+
+
+def iter_cached_responses(cache_dir: Path):
+    """Yield (model_dir, question_id, raw_response) for packed and loose responses, one model at a time."""
+    for model_cache in sorted(cache_dir.iterdir()):
+        if not model_cache.is_dir() or model_cache.name.startswith('.'):
+            continue
+        by_stem = read_model_cache(model_cache)
+        for stem in sorted(by_stem):
+            _, data = by_stem[stem]
+            yield model_cache.name, data.get("question_id", stem), data.get("raw_response", "")
+
+
+def run_extraction(cache_dir: Path) -> dict:
+    """
+    Extract every cached response and collect per-model statistics.
+
+    Returns:
+        Dict with overall throughput and per-model totals, failures,
+        pattern histograms and answers ('B/first_char' per question id)
+    """
+    models = {}
+    total = 0
+    total_chars = 0
+    extract_seconds = 0.0
+    wall_start = time.perf_counter()
+
+    for model, qid, raw in iter_cached_responses(cache_dir):
+        start = time.perf_counter()
+        answer, pattern = extract_answer(raw)
+        extract_seconds += time.perf_counter() - start
+
+        stats = models.setdefault(model, {"total": 0, "failed": 0, "patterns": Counter(), "answers": {}})
+        stats["total"] += 1
+        stats["patterns"][pattern] += 1
+        if answer is None:
+            stats["failed"] += 1
+        stats["answers"][qid] = f"{answer or '-'}/{pattern}"
+
+        total += 1
+        total_chars += len(raw)
+
+    wall_seconds = time.perf_counter() - wall_start
+
+    for stats in models.values():
+        stats["patterns"] = dict(sorted(stats["patterns"].items()))
+
+    return {
+        "extractor_version": EXTRACTOR_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "responses": total,
+        "chars": total_chars,
+        "extract_seconds": extract_seconds,
+        "responses_per_second": total / extract_seconds if extract_seconds > 0 else 0.0,
+        "wall_seconds": wall_seconds,
+        "models": models,
+    }
+
+
+def print_summary(current: dict) -> None:
+    """Print throughput and per-model pattern histogram / failure rate."""
+    print(f"Extractor version: {current['extractor_version']}")
+    print(f"Responses: {current['responses']:,} ({current['chars'] / 1e6:.1f}M chars)")
+    print(
+        f"Throughput: {current['responses_per_second']:,.0f} responses/s "
+        f"(extraction {current['extract_seconds']:.2f}s, wall {current['wall_seconds']:.2f}s incl. I/O)"
+    )
+    print()
+
+    for model, stats in current["models"].items():
+        fail_rate = stats["failed"] / stats["total"] if stats["total"] else 0.0
+        histogram = ", ".join(f"{name}={count}" for name, count in stats["patterns"].items())
+        print(f"  {model}: {stats['total']} responses, failed {fail_rate * 100:.1f}%")
+        print(f"    {histogram}")
+
+
+def diff_against_baseline(current: dict, baseline: dict) -> int:
+    """
+    Print differences between current results and the baseline.
+
+    Returns:
+        Number of changed answers (including responses added or removed)
+    """
+    print(f"\n=== DIFF vs baseline ({baseline['extractor_version']}, {baseline['created']}) ===")
+
+    base_rps = baseline.get("responses_per_second", 0.0)
+    if base_rps > 0:
+        ratio = current["responses_per_second"] / base_rps
+        print(f"Throughput: {base_rps:,.0f} -> {current['responses_per_second']:,.0f} responses/s ({ratio:.2f}x)")
+
+    changed = 0
+    base_models = baseline.get("models", {})
+    for model in sorted(set(base_models) | set(current["models"])):
+        base = base_models.get(model)
+        cur = current["models"].get(model)
+        if base is None or cur is None:
+            print(f"\n  {model}: {'added' if base is None else 'removed'}")
+            changed += len((cur or base)["answers"])
+            continue
+
+        answer_changes = [
+            (qid, base["answers"].get(qid), cur["answers"].get(qid))
+            for qid in sorted(set(base["answers"]) | set(cur["answers"]))
+            if base["answers"].get(qid) != cur["answers"].get(qid)
+        ]
+        pattern_deltas = {
+            name: cur["patterns"].get(name, 0) - base["patterns"].get(name, 0)
+            for name in sorted(set(base["patterns"]) | set(cur["patterns"]))
+        }
+        pattern_deltas = {name: delta for name, delta in pattern_deltas.items() if delta}
+
+        if not answer_changes and not pattern_deltas:
+            continue
+
+        base_fail = base["failed"] / base["total"] if base["total"] else 0.0
+        cur_fail = cur["failed"] / cur["total"] if cur["total"] else 0.0
+        print(f"\n  {model}: failed {base_fail * 100:.1f}% -> {cur_fail * 100:.1f}%")
+        if pattern_deltas:
+            print("    patterns: " + ", ".join(f"{name} {delta:+d}" for name, delta in pattern_deltas.items()))
+        for qid, old, new in answer_changes:
+            print(f"    {qid}: {old or 'missing'} -> {new or 'missing'}")
+        changed += len(answer_changes)
+
+    print()
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction regression and throughput check over the response cache")
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=PROJECT_ROOT / "eval" / "cache",
+        help="Response cache directory (default: eval/cache)",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=PROJECT_ROOT / "eval" / "results" / "extraction_baseline.json",
+        help="Baseline file, committed with the results (default: eval/results/extraction_baseline.json)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the current results as the new baseline",
+    )
+    args = parser.parse_args()
+
+    if not args.cache_dir.exists():
+        print(f"Cache directory not found: {args.cache_dir}")
+        sys.exit(1)
+
+    current = run_extraction(args.cache_dir)
+    print_summary(current)
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nBaseline written: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nFAIL: no baseline at {args.baseline} (run with --update-baseline first)")
+        sys.exit(1)
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+
+    changed = diff_against_baseline(current, baseline)
+    if changed:
+        print(f"FAIL: {changed} answer(s) differ from the baseline")
+        sys.exit(1)
+    print("PASS: all answers match the baseline")
+
+
+if __name__ == "__main__":
+    main()